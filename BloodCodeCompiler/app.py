@@ -1,79 +1,315 @@
-from flask import Flask, request, jsonify
-from lexer.lexer import Lexer, Token
-from parser.parser import Parser
-from interpreter.interpreter import Interpreter
-from semantic_analyzer.TypeEnviroment import TypeEnvironment
-from semantic_analyzer.SemanticAnalyzer import SemanticAnalyzer
+import os
+import time
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from lexer.lexer import Token
+from parser import ast_to_json, json_text
+from interpreter.engines import get_engine
+from interpreter.sessions import SessionStore, SessionError
+from interpreter.workers import WorkerPool, run_job, stream_job, budget_response
+from interpreter.streaming import STREAM_FORMATS, format_event
+from interpreter.budget import ExecutionBudget, BudgetExceeded, MAX_DEPTH
 from semantic_analyzer.SemanticAnalyzer import SemanticError
+from cache import compile_cache, code_cache, DocumentStore, DocumentError, DocumentVersionError
+from metrics import PhaseTimings
+from metrics.pipeline import registry, request_seconds, record_timings
 from flask_cors import CORS
 
+class DeepJSONProvider(DefaultJSONProvider):
+    # La forma JSON del AST de una expresión larga es tan profunda como ella;
+    # si json.dumps se queda sin pila se escribe sin recursión.
+    def dumps(self, obj, **kwargs):
+        try:
+            return super().dumps(obj, **kwargs)
+        except RecursionError:
+            return json_text(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys))
+
 app = Flask(__name__)
+app.json = DeepJSONProvider(app)
 CORS(app) 
 
+sessions = SessionStore(
+    ttl=float(os.environ.get('BLOODCODE_SESSION_TTL', 300)),
+    max_sessions=int(os.environ.get('BLOODCODE_MAX_SESSIONS', 256)),
+)
+
+# Procesos de trabajo para /execute; con BLOODCODE_WORKERS=0 los programas se
+# ejecutan en el hilo de la petición.
+workers = WorkerPool(
+    size=int(os.environ.get('BLOODCODE_WORKERS', os.cpu_count() or 1)),
+    max_jobs=int(os.environ.get('BLOODCODE_WORKER_MAX_JOBS', 500)),
+    max_rss_mb=int(os.environ.get('BLOODCODE_WORKER_MAX_RSS_MB', 512)),
+)
+
+def budget_limit(name, default, kind):
+    value = os.environ.get(name, str(default))
+    return kind(value) if value else None
+
+# Presupuesto de cada ejecución de /execute: vueltas de bucle más llamadas a
+# funciones, segundos de reloj (sin contar la espera de Eyes en una sesión) y
+# elementos de arreglo declarados y llamadas anidadas. Una variable vacía
+# quita el límite. Las llamadas a funciones puras se memorizan en una tabla
+# de hasta BLOODCODE_MEMO_ENTRIES resultados; con 0 no se memorizan.
+limits = {
+    'max_steps': budget_limit('BLOODCODE_MAX_STEPS', 50000000, int),
+    'max_seconds': budget_limit('BLOODCODE_MAX_SECONDS', 10, float),
+    'max_elements': budget_limit('BLOODCODE_MAX_ELEMENTS', 10000000, int),
+    'max_depth': budget_limit('BLOODCODE_MAX_DEPTH', MAX_DEPTH, int),
+    'max_memo_entries': budget_limit('BLOODCODE_MEMO_ENTRIES', 100000, int),
+}
+
+def request_limits(data):
+    # Con 'memoize': false la petición ejecuta sin la tabla de resultados.
+    if data.get('memoize', True) is False:
+        return dict(limits, max_memo_entries=0)
+    return limits
+
+# Bytes de salida permitidos en /execute/stream; la petición puede pedir
+# menos con 'maxOutputBytes'.
+max_output_bytes = budget_limit('BLOODCODE_MAX_OUTPUT_BYTES', 16 * 1024 * 1024, int)
+
+documents = DocumentStore(max_size=int(os.environ.get('BLOODCODE_MAX_DOCUMENTS', 64)))
+
+def worker_stat(name):
+    return lambda: {(): workers.stats()[name]}
+
+registry.callback('bloodcode_worker_queue_depth', 'Peticiones esperando un proceso de trabajo.', 'gauge', worker_stat('queue_depth'))
+registry.callback('bloodcode_workers_running', 'Procesos de trabajo ejecutando un programa.', 'gauge', worker_stat('running'))
+registry.callback('bloodcode_worker_jobs_total', 'Trabajos terminados por los procesos de trabajo.', 'counter', worker_stat('completed'))
+registry.callback('bloodcode_worker_recycled_total', 'Procesos de trabajo reemplazados por trabajos o memoria.', 'counter', worker_stat('recycled'))
+registry.callback('bloodcode_worker_crashed_total', 'Procesos de trabajo que terminaron de forma inesperada.', 'counter', worker_stat('crashed'))
+registry.callback('bloodcode_worker_cancelled_total', 'Ejecuciones transmitidas abandonadas por el cliente.', 'counter', worker_stat('cancelled'))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    start = getattr(g, 'request_start', None)
+    if start is not None:
+        request_seconds.observe(time.perf_counter() - start, endpoint=request.endpoint or 'desconocido', status=response.status_code)
+    return response
+
+def take_timings(body, data):
+    # Las métricas de la petición se registran siempre; el desglose por
+    # etapa sólo se devuelve si la petición trae "timings": true.
+    timings = body.pop('timings', None)
+    if timings is not None:
+        record_timings(timings)
+        if data.get('timings'):
+            body['timings'] = timings
+    return body
+
+def timed_response(body, status, data):
+    return jsonify(take_timings(body, data)), status
+
 @app.route('/ping', methods=['GET'])
 def ping():
     return jsonify({'message': 'pong'}), 200
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    stats = compile_cache.stats()
+    stats['code_cache'] = code_cache.stats()
+    return jsonify(stats), 200
+
+@app.route('/workers/stats', methods=['GET'])
+def worker_stats():
+    return jsonify(workers.stats()), 200
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def read_request():
+    # Los programas grandes pueden subirse como archivo (multipart, campo
+    # 'file'); el lexer lo lee por bloques en lugar de cargarlo en memoria.
+    upload = request.files.get('file')
+    if upload:
+        return request.form, upload.stream
+    data = request.get_json()
+    return data, data.get('code', '')
+
 @app.route('/compile', methods=['POST'])
 def compile_code():
     try:
-        data = request.get_json()
-        code = data.get('code', '')
+        data, code = read_request()
         action = data.get('action', 'compile') 
 
-        env = TypeEnvironment()
-        lexer = Lexer(code)
-        tokens: list[Token] = lexer.tokenize()
+        compilation = compile_cache.entry(code)
+        timings = PhaseTimings()
+        timings.cache = 'hit' if compilation.analyzed else 'miss'
 
         if action == 'tokens':
+            tokens: list[Token] = compilation.tokens(timings)
             token_list = [token.to_dict() for token in tokens]
-            return jsonify({'tokens': token_list}), 200
+            timings.count_program(compilation)
+            return timed_response({'tokens': token_list, 'timings': timings.as_dict()}, 200, data)
 
-        parser = Parser(tokens)
-        ast = parser.parse()
+        ast = compilation.ast(timings)
 
         if action == 'ast':
-            return jsonify({'ast': repr(ast)}), 200  
-        analyzer = SemanticAnalyzer(env)
-        analyzer.analyze(ast)
+            timings.count_program(compilation)
+            return timed_response({'ast': repr(ast), 'timings': timings.as_dict()}, 200, data)
 
-        return jsonify({'message': 'Compilación exitosa'}), 200
+        # El mismo árbol como objetos anidados ({'type', 'line', campos...}).
+        if action == 'ast_json':
+            timings.count_program(compilation)
+            return timed_response({'ast': ast_to_json(ast), 'timings': timings.as_dict()}, 200, data)
+        compilation.analysis(timings)
+
+        timings.count_program(compilation)
+        return timed_response({'message': 'Compilación exitosa', 'optimizations': compilation.optimization_stats.as_dict(), 'timings': timings.as_dict()}, 200, data)
 
     except SemanticError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f"Error inesperado: {str(e)}"}), 500
 
+def document_response(document, action):
+    # Mismo resultado que /compile para el texto actual del documento, sin
+    # las estadísticas del optimizador (sólo se calculan al ejecutar).
+    with document.lock:
+        body = {'documentId': document.document_id, 'version': document.version}
+        error = document.result()
+        # Los errores de sintaxis y semánticos son del texto que envió el editor.
+        if isinstance(error, (SyntaxError, SemanticError)):
+            body['error'] = str(error)
+            return jsonify(body), 400
+        if error is not None:
+            body['error'] = f"Error inesperado: {str(error)}"
+            return jsonify(body), 500
+        if action == 'ast':
+            body['ast'] = repr(document.ast())
+        elif action == 'ast_json':
+            body['ast'] = ast_to_json(document.ast())
+        else:
+            body['message'] = 'Compilación exitosa'
+        return jsonify(body), 200
+
+@app.route('/documents', methods=['POST'])
+def open_document():
+    # Abre un documento para el editor; las ediciones siguientes se envían a
+    # /documents/<id>/edits y sólo se vuelve a compilar lo que cambió.
+    try:
+        data = request.get_json()
+        document = documents.open(data.get('code', ''))
+        return document_response(document, data.get('action', 'compile'))
+    except Exception as e:
+        return jsonify({'error': f"Error inesperado: {str(e)}"}), 500
+
+@app.route('/documents/<document_id>/edits', methods=['POST'])
+def edit_document(document_id):
+    # Cuerpo: {"version": n, "range": {"start": a, "end": b}, "text": "..."},
+    # con el rango en offsets de caracteres del texto de la versión n.
+    try:
+        data = request.get_json()
+        document = documents.get(document_id)
+        edit_range = data.get('range', {})
+        document.edit(data.get('version'), edit_range.get('start'), edit_range.get('end'), data.get('text', ''))
+        return document_response(document, data.get('action', 'compile'))
+    except DocumentVersionError as e:
+        return jsonify({'error': str(e)}), 409
+    except DocumentError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': f"Error inesperado: {str(e)}"}), 500
+
+def session_response(session, event):
+    kind, payload, output = event
+    if kind == 'prompt':
+        return jsonify({"prompt": payload, "output": output, "sessionId": session.session_id}), 200
+    sessions.discard(session)
+    if kind == 'error':
+        if isinstance(payload, BudgetExceeded):
+            body, status = budget_response(payload, output)
+            return jsonify(body), status
+        raise payload
+    return jsonify({"output": output}), 200
+
 @app.route('/execute', methods=['POST'])
 def execute_code():
     try:
-        data = request.get_json()
-        code = data.get('code', '')
+        data, code = read_request()
         user_input = data.get('userInput', None) 
 
-        env = TypeEnvironment()
-        lexer = Lexer(code)
-        tokens = lexer.tokenize()
-        parser = Parser(tokens)
-        ast = parser.parse()
+        # Con 'session' la ejecución se suspende en cada Eyes y se reanuda
+        # enviando 'sessionId' y 'userInput', sin volver a ejecutar el programa.
+        session_id = data.get('sessionId')
+        if session_id:
+            session = sessions.get(session_id)
+            return session_response(session, session.resume(user_input or ''))
+
+        # 'engine' elige el motor de ejecución ('interpreter', 'closures', 'python' o 'vm').
+        # Con action 'profile' se ejecuta con el Interpreter instrumentado y la
+        # respuesta incluye tiempos por línea, función y bucle.
+        action = data.get('action')
+        if data.get('session'):
+            # Las sesiones quedan en este proceso: el hilo de la sesión
+            # conserva el estado del programa entre un Eyes y el siguiente.
+            compilation = compile_cache.entry(code)
+            timings = PhaseTimings()
+            timings.cache = 'hit' if compilation.analyzed else 'miss'
+            env = compilation.analysis(timings)
+            timings.count_program(compilation)
+            record_timings(timings.as_dict())
+            interpreter = get_engine(data.get('engine'))(env)
+            interpreter.budget = ExecutionBudget(**request_limits(data))
+            session = sessions.create(interpreter, compilation.program())
+            return session_response(session, session.start())
 
-        analyzer = SemanticAnalyzer(env)
-        analyzer.analyze(ast)
+        if workers.size:
+            if not isinstance(code, str):
+                code = code.read()
+                code = code.decode('utf-8') if isinstance(code, bytes) else code
+            body, status = workers.run(code, data.get('engine'), user_input, request_limits(data), action)
+        else:
+            body, status = run_job(code, data.get('engine'), user_input, request_limits(data), action)
+        return timed_response(body, status, data)
 
-        interpreter = Interpreter(env)
+    except SessionError as e:
+        return jsonify({'error': str(e)}), 404
+    except SemanticError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f"Error inesperado: {str(e)}"}), 500
 
-        if user_input:
-            interpreter.context["input_var"] = user_input
+@app.route('/execute/stream', methods=['POST'])
+def execute_stream():
+    # Como /execute, pero la salida de Pray se envía mientras el programa se
+    # ejecuta, en bloques de líneas: como JSON por línea ('format': 'ndjson',
+    # por defecto) o como server-sent events ('format': 'sse'). El último
+    # evento, 'end', trae lo que /execute devolvería sin 'output' y con el
+    # código de estado en 'status'. La memoria no crece con la salida: si el
+    # cliente no lee, el programa espera en su siguiente Pray.
+    try:
+        data, code = read_request()
+        stream_format = data.get('format', 'ndjson')
+        if stream_format not in STREAM_FORMATS:
+            return jsonify({'error': f"Formato desconocido: {stream_format}. Disponibles: {', '.join(STREAM_FORMATS)}"}), 400
+        max_bytes = max_output_bytes
+        requested = data.get('maxOutputBytes')
+        if requested and (max_bytes is None or int(requested) < max_bytes):
+            max_bytes = int(requested)
 
-        interpreter.execute(ast)
+        # El programa se ejecuta después de enviar los encabezados, así que
+        # un archivo subido se lee antes.
+        if not isinstance(code, str):
+            code = code.read()
+            code = code.decode('utf-8') if isinstance(code, bytes) else code
+        job = (code, data.get('engine'), data.get('userInput', None), request_limits(data), data.get('action'), max_bytes)
+        events = workers.stream(*job) if workers.size else stream_job(*job)
 
-        if interpreter.prompt_var: 
-            return jsonify({"prompt": interpreter.prompt_var}), 200
+        def generate():
+            for event in events:
+                if event[0] == 'end':
+                    event = 'end', take_timings(event[1], data), event[2]
+                yield format_event(event, stream_format)
 
-        return jsonify({"output": interpreter.output}), 200
+        return Response(stream_with_context(generate()), content_type=STREAM_FORMATS[stream_format],
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-    except SemanticError as e:
-        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f"Error inesperado: {str(e)}"}), 500
 
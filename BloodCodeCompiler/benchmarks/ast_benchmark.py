@@ -0,0 +1,56 @@
+# Uso: python -m benchmarks.ast_benchmark [--lines 5000 20000 80000] [--repeat 3]
+import argparse
+import json
+import pickle
+import tempfile
+import time
+
+from cache.compile_cache import CompilationEntry
+from cache.disk_cache import ASTDiskCache
+from parser.serialization import encode_ast, decode_ast, ast_to_json
+from benchmarks.programs import generate_source
+
+
+def measure(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serialización binaria del AST de BloodCode')
+    parser.add_argument('--lines', nargs='+', type=int, default=[5000, 20000, 80000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for lines in args.lines:
+        code = generate_source(lines)
+        parse, ast = measure(lambda: CompilationEntry(code).ast(), args.repeat)
+        encode, data = measure(lambda: encode_ast(ast), args.repeat)
+        decode, _ = measure(lambda: decode_ast(data), args.repeat)
+        pickled = pickle.dumps(ast, protocol=pickle.HIGHEST_PROTOCOL)
+        unpickle, _ = measure(lambda: pickle.loads(pickled), args.repeat)
+        json_size = len(json.dumps(ast_to_json(ast)))
+
+        with tempfile.TemporaryDirectory() as directory:
+            disk = ASTDiskCache(directory, max_entries=16)
+            CompilationEntry(code, disk, 'benchmark').ast()
+            cached, _ = measure(lambda: CompilationEntry(code, disk, 'benchmark').ast(), args.repeat)
+
+        print(f'{code.count(chr(10))} líneas ({len(code)} bytes de código)')
+        print(f'  lex + parse           {parse * 1000:9.2f} ms')
+        print(f'  codificar             {encode * 1000:9.2f} ms')
+        print(f'  decodificar           {decode * 1000:9.2f} ms')
+        print(f'  cargar desde disco    {cached * 1000:9.2f} ms')
+        print(f'  pickle.loads          {unpickle * 1000:9.2f} ms')
+        print(f'  tamaño binario        {len(data):9d} bytes')
+        print(f'  tamaño pickle         {len(pickled):9d} bytes')
+        print(f'  tamaño JSON           {json_size:9d} bytes')
+
+
+if __name__ == '__main__':
+    main()
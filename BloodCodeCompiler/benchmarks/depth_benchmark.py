@@ -0,0 +1,41 @@
+# Uso: python -m benchmarks.depth_benchmark [--depths 500 5000 9000] [--terms 1000 10000] [--engines interpreter vm]
+import argparse
+import time
+
+from cache.compile_cache import CompilationEntry
+from interpreter.engines import ENGINES
+from benchmarks.programs import recursion_program, chain_program
+
+
+def run(engine, code):
+    # Devuelve el tiempo de compilar y ejecutar y la salida, o el error.
+    start = time.perf_counter()
+    try:
+        compilation = CompilationEntry(code)
+        env = compilation.analysis()
+        interpreter = engine(env)
+        interpreter.execute(compilation.program())
+        result = ' '.join(interpreter.output)
+    except Exception as e:
+        result = f'{type(e).__name__}: {str(e)[:80]}'
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recursión profunda y expresiones largas en BloodCode')
+    parser.add_argument('--depths', nargs='+', type=int, default=[500, 5000, 9000])
+    parser.add_argument('--terms', nargs='+', type=int, default=[1000, 10000])
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    args = parser.parse_args()
+
+    cases = [(f'recursión de {depth} llamadas', recursion_program(depth)) for depth in args.depths]
+    cases += [(f'suma de {terms} términos', chain_program(terms)) for terms in args.terms]
+    for name, code in cases:
+        print(name)
+        for engine_name in args.engines:
+            elapsed, result = run(ENGINES[engine_name], code)
+            print(f'  {engine_name:<12} {elapsed:8.3f} s  {result}')
+
+
+if __name__ == '__main__':
+    main()
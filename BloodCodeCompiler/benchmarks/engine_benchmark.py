@@ -0,0 +1,51 @@
+# Uso: python -m benchmarks.engine_benchmark [--engines interpreter vm] [--repeat 3]
+import argparse
+import time
+
+from cache.compile_cache import CompilationEntry
+from interpreter.engines import ENGINES
+from benchmarks.programs import nested_loops_program, matrix_program, vector_program, factorial_program, fibonacci_program
+
+PROGRAMS = {
+    'bucles anidados 150x150': nested_loops_program(150),
+    'matriz 80x80': matrix_program(80),
+    'vector 2000 x 20 (por índice)': vector_program(2000, 20, False),
+    'vector 2000 x 20 (arreglo completo)': vector_program(2000, 20, True),
+    'factorial(20) x 300': factorial_program(20, 300),
+    'fibonacci(18)': fibonacci_program(18),
+}
+
+
+def run(engine, ast, env):
+    interpreter = engine(env)
+    start = time.perf_counter()
+    interpreter.execute(ast)
+    elapsed = time.perf_counter() - start
+    return elapsed, interpreter.output
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparación de motores de ejecución de BloodCode')
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for name, code in PROGRAMS.items():
+        compilation = CompilationEntry(code)
+        env = compilation.analysis()
+        ast = compilation.program()
+        print(name)
+        baseline = None
+        expected = None
+        for engine_name in args.engines:
+            engine = ENGINES[engine_name]
+            elapsed, output = min(run(engine, ast, env) for _ in range(args.repeat))
+            if expected is None:
+                expected = output
+            status = 'ok' if output == expected else f'SALIDA DISTINTA {output}'
+            baseline = baseline or elapsed
+            print(f'  {engine_name:<12} {elapsed:8.3f} s  x{baseline / elapsed:5.1f}  {status}')
+
+
+if __name__ == '__main__':
+    main()
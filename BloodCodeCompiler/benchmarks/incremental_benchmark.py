@@ -0,0 +1,55 @@
+# Uso: python -m benchmarks.incremental_benchmark [--lines 5000 20000 80000] [--edits 200]
+import argparse
+import time
+
+from cache.compile_cache import CompilationEntry
+from cache.documents import Document
+from benchmarks.programs import generate_source
+
+
+def measure(function, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latencia de la compilación incremental de BloodCode')
+    parser.add_argument('--lines', nargs='+', type=int, default=[5000, 20000, 80000])
+    parser.add_argument('--edits', type=int, default=200)
+    args = parser.parse_args()
+
+    for lines in args.lines:
+        code = generate_source(lines)
+        full = measure(lambda: CompilationEntry(code).analysis())
+        start = time.perf_counter()
+        document = Document(code)
+        opened = time.perf_counter() - start
+
+        # Un carácter escrito y borrado dentro de una cadena en la mitad del
+        # programa, y un cambio en la expresión de una declaración.
+        middle = code.index('"texto', len(code) // 2) + 1
+        declaration = code.index('=> ', len(code) // 2) + 3
+
+        def type_character():
+            document.edit(document.version, middle, middle, 'x')
+            document.edit(document.version, middle, middle + 1, '')
+
+        def change_declaration():
+            document.edit(document.version, declaration, declaration + 1, '7')
+            document.edit(document.version, declaration, declaration + 1, code[declaration])
+
+        character = measure(type_character, args.edits) / 2
+        expression = measure(change_declaration, args.edits) / 2
+        assert document.result() is None and document.text == code
+
+        print(f'{code.count(chr(10))} líneas')
+        print(f'  compilación completa  {full * 1000:9.2f} ms')
+        print(f'  apertura del documento {opened * 1000:8.2f} ms')
+        print(f'  edición de 1 carácter {character * 1000:9.3f} ms')
+        print(f'  edición de declaración {expression * 1000:8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
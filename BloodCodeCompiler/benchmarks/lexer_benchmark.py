@@ -0,0 +1,61 @@
+# Uso: python -m benchmarks.lexer_benchmark [--lines 10000 100000 1000000] [--compare]
+import argparse
+import re
+import time
+
+from lexer.lexer import Lexer
+from lexer.tokens import tokens
+from benchmarks.programs import generate_source
+
+
+def legacy_tokenize(code):
+    # Motor anterior: prueba cada patrón de la tabla en cada posición.
+    result = []
+    position = 0
+    line_number = 1
+    while position < len(code):
+        match = None
+        for token_type, token_regex in tokens:
+            match = re.compile(token_regex).match(code, position)
+            if match:
+                if token_type == 'WHITESPACE':
+                    line_number += match.group(0).count('\n')
+                else:
+                    result.append((token_type, match.group(0), line_number))
+                position = match.end(0)
+                break
+        if not match:
+            raise SyntaxError(f'token no reconocido en la línea {line_number}')
+    return result
+
+
+def measure(tokenize, code, repeat):
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(tokenize(code))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendimiento del lexer de BloodCode')
+    parser.add_argument('--lines', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--compare', action='store_true', help='medir también el motor anterior (lento)')
+    args = parser.parse_args()
+
+    for lines in args.lines:
+        code = generate_source(lines)
+        count, elapsed = measure(lambda source: Lexer(source).tokenize(), code, args.repeat)
+        print(f'{lines:>9} líneas  {count:>10} tokens  {elapsed:8.3f} s  {count / elapsed:>12,.0f} tokens/s')
+        if args.compare:
+            legacy_count, legacy_elapsed = measure(legacy_tokenize, code, 1)
+            print(f'{"anterior":>9}        {legacy_count:>10} tokens  {legacy_elapsed:8.3f} s  '
+                  f'{legacy_count / legacy_elapsed:>12,.0f} tokens/s  (x{legacy_elapsed / elapsed:.1f})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# Uso: python -m benchmarks.memo_benchmark [--fibonacci 18 24] [--repeat 20] [--engines interpreter vm]
+import argparse
+import time
+
+from cache.compile_cache import CompilationEntry
+from interpreter.budget import ExecutionBudget
+from interpreter.engines import ENGINES
+from benchmarks.programs import fibonacci_program, repeated_calls_program
+
+
+def run(engine, code, max_memo_entries):
+    # Devuelve el tiempo de ejecutar, la salida y la tabla de resultados.
+    compilation = CompilationEntry(code)
+    env = compilation.analysis()
+    program = compilation.program()
+    interpreter = engine(env)
+    interpreter.budget = ExecutionBudget(max_memo_entries=max_memo_entries)
+    start = time.perf_counter()
+    interpreter.execute(program)
+    elapsed = time.perf_counter() - start
+    return elapsed, ' '.join(interpreter.output), interpreter.budget.memo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memorización de funciones puras de BloodCode')
+    parser.add_argument('--fibonacci', nargs='+', type=int, default=[18, 24])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--max-entries', type=int, default=100000)
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    args = parser.parse_args()
+
+    cases = [(f'fib({n})', fibonacci_program(n)) for n in args.fibonacci]
+    cases.append((f'suma(0..99) x {args.repeat}', repeated_calls_program(100, args.repeat)))
+    for name, code in cases:
+        print(name)
+        for engine_name in args.engines:
+            engine = ENGINES[engine_name]
+            plain, expected, _ = run(engine, code, 0)
+            memoized, output, memo = run(engine, code, args.max_entries)
+            assert output == expected, f'{engine_name}: la salida cambia con la memorización'
+            stats = memo.stats()
+            print(f'  {engine_name:<12} {plain * 1000:10.2f} ms sin memo {memoized * 1000:10.2f} ms con memo '
+                  f'({plain / memoized:7.1f}x, {stats["hit_rate"]:.0%} aciertos, {stats["entries"]} entradas)')
+
+
+if __name__ == '__main__':
+    main()
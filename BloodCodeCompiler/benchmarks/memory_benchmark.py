@@ -0,0 +1,45 @@
+# Uso: python -m benchmarks.memory_benchmark [--lines 140000]
+# Con las líneas por defecto el programa tiene unas 100.000 sentencias.
+import argparse
+import gc
+import tracemalloc
+
+from cache.compile_cache import CompilationEntry
+from cache.documents import ast_nodes
+from parser.ast import BlockNode
+from benchmarks.programs import generate_source
+
+
+def retained(function):
+    # Memoria que sigue ocupada después de la llamada: lo que retiene su
+    # resultado, sin los temporales.
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memoria del AST de BloodCode')
+    parser.add_argument('--lines', nargs='+', type=int, default=[140000])
+    args = parser.parse_args()
+
+    for lines in args.lines:
+        code = generate_source(lines)
+        entry = CompilationEntry(code)
+        size, ast = retained(entry.ast)
+        nodes = sum(1 for _ in ast_nodes(ast.statements)) + 1
+        statements = sum(len(node.statements) for node in ast_nodes(ast.statements) if isinstance(node, BlockNode)) + len(ast.statements)
+        analyzed, _ = retained(entry.program)
+
+        print(f'{code.count(chr(10))} líneas, {statements} sentencias, {nodes} nodos')
+        print(f'  código fuente         {len(code):12d} bytes')
+        print(f'  AST del parser        {size:12d} bytes ({size / nodes:.1f} por nodo, {size / len(code):.2f}x el código)')
+        print(f'  análisis y optimizado {analyzed:12d} bytes')
+
+
+if __name__ == '__main__':
+    main()
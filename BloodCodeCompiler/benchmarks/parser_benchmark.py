@@ -0,0 +1,33 @@
+# Uso: python -m benchmarks.parser_benchmark [--lines 5000 20000] [--repeat 5]
+import argparse
+import time
+
+from lexer.lexer import Lexer
+from parser.parser import Parser
+from benchmarks.programs import generate_source, expression_source
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendimiento del parser de BloodCode')
+    parser.add_argument('--lines', nargs='+', type=int, default=[5000, 20000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    sources = (('expresiones', expression_source), ('sentencias', generate_source))
+    for name, generate in sources:
+        for lines in args.lines:
+            code = generate(lines)
+            # Los tokens se generan antes para medir sólo el parser.
+            tokens = Lexer(code).tokenize()
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                Parser(tokens).parse()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f'{name:12} {code.count(chr(10)):7d} líneas {len(tokens):8d} tokens'
+                  f'  {best * 1000:9.2f} ms  {best / len(tokens) * 1e9:7.0f} ns/token')
+
+
+if __name__ == '__main__':
+    main()
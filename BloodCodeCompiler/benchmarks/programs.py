@@ -0,0 +1,188 @@
+# Generadores de programas BloodCode sintéticos para los benchmarks.
+
+STATEMENT_BLOCK = '''Hunter a{n}: Maria => {n} * 2 + 1;
+Hunter s{n}: Eileen => "texto {n}";
+Insight (a{n} > 10) {{
+    Pray(a{n});
+}} Madness {{
+    Pray(s{n});
+}}
+'''
+
+BLOCK_LINES = STATEMENT_BLOCK.count('\n')
+
+
+def generate_source(lines):
+    blocks = max(1, lines // BLOCK_LINES)
+    return ''.join(STATEMENT_BLOCK.format(n=n) for n in range(blocks))
+
+
+def nested_loops_program(size):
+    return f'''Hunter total: Maria => 0;
+Nightmare (Hunter i: Maria => 0; i < {size}; i => i + 1;) {{
+    Nightmare (Hunter j: Maria => 0; j < {size}; j => j + 1;) {{
+        total => total + i * j - j;
+    }}
+}}
+Pray(total);
+'''
+
+
+def matrix_program(size):
+    return f'''Hunter m: Maria[{size}].[{size}];
+Hunter suma: Maria => 0;
+Nightmare (Hunter i: Maria => 0; i < {size}; i => i + 1;) {{
+    Nightmare (Hunter j: Maria => 0; j < {size}; j => j + 1;) {{
+        m[i].[j] => i + j;
+    }}
+}}
+Nightmare (Hunter a: Maria => 0; a < {size}; a => a + 1;) {{
+    Nightmare (Hunter b: Maria => 0; b < {size}; b => b + 1;) {{
+        suma => suma + m[a].[b];
+    }}
+}}
+Pray(suma);
+'''
+
+
+def vector_program(size, repeat, whole_array):
+    # El mismo cálculo recorriendo los índices o con operaciones sobre el
+    # arreglo completo.
+    if whole_array:
+        body = '''    c => a * 2 + b;
+    suma => suma + Sum(c);'''
+    else:
+        body = f'''    Nightmare (Hunter j: Maria => 0; j < {size}; j => j + 1;) {{
+        c[j] => a[j] * 2 + b[j];
+        suma => suma + c[j];
+    }}'''
+    return f'''Hunter a: Maria[{size}];
+Hunter b: Maria[{size}];
+Hunter c: Maria[{size}];
+Hunter suma: Maria => 0;
+Nightmare (Hunter i: Maria => 0; i < {size}; i => i + 1;) {{
+    a[i] => i;
+    b[i] => {size} - i;
+}}
+Nightmare (Hunter k: Maria => 0; k < {repeat}; k => k + 1;) {{
+{body}
+}}
+Pray(suma);
+'''
+
+
+def factorial_program(n, repeat):
+    return f'''GreatOnes factorial(n: Maria): Maria {{
+    Insight (n < 2) {{
+        Echoes 1;
+    }} Madness {{
+        Echoes n * factorial(n - 1);
+    }}
+}}
+Hunter r: Maria => 0;
+Hunter k: Maria => 0;
+Dream (k < {repeat}) {{
+    r => factorial({n});
+    k => k + 1;
+}}
+Pray(r);
+'''
+
+
+def fibonacci_program(n):
+    return f'''GreatOnes fib(n: Maria): Maria {{
+    Insight (n < 2) {{
+        Echoes n;
+    }} Madness {{
+        Echoes fib(n - 1) + fib(n - 2);
+    }}
+}}
+Pray(fib({n}));
+'''
+
+
+def recursion_program(depth):
+    # Cada llamada espera a la siguiente: `depth` llamadas anidadas.
+    return f'''GreatOnes suma(n: Maria): Maria {{
+    Insight (n < 1) {{
+        Echoes 0;
+    }} Madness {{
+        Echoes n + suma(n - 1);
+    }}
+}}
+Pray(suma({depth}));
+'''
+
+
+def repeated_calls_program(distinct, repeat):
+    # `repeat` vueltas que llaman a la misma función pura con `distinct`
+    # argumentos distintos; cada llamada recorre n niveles de recursión.
+    return f'''GreatOnes suma(n: Maria): Maria {{
+    Insight (n < 1) {{
+        Echoes 0;
+    }} Madness {{
+        Echoes n + suma(n - 1);
+    }}
+}}
+Hunter total: Maria => 0;
+Nightmare (Hunter k: Maria => 0; k < {repeat}; k => k + 1;) {{
+    Nightmare (Hunter i: Maria => 0; i < {distinct}; i => i + 1;) {{
+        total => total + suma(i);
+    }}
+}}
+Pray(total);
+'''
+
+
+def tail_sum_program(n):
+    # Suma de 1 a n con un acumulador: la llamada recursiva es lo último
+    # que hace la función.
+    return f'''GreatOnes suma(n: Maria, total: Maria): Maria {{
+    Insight (n < 1) {{
+        Echoes total;
+    }} Madness {{
+        Echoes suma(n - 1, total + n);
+    }}
+}}
+Pray(suma({n}, 0));
+'''
+
+
+def loop_sum_program(n):
+    # La misma suma con un Nightmare.
+    return f'''Hunter total: Maria => 0;
+Nightmare (Hunter i: Maria => 1; i < {n} + 1; i => i + 1;) {{
+    total => total + i;
+}}
+Pray(total);
+'''
+
+
+def chain_program(terms):
+    # Una suma de `terms` términos: un árbol de esa profundidad.
+    return 'Hunter x: Maria => 1;\nHunter y: Maria => ' + ' + '.join(['x'] * terms) + ';\nPray(y);\n'
+
+
+EXPRESSION_BLOCK = '''Hunter e{n}: Maria => (a * {n} + b / 2 - c) * (d + {n}) - a * b + c * d / (a + 1);
+Insight ((e{n} > a Bloodbond b < c) OldBlood Vileblood (d == {n}) OldBlood a + b * c > d - {n}) {{
+    e{n} => e{n} + v[{n} / 10] * m[a].[b] - f(a, b + c, {n}) * 2;
+}}
+'''
+
+EXPRESSION_HEADER = '''Hunter a: Maria => 1;
+Hunter b: Maria => 2;
+Hunter c: Maria => 3;
+Hunter d: Maria => 4;
+Hunter v: Maria[100];
+Hunter m: Maria[10].[10];
+GreatOnes f(x: Maria, y: Maria, z: Maria): Maria {
+    Echoes x + y * z;
+}
+'''
+
+
+def expression_source(lines):
+    # Programa con expresiones largas, anidadas y con todos los niveles de
+    # precedencia, para medir el parser de expresiones.
+    blocks = max(1, lines // EXPRESSION_BLOCK.count('\n'))
+    return EXPRESSION_HEADER + ''.join(EXPRESSION_BLOCK.format(n=n) for n in range(blocks))
@@ -0,0 +1,40 @@
+# Uso: python -m benchmarks.tail_call_benchmark [--n 1000000] [--engines interpreter]
+import argparse
+import time
+
+from cache.compile_cache import CompilationEntry
+from interpreter.engines import ENGINES
+from benchmarks.programs import tail_sum_program, loop_sum_program
+
+
+def run(engine, code):
+    # Devuelve el tiempo de ejecutar y la salida, o el error.
+    compilation = CompilationEntry(code)
+    env = compilation.analysis()
+    program = compilation.program()
+    interpreter = engine(env)
+    start = time.perf_counter()
+    try:
+        interpreter.execute(program)
+        result = ' '.join(interpreter.output)
+    except Exception as e:
+        result = f'{type(e).__name__}: {str(e)[:80]}'
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recursión de cola contra un Nightmare en BloodCode')
+    parser.add_argument('--n', nargs='+', type=int, default=[1000000])
+    parser.add_argument('--engines', nargs='+', default=['interpreter'], choices=list(ENGINES))
+    args = parser.parse_args()
+
+    for n in args.n:
+        print(f'suma de 1 a {n}')
+        for engine_name in args.engines:
+            for name, code in (('recursión de cola', tail_sum_program(n)), ('Nightmare', loop_sum_program(n))):
+                elapsed, result = run(ENGINES[engine_name], code)
+                print(f'  {engine_name:<12} {name:<18} {elapsed:8.3f} s  {result}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# Uso: python -m benchmarks.worker_benchmark [--workers 1 2 4] [--jobs 16]
+import argparse
+import threading
+import time
+
+from interpreter.workers import WorkerPool, run_job
+from benchmarks.programs import nested_loops_program
+
+
+def measure(execute, code, jobs):
+    threads = [threading.Thread(target=execute, args=(code, 'closures')) for _ in range(jobs)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendimiento de /execute con procesos de trabajo')
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 2, 4])
+    parser.add_argument('--jobs', type=int, default=16)
+    args = parser.parse_args()
+
+    code = nested_loops_program(200)
+    baseline = measure(run_job, code, args.jobs)
+    print(f'hilos de la petición  {baseline:8.3f} s')
+    for size in args.workers:
+        pool = WorkerPool(size, max_jobs=1000, max_rss_mb=1024)
+        # Se espera a que todos los procesos estén listos antes de medir.
+        warm = [threading.Thread(target=pool.run, args=('Pray(0);',)) for _ in range(size)]
+        for thread in warm:
+            thread.start()
+        for thread in warm:
+            thread.join()
+        elapsed = measure(pool.run, code, args.jobs)
+        print(f'{size:2} procesos           {elapsed:8.3f} s  x{baseline / elapsed:5.1f}')
+
+
+if __name__ == '__main__':
+    main()
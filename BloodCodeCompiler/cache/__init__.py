@@ -0,0 +1,4 @@
+from .lru import LRUCache
+from .disk_cache import ASTDiskCache
+from .compile_cache import CompileCache, CompilationEntry, compile_cache, code_cache
+from .documents import Document, DocumentStore, DocumentError, DocumentVersionError
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import threading
+
+from lexer.lexer import Lexer
+from parser.parser import Parser
+from semantic_analyzer.TypeEnviroment import TypeEnvironment
+from semantic_analyzer.SemanticAnalyzer import SemanticAnalyzer
+from semantic_analyzer.Resolver import Resolver
+from optimizer import Optimizer
+from metrics.timings import TimedTokens, phase
+from version import COMPILER_VERSION
+from .lru import LRUCache
+from .disk_cache import disk_cache_from_env
+
+
+class CompilationEntry:
+    # Resultado de compilar un programa, calculado por etapas y bajo demanda:
+    # pedir los tokens no obliga a parsear y un error en una etapa no se guarda.
+    # Con `timings` (un PhaseTimings) se mide cada etapa que se ejecute. Con
+    # `disk` (un ASTDiskCache) y el hash del código, el AST se carga del disco
+    # si otro proceso ya lo parseó, y se guarda ahí al parsearlo.
+    def __init__(self, code, disk=None, digest=None):
+        self.code = code
+        self.disk = disk
+        self.digest = digest
+        self.lock = threading.RLock()
+        self._tokens = None
+        self._ast = None
+        self._env = None
+        self._program = None
+        self.optimization_stats = None
+        self.token_count = None
+        self.node_count = None
+
+    @property
+    def analyzed(self):
+        return self._env is not None
+
+    def tokens(self, timings=None):
+        with self.lock:
+            if self._tokens is None:
+                with phase(timings, 'lex'):
+                    self._tokens = Lexer(self.code).tokenize()
+                self.token_count = len(self._tokens)
+            return self._tokens
+
+    def ast(self, timings=None):
+        with self.lock:
+            if self._ast is None and self.disk is not None:
+                with phase(timings, 'load'):
+                    self._ast = self.disk.load(COMPILER_VERSION, self.digest)
+            if self._ast is None:
+                if self._tokens is not None:
+                    with phase(timings, 'parse'):
+                        self._ast = Parser(self._tokens).parse()
+                else:
+                    # El lexer corre a medida que el parser pide tokens; su
+                    # tiempo se separa del de parsing.
+                    tokens = TimedTokens(Lexer(self.code).stream())
+                    try:
+                        with phase(timings, 'parse'):
+                            self._ast = Parser(tokens).parse()
+                    finally:
+                        if timings is not None:
+                            timings.add('lex', tokens.seconds)
+                            timings.add('parse', -tokens.seconds)
+                    self.token_count = tokens.count
+                if self.disk is not None:
+                    # Antes del análisis: el Resolver anota el árbol.
+                    with phase(timings, 'store'):
+                        self.disk.store(COMPILER_VERSION, self.digest, self._ast)
+            return self._ast
+
+    def analysis(self, timings=None):
+        with self.lock:
+            if self._env is None:
+                ast = self.ast(timings)
+                env = TypeEnvironment()
+                analyzer = SemanticAnalyzer(env)
+                with phase(timings, 'analyze'):
+                    analyzer.analyze(ast)
+                with phase(timings, 'resolve'):
+                    Resolver().resolve_program(ast)
+                with phase(timings, 'optimize'):
+                    self._program, self.optimization_stats = Optimizer().optimize(ast)
+                self.node_count = analyzer.node_count
+                self._env = env
+            return self._env
+
+    def program(self):
+        # AST optimizado que ejecutan los motores; ast() sigue devolviendo el
+        # árbol tal como lo armó el parser.
+        with self.lock:
+            self.analysis()
+            return self._program
+
+
+class CompileCache(LRUCache):
+    def __init__(self, max_size, max_source_length, version=COMPILER_VERSION, disk=None):
+        super().__init__(max_size)
+        self.max_source_length = max_source_length
+        self.version = version
+        self.disk = disk
+        self.invalidations = 0
+
+    def entry(self, code, version=COMPILER_VERSION):
+        # Los archivos subidos y los programas enormes no se guardan: se
+        # compilan en una entrada aparte para no retener su AST en memoria.
+        if not isinstance(code, str) or len(code) > self.max_source_length:
+            return CompilationEntry(code)
+
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self.entries.clear()
+                    self.version = version
+                    self.invalidations += 1
+
+        digest = hashlib.sha256(code.encode('utf-8', 'surrogatepass')).hexdigest()
+        return self.get_or_create((version, digest), lambda: CompilationEntry(code, self.disk, digest))
+
+    def stats(self):
+        stats = super().stats()
+        stats['invalidations'] = self.invalidations
+        stats['version'] = self.version
+        if self.disk is not None:
+            stats['disk'] = self.disk.stats()
+        return stats
+
+
+compile_cache = CompileCache(
+    max_size=int(os.environ.get('BLOODCODE_CACHE_SIZE', 128)),
+    max_source_length=int(os.environ.get('BLOODCODE_CACHE_MAX_SOURCE', 1_000_000)),
+    # Con BLOODCODE_AST_CACHE_DIR los ASTs parseados se guardan también en
+    # disco y los comparten todos los procesos de trabajo.
+    disk=disk_cache_from_env(),
+)
+
+# Objetos de código de Python generados por el motor 'python', indexados por
+# el hash del código fuente generado.
+code_cache = LRUCache(max_size=int(os.environ.get('BLOODCODE_CODE_CACHE_SIZE', 128)))
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import threading
+
+from parser.serialization import encode_ast, decode_ast, SerializationError, FORMAT_VERSION
+
+# Cada cuántas escrituras se revisa si el directorio superó `max_entries`.
+PRUNE_INTERVAL = 64
+
+
+class ASTDiskCache:
+    # ASTs serializados en un directorio, compartido entre los procesos de
+    # trabajo y entre reinicios del servidor. La clave incluye la versión del
+    # compilador y la del formato, así que un cambio en cualquiera de los dos
+    # deja de usar los archivos anteriores. Los archivos se escriben en uno
+    # temporal y se renombran: un lector nunca ve uno a medias.
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, version, digest):
+        return os.path.join(self.directory, f'{version}-{FORMAT_VERSION}-{digest}.ast')
+
+    def load(self, version, digest):
+        try:
+            with open(self.path(version, digest), 'rb') as file:
+                data = file.read()
+        except OSError:
+            with self.lock:
+                self.misses += 1
+            return None
+        try:
+            ast = decode_ast(data)
+        except SerializationError:
+            # Archivo dañado: se trata como ausente y se reemplaza al guardar.
+            with self.lock:
+                self.errors += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return ast
+
+    def store(self, version, digest, ast):
+        try:
+            data = encode_ast(ast)
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(data)
+            os.replace(temporary, self.path(version, digest))
+        except (OSError, SerializationError):
+            with self.lock:
+                self.errors += 1
+            return
+        with self.lock:
+            self.writes += 1
+            prune = self.writes % PRUNE_INTERVAL == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        # Se borran los archivos más antiguos hasta quedar en `max_entries`.
+        try:
+            files = [(entry.stat().st_mtime, entry.path) for entry in os.scandir(self.directory) if entry.name.endswith('.ast')]
+        except OSError:
+            return
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                'directory': self.directory,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'errors': self.errors,
+            }
+
+
+def disk_cache_from_env():
+    directory = os.environ.get('BLOODCODE_AST_CACHE_DIR')
+    if not directory:
+        return None
+    return ASTDiskCache(directory, int(os.environ.get('BLOODCODE_AST_CACHE_SIZE', 4096)))
@@ -0,0 +1,439 @@
+import heapq
+import threading
+import uuid
+from bisect import bisect_right
+
+from lexer.lexer import Lexer, ERROR_CONTEXT_SIZE
+from parser.parser import Parser
+from parser.ast import ASTNode, IdentifierNode, BlockNode
+from semantic_analyzer.TypeEnviroment import TypeEnvironment
+from semantic_analyzer.SemanticAnalyzer import SemanticAnalyzer
+from .lru import LRUCache
+
+# Cantidad máxima de segmentos por bloque. Una edición corrige los offsets
+# dentro de su bloque y sólo suma un desplazamiento a cada bloque siguiente.
+BLOCK_SIZE = 64
+
+
+class DocumentError(Exception):
+    pass
+
+
+class DocumentVersionError(DocumentError):
+    pass
+
+
+def ast_nodes(nodes):
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ASTNode):
+            yield node
+            stack.extend(node.field_values())
+        elif isinstance(node, (list, tuple)):
+            stack.extend(node)
+
+
+def referenced_names(statements):
+    # Todo lo que el SemanticAnalyzer puede buscar en el entorno global:
+    # variables, funciones llamadas y funciones declaradas.
+    return {node.name for node in ast_nodes(statements) if isinstance(node, IdentifierNode)}
+
+
+class Segment:
+    # Texto de una sentencia de nivel superior (o una declaración GreatOnes
+    # completa) desde su primer token hasta el de la siguiente. `statements`
+    # es None mientras el texto está pendiente de volver a parsear.
+    def __init__(self, start, line, text, statements=None, head=0):
+        self.start = start
+        self.line = line
+        self.text = text
+        self.parsed_line = line
+        self.statements = statements
+        self.head = head
+        self.block = None
+        self.names = referenced_names(statements) if statements else set()
+        self.inputs = None
+        self.exports = {}
+        self.error = None
+
+
+class SegmentBlock:
+    def __init__(self, segments):
+        self.segments = segments
+        # Desplazamiento pendiente de aplicar a los segmentos del bloque.
+        self.chars = 0
+        self.lines = 0
+        for segment in segments:
+            segment.block = self
+
+    def normalize(self):
+        if self.chars or self.lines:
+            for segment in self.segments:
+                segment.start += self.chars
+                segment.line += self.lines
+            self.chars = self.lines = 0
+
+
+class SegmentReader:
+    # Entrega al lexer el texto de los segmentos, uno por lectura.
+    def __init__(self, segments, chunks):
+        self.segments = segments
+        self.chunks = chunks
+
+    def read(self, size=-1):
+        for _, segment in self.segments:
+            self.chunks.append(segment.text)
+            return segment.text
+        return ''
+
+
+class Document:
+    # Programa abierto en el editor. Cada edición vuelve a analizar sólo los
+    # segmentos que toca: el lexer y el parser arrancan en el primero y se
+    # detienen al llegar al comienzo de un segmento que no cambió, y el
+    # SemanticAnalyzer repite sólo los segmentos cuyas variables o funciones
+    # globales visibles cambiaron.
+    def __init__(self, code):
+        self.document_id = uuid.uuid4().hex
+        self.version = 1
+        self.lock = threading.RLock()
+        self.length = len(code)
+        self.last_line = None
+        self.syntax_error = None
+        self.examined_end = 0
+        self.gaps = set()
+        self.pending = set()
+        self.failed = set()
+        self.users = {}
+        self.exporters = {}
+        gap = Segment(0, 1, code)
+        self.gaps.add(gap)
+        self.blocks = [SegmentBlock([gap])]
+        self.starts = [0]
+        self.update()
+
+    def edit(self, version, start, end, text):
+        with self.lock:
+            if version != self.version:
+                raise DocumentVersionError(f"La versión {version} no coincide con la versión actual {self.version} del documento")
+            if not isinstance(start, int) or not isinstance(end, int) or not 0 <= start <= end <= self.length:
+                raise DocumentVersionError(f"Rango de edición inválido: {start}-{end}")
+            self.version += 1
+            self.length += len(text) - (end - start)
+            self._splice(start, end, text)
+            # Un error de sintaxis anterior a la edición no cambia: el parser
+            # se detuvo antes de llegar a ella.
+            if self.syntax_error is None or start < self.examined_end:
+                self.syntax_error = None
+                self.update()
+            return self.version
+
+    @property
+    def text(self):
+        with self.lock:
+            return ''.join(segment.text for block in self.blocks for segment in block.segments)
+
+    def result(self):
+        # Mismo resultado que compilar el texto completo: None o la excepción
+        # que lanzaría CompilationEntry.analysis().
+        with self.lock:
+            if self.syntax_error is not None:
+                return self.syntax_error
+            if not self.failed:
+                return None
+            segment = min(self.failed, key=self.offset)
+            if self.refresh(segment):
+                self.analyze(segment, segment.inputs)
+            return segment.error
+
+    def ast(self):
+        with self.lock:
+            if self.syntax_error is not None:
+                raise self.syntax_error
+            statements = []
+            for block in self.blocks:
+                for segment in block.segments:
+                    self.refresh(segment)
+                    statements.extend(segment.statements)
+            return BlockNode(statements, self.last_line)
+
+    def update(self):
+        while self.gaps:
+            if not self._reparse(min(self.gaps, key=self.offset)):
+                return
+        self._analyze_pending()
+
+    # Segmentos y bloques
+
+    def offset(self, segment):
+        return segment.start + segment.block.chars
+
+    def line(self, segment):
+        return segment.line + segment.block.lines
+
+    def locate(self, position):
+        index = bisect_right(self.starts, position) - 1
+        block = self.blocks[index]
+        block.normalize()
+        starts = [segment.start for segment in block.segments]
+        return index, bisect_right(starts, position) - 1
+
+    def segments_from(self, block_index, segment_index):
+        for index in range(block_index, len(self.blocks)):
+            block = self.blocks[index]
+            block.normalize()
+            for segment in block.segments[segment_index:]:
+                yield index, segment
+            segment_index = 0
+
+    def _replace(self, first_block, last_block, segments, chars=0, lines=0):
+        # Reemplaza los bloques [first_block, last_block] por `segments` y
+        # desplaza los bloques siguientes.
+        blocks = [SegmentBlock(segments[i:i + BLOCK_SIZE]) for i in range(0, len(segments), BLOCK_SIZE)]
+        self.blocks[first_block:last_block + 1] = blocks
+        self.starts[first_block:last_block + 1] = [block.segments[0].start for block in blocks]
+        if chars or lines:
+            for index in range(first_block + len(blocks), len(self.blocks)):
+                self.blocks[index].chars += chars
+                self.blocks[index].lines += lines
+                self.starts[index] += chars
+
+    def _splice(self, start, end, text):
+        # Los segmentos que tocan la edición se reemplazan por un hueco. Se
+        # incluye el que termina justo antes de `start` y, si cambia el primer
+        # token de un segmento, también el anterior: su última sentencia toma
+        # la línea de ese token y el parser pudo haberlo mirado.
+        first_block, first = self.locate(max(start - 1, 0))
+        segment = self.blocks[first_block].segments[first]
+        if start <= segment.start + segment.head + 1 and (first_block or first):
+            first_block, first = (first_block, first - 1) if first else self.locate(segment.start - 1)
+        last_block, last = self.locate(end)
+        segments = []
+        for index in range(first_block, last_block + 1):
+            self.blocks[index].normalize()
+            segments.extend(self.blocks[index].segments)
+        last += len(segments) - len(self.blocks[last_block].segments)
+        removed = segments[first:last + 1]
+        old = ''.join(segment.text for segment in removed)
+        position = removed[0].start
+        gap = Segment(position, removed[0].line, old[:start - position] + text + old[end - position:])
+        chars = len(text) - (end - start)
+        for segment in segments[last + 1:]:
+            segment.start += chars
+        segments[first:last + 1] = [gap]
+        self._replace(first_block, last_block, segments, chars)
+        self.gaps.add(gap)
+        self._remove(removed, gap)
+
+    def _reparse(self, gap):
+        # Vuelve a analizar desde el hueco hasta que una sentencia empieza
+        # justo donde empieza un segmento sin cambios (o hasta el final). El
+        # lexer lee el texto de los segmentos siguientes sólo si lo necesita.
+        block_index = self.blocks.index(gap.block)
+        gap.block.normalize()
+        index = gap.block.segments.index(gap)
+        chunks = []
+        reader = SegmentReader(self.segments_from(block_index, index), chunks)
+        lexer = Lexer(reader, gap.line)
+        pulled = []
+        failed = []
+
+        def tokens():
+            try:
+                for token in lexer.stream():
+                    token.position += gap.start
+                    pulled.append(token)
+                    yield token
+            except SyntaxError:
+                failed.append(gap.start + lexer.offset + lexer.position)
+                raise
+
+        following = self.segments_from(block_index, index + 1)
+        current_block, candidate = next(following, (block_index, None))
+        last_block = block_index
+        start, line = gap.start, gap.line
+        new_segments = []
+        try:
+            parser = Parser(tokens())
+            while not parser.end_of_input:
+                token = parser.current_token
+                while candidate is not None and candidate.start < token.position:
+                    current_block, candidate = next(following, (current_block, None))
+                if candidate is not None and candidate.start == token.position and candidate.statements is not None:
+                    last_block, aligned_line = current_block, token.line_number
+                    break
+                try:
+                    statement = parser.parse_statement()
+                except Exception as e:
+                    raise parser.syntax_error(e) from None
+                new_segments.append(Segment(start, line, None, [statement], token.position + len(token.value) - start))
+                start, line = parser.current_token.position, parser.current_token.line_number
+            else:
+                self.last_line = parser.current_token.line_number if parser.current_token else None
+                last_block, candidate = len(self.blocks) - 1, None
+        except SyntaxError as e:
+            self.syntax_error = e
+            self.examined_end = pulled[-1].position + len(pulled[-1].value) if pulled else gap.start
+            if failed:
+                # Una comilla sin cerrar se buscó hasta el final del texto.
+                text = ''.join(chunks)
+                unclosed = text.startswith('"', failed[0] - gap.start)
+                self.examined_end = self.length + 1 if unclosed else failed[0]
+            self.examined_end += ERROR_CONTEXT_SIZE
+            return False
+
+        segments = []
+        for block in self.blocks[block_index:last_block + 1]:
+            block.normalize()
+            segments.extend(block.segments)
+        stop = len(segments)
+        end = self.length
+        lines = 0
+        if candidate is not None:
+            # Los saltos de línea dentro de una cadena no cuentan para el
+            # lexer, así que el desplazamiento de líneas se mide en el token
+            # donde el parser volvió a alinearse.
+            stop = segments.index(candidate)
+            end = candidate.start
+            lines = aligned_line - candidate.line
+            for segment in segments[stop:]:
+                segment.line += lines
+            if self.last_line is not None:
+                self.last_line += lines
+        if not new_segments and not index and not block_index and (candidate is None or end != gap.start):
+            # El comienzo del documento siempre pertenece a algún segmento.
+            new_segments.append(Segment(gap.start, gap.line, None, []))
+        text = ''.join(chunks)
+        if len(text) < end - gap.start:
+            text += ''.join(segment.text for segment in segments[index + len(chunks):stop])
+        for segment, following_segment in zip(new_segments, new_segments[1:] + [None]):
+            segment_end = following_segment.start if following_segment else end
+            segment.text = text[segment.start - gap.start:segment_end - gap.start]
+        removed = segments[index:stop]
+        segments[index:stop] = new_segments
+        self._replace(block_index, last_block, segments, 0, lines)
+        self._remove(removed, new_segments[0] if new_segments else None, gap.start)
+        for segment in new_segments:
+            for name in segment.names:
+                self.users.setdefault(name, set()).add(segment)
+            self.pending.add(segment)
+        return True
+
+    def _remove(self, segments, heir, position=None):
+        # Las exportaciones de los segmentos quitados pasan al que los
+        # reemplaza: al analizarlo sólo se invalidan los usuarios de los tipos
+        # que realmente cambiaron.
+        for segment in segments:
+            self.gaps.discard(segment)
+            self.pending.discard(segment)
+            self.failed.discard(segment)
+            for name in segment.names:
+                self.users[name].discard(segment)
+            for key, binding in segment.exports.items():
+                self.exporters[key].discard(segment)
+                if heir is not None and key not in heir.exports:
+                    heir.exports[key] = binding
+                    self.exporters[key].add(heir)
+                elif heir is None:
+                    self._invalidate(key, position)
+
+    def refresh(self, segment):
+        # Corrige las líneas del AST de un segmento que quedó debajo de una
+        # edición que agregó o quitó saltos de línea.
+        delta = self.line(segment) - segment.parsed_line
+        if not delta:
+            return False
+        for node in ast_nodes(segment.statements):
+            if node.line_number is not None:
+                node.line_number += delta
+        segment.parsed_line += delta
+        return True
+
+    # Análisis semántico
+
+    def visible(self, segment):
+        # Tipos de las variables y funciones globales que el segmento ve, es
+        # decir, los que declaró el primer segmento anterior que los exporta.
+        position = self.offset(segment)
+        bindings = {}
+        for name in segment.names:
+            for key in (('variable', name), ('function', name)):
+                exporters = self.exporters.get(key)
+                if exporters:
+                    owner = min(exporters, key=self.offset)
+                    if self.offset(owner) < position:
+                        bindings[key] = owner.exports[key]
+        return bindings
+
+    def analyze(self, segment, inputs):
+        env = TypeEnvironment()
+        for (kind, name), binding in inputs.items():
+            if kind == 'variable':
+                env.scopes[0][name] = binding
+            else:
+                env.functions[name] = binding
+        try:
+            SemanticAnalyzer(env).analyze(BlockNode(segment.statements, None))
+        except Exception as e:
+            segment.error = e
+            self.failed.add(segment)
+            return {}
+        segment.error = None
+        self.failed.discard(segment)
+        exports = {}
+        for name, var_type in env.scopes[0].items():
+            if ('variable', name) not in inputs:
+                exports[('variable', name)] = var_type
+        for name, function_type in env.functions.items():
+            if ('function', name) not in inputs:
+                exports[('function', name)] = function_type
+        return exports
+
+    def _invalidate(self, key, position):
+        for user in self.users.get(key[1], ()):
+            if self.offset(user) > position:
+                self.pending.add(user)
+
+    def _analyze_pending(self):
+        heap = [(self.offset(segment), id(segment), segment) for segment in self.pending]
+        heapq.heapify(heap)
+        while heap:
+            position, _, segment = heapq.heappop(heap)
+            if segment not in self.pending:
+                continue
+            self.pending.discard(segment)
+            inputs = self.visible(segment)
+            if inputs == segment.inputs:
+                continue
+            self.refresh(segment)
+            segment.inputs = inputs
+            exports = self.analyze(segment, inputs)
+            changed = {key for key in exports.keys() | segment.exports.keys()
+                       if exports.get(key, self) != segment.exports.get(key, self)}
+            for key in segment.exports.keys() - exports.keys():
+                self.exporters[key].discard(segment)
+            for key in exports:
+                self.exporters.setdefault(key, set()).add(segment)
+            segment.exports = exports
+            for key in changed:
+                for user in self.users.get(key[1], ()):
+                    if user not in self.pending and self.offset(user) > position:
+                        self.pending.add(user)
+                        heapq.heappush(heap, (self.offset(user), id(user), user))
+        # Un set no achica su tabla al vaciarse y recorrerlo costaría lo mismo
+        # que cuando tenía todos los segmentos del documento.
+        self.pending = set()
+
+
+class DocumentStore(LRUCache):
+    def open(self, code):
+        document = Document(code)
+        self.put(document.document_id, document)
+        return document
+
+    def get(self, document_id):
+        document = super().get(document_id)
+        if document is None:
+            raise DocumentError(f"El documento {document_id} no existe o fue descartado")
+        return document
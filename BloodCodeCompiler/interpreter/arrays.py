@@ -0,0 +1,224 @@
+import operator
+from array import array
+from itertools import repeat
+
+# Los vectores y matrices guardan sus elementos en un solo búfer contiguo:
+# array('q') para enteros y array('d') para flotantes. Un búfer tipado sólo
+# acepta valores de ese mismo tipo exacto (así lo que se imprime no cambia);
+# cualquier otro valor, o un entero que no entra en 64 bits, lo convierte en
+# una lista común.
+TYPECODES = {int: 'q', float: 'd'}
+KINDS = {'q': int, 'd': float}
+
+COMPARISONS = (operator.eq, operator.ne, operator.lt, operator.le, operator.gt, operator.ge)
+
+
+def make_buffer(values):
+    if values:
+        kind = type(values[0])
+        typecode = TYPECODES.get(kind)
+        if typecode is not None and all(type(value) is kind for value in values):
+            try:
+                return array(typecode, values)
+            except OverflowError:
+                pass
+    return list(values)
+
+
+def filled_buffer(fill, size):
+    typecode = TYPECODES.get(type(fill))
+    if typecode is None:
+        return [fill] * size
+    return array(typecode, [fill]) * size
+
+
+class ArrayValue:
+    def __init__(self, data):
+        self.data = data
+        # Tipo exacto que acepta el búfer, o None si ya es una lista.
+        self.kind = KINDS[data.typecode] if isinstance(data, array) else None
+
+    def put(self, position, value):
+        if self.kind is not None and type(value) is not self.kind:
+            self.to_list()
+        try:
+            self.data[position] = value
+        except OverflowError:
+            self.to_list()
+            self.data[position] = value
+
+    def to_list(self):
+        self.data = list(self.data)
+        self.kind = None
+
+    # Los operadores aritméticos y de comparación se aplican elemento a
+    # elemento, con un escalar repetido sobre todo el arreglo si hace falta.
+    def __add__(self, other):
+        return elementwise(operator.add, self, other)
+
+    def __radd__(self, other):
+        return elementwise(operator.add, other, self)
+
+    def __sub__(self, other):
+        return elementwise(operator.sub, self, other)
+
+    def __rsub__(self, other):
+        return elementwise(operator.sub, other, self)
+
+    def __mul__(self, other):
+        return elementwise(operator.mul, self, other)
+
+    def __rmul__(self, other):
+        return elementwise(operator.mul, other, self)
+
+    def __truediv__(self, other):
+        return elementwise(operator.truediv, self, other)
+
+    def __rtruediv__(self, other):
+        return elementwise(operator.truediv, other, self)
+
+    def __eq__(self, other):
+        return elementwise(operator.eq, self, other)
+
+    def __ne__(self, other):
+        return elementwise(operator.ne, self, other)
+
+    def __lt__(self, other):
+        return elementwise(operator.lt, self, other)
+
+    def __le__(self, other):
+        return elementwise(operator.le, self, other)
+
+    def __gt__(self, other):
+        return elementwise(operator.gt, self, other)
+
+    def __ge__(self, other):
+        return elementwise(operator.ge, self, other)
+
+    __hash__ = None
+
+    def __str__(self):
+        return str(self.tolist())
+
+    __repr__ = __str__
+
+
+class Vector(ArrayValue):
+    def __len__(self):
+        return len(self.data)
+
+    def shape(self):
+        return str(len(self.data))
+
+    def same_shape(self, other):
+        return isinstance(other, Vector) and len(other.data) == len(self.data)
+
+    def with_data(self, data):
+        return Vector(data)
+
+    def tolist(self):
+        return list(self.data)
+
+
+class Matrix(ArrayValue):
+    # Los elementos se guardan por filas: (fila, col) está en fila * cols + col.
+    def __init__(self, rows, cols, data):
+        super().__init__(data)
+        self.rows = rows
+        self.cols = cols
+
+    def __len__(self):
+        return self.rows
+
+    def shape(self):
+        return f"{self.rows}x{self.cols}"
+
+    def same_shape(self, other):
+        return isinstance(other, Matrix) and other.rows == self.rows and other.cols == self.cols
+
+    def with_data(self, data):
+        return Matrix(self.rows, self.cols, data)
+
+    def tolist(self):
+        data = self.data
+        cols = self.cols
+        return [list(data[row * cols:(row + 1) * cols]) for row in range(self.rows)]
+
+
+def result_kind(op, left_kind, right_kind):
+    # Tipo exacto de los resultados de op, o None si no se sabe de antemano.
+    if op in COMPARISONS:
+        return None
+    if left_kind not in KINDS.values() or right_kind not in KINDS.values():
+        return None
+    if op is operator.truediv or float in (left_kind, right_kind):
+        return float
+    return int
+
+
+def elementwise(op, left, right):
+    # Aplica op a todo el búfer de una vez con map(); el resultado vuelve a
+    # ser un búfer tipado cuando el tipo de los valores se conoce.
+    if isinstance(left, ArrayValue):
+        template = left
+        if isinstance(right, ArrayValue):
+            if not left.same_shape(right):
+                raise Exception(f"Las dimensiones de los operandos no coinciden: {left.shape()} y {right.shape()}.")
+            values = list(map(op, left.data, right.data))
+            kind = result_kind(op, left.kind, right.kind)
+        else:
+            values = list(map(op, left.data, repeat(right)))
+            kind = result_kind(op, left.kind, type(right))
+    else:
+        template = right
+        values = list(map(op, repeat(left), right.data))
+        kind = result_kind(op, type(left), right.kind)
+
+    if kind is None:
+        return template.with_data(make_buffer(values))
+    try:
+        return template.with_data(array(TYPECODES[kind], values))
+    except OverflowError:
+        return template.with_data(values)
+
+
+def array_sum(values):
+    return sum(values.data)
+
+
+def array_min(values):
+    if not values.data:
+        raise Exception("No se puede calcular Min de un arreglo vacío.")
+    return min(values.data)
+
+
+def array_max(values):
+    if not values.data:
+        raise Exception("No se puede calcular Max de un arreglo vacío.")
+    return max(values.data)
+
+
+def matmul(left, right):
+    # Matriz por matriz o matriz por vector; cada elemento es un producto
+    # punto entre una fila y una columna, calculado con sum(map(...)).
+    right_rows = right.rows if isinstance(right, Matrix) else len(right.data)
+    if left.cols != right_rows:
+        raise Exception(f"No se puede multiplicar una matriz de {left.shape()} por {right.shape()}.")
+    data = left.data
+    cols = left.cols
+    rows = [data[i * cols:(i + 1) * cols] for i in range(left.rows)]
+    if isinstance(right, Matrix):
+        columns = [right.data[j::right.cols] for j in range(right.cols)]
+        values = [sum(map(operator.mul, row, column)) for row in rows for column in columns]
+        return Matrix(left.rows, right.cols, make_buffer(values))
+    return Vector(make_buffer([sum(map(operator.mul, row, right.data)) for row in rows]))
+
+
+# Funciones predefinidas sobre vectores y matrices (el SemanticAnalyzer
+# conoce los mismos nombres en ARRAY_BUILTINS).
+BUILTINS = {
+    'Sum': array_sum,
+    'Min': array_min,
+    'Max': array_max,
+    'MatMul': matmul,
+}
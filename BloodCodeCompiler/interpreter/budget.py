@@ -0,0 +1,118 @@
+import contextlib
+import time
+
+from interpreter.runtime import BloodCodeError, new_vector, new_matrix
+from interpreter.memo import MemoTable
+
+# Cada cuántos pasos se consulta el reloj: leerlo en cada vuelta costaría
+# más que la vuelta misma en los motores rápidos.
+CLOCK_INTERVAL = 1024
+
+UNLIMITED = float('inf')
+
+# Llamadas a funciones de BloodCode anidadas. Los motores 'interpreter' y
+# 'vm' no usan la pila de Python para las llamadas; 'closures' y 'python' sí,
+# y corren con una pila a la medida de este límite (run_with_python_stack),
+# así que no depende de sys.getrecursionlimit. Sin él, una recursión
+# infinita sólo se detendría al agotar la memoria.
+MAX_DEPTH = 10000
+
+BUDGET_MESSAGES = {
+    'steps': "Se superó el límite de {limit} pasos de ejecución (vueltas de bucle y llamadas a funciones).",
+    'time': "Se superó el tiempo máximo de ejecución de {limit} segundos.",
+    'elements': "Se superó el límite de {limit} elementos reservados en arreglos.",
+    'output': "Se superó el límite de {limit} bytes de salida.",
+    'depth': "Se superó el máximo de {limit} llamadas anidadas.",
+    # Sólo 'closures' y 'python', si la pila de Python se agota antes de
+    # max_depth; 'limit' es la profundidad alcanzada.
+    'stack': "Se agotó la pila de Python tras {limit} llamadas anidadas; el motor 'interpreter' no tiene este límite.",
+}
+
+
+class BudgetExceeded(BloodCodeError):
+    def __init__(self, kind, limit, line_number=None):
+        self.kind = kind
+        self.limit = limit
+        super().__init__(BUDGET_MESSAGES[kind].format(limit=limit), line_number)
+
+    def to_dict(self):
+        return {'kind': self.kind, 'limit': self.limit, 'line': self.line_number}
+
+
+class ExecutionBudget:
+    # Límites de una ejecución. Los motores cuentan un paso en cada vuelta de
+    # bucle y en cada llamada a una función de BloodCode, y piden permiso
+    # antes de reservar un arreglo declarado. Un límite en None no se aplica.
+    # Con max_memo_entries distinto de 0 las llamadas a funciones puras pasan
+    # por una tabla de resultados ('memo') de a lo más ese tamaño.
+    def __init__(self, max_steps=None, max_seconds=None, max_elements=None, max_depth=MAX_DEPTH, max_memo_entries=0):
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_elements = max_elements
+        self.max_depth = max_depth
+        self.memo = MemoTable(max_memo_entries) if max_memo_entries != 0 else None
+        self.steps = 0
+        self.elements = 0
+        self.depth = 0
+        self.deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+        # Siguiente valor de 'steps' en el que hay que mirar los límites; en
+        # el camino rápido sólo se compara con este número.
+        self.checkpoint = self._next_checkpoint()
+
+    def _next_checkpoint(self):
+        checkpoint = self.max_steps + 1 if self.max_steps is not None else UNLIMITED
+        if self.deadline is not None:
+            checkpoint = min(checkpoint, self.steps + CLOCK_INTERVAL)
+        return checkpoint
+
+    def step(self, line_number):
+        self.steps += 1
+        if self.steps >= self.checkpoint:
+            self.check(self.steps, line_number)
+
+    def check(self, steps, line_number):
+        # La VM lleva los pasos en una variable local y los entrega aquí;
+        # devuelve el siguiente punto de control.
+        self.steps = steps
+        if self.max_steps is not None and steps > self.max_steps:
+            raise BudgetExceeded('steps', self.max_steps, line_number)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded('time', self.max_seconds, line_number)
+        self.checkpoint = self._next_checkpoint()
+        return self.checkpoint
+
+    def enter(self, line_number):
+        # Entrada a una llamada; cada enter que no falla lleva su leave.
+        if self.max_depth is not None and self.depth >= self.max_depth:
+            raise BudgetExceeded('depth', self.max_depth, line_number)
+        self.depth += 1
+
+    def leave(self):
+        self.depth -= 1
+
+    def allocate(self, count, line_number):
+        self.elements += count
+        if self.max_elements is not None and self.elements > self.max_elements:
+            raise BudgetExceeded('elements', self.max_elements, line_number)
+
+    def new_vector(self, element_type, size, init, name, line_number):
+        count = len(init) if init is not None else size
+        self.allocate(count if isinstance(count, int) and count > 0 else 0, line_number)
+        return new_vector(element_type, size, init, name)
+
+    def new_matrix(self, element_type, rows, cols, init, name, line_number):
+        if init is None and isinstance(rows, int) and isinstance(cols, int):
+            self.allocate(max(rows, 0) * max(cols, 0), line_number)
+        elif init is not None:
+            self.allocate(sum(len(row) for row in init if isinstance(row, list)), line_number)
+        return new_matrix(element_type, rows, cols, init, name)
+
+    @contextlib.contextmanager
+    def paused(self):
+        # El tiempo esperando la entrada de Eyes no cuenta para el límite.
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            if self.deadline is not None:
+                self.deadline += time.monotonic() - started
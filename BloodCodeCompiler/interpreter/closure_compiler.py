@@ -0,0 +1,505 @@
+import operator
+import sys
+
+from parser.ast import NumberNode, IdentifierNode, BinaryOpNode, StringNode, DeclarationNode, BlockNode, IfStatementNode, LoopNode, FunctionCallNode, RestNode, BooleanNode, UnaryOpNode, FunctionDeclarationNode, ReturnNode, ArrayNode, ConstantNode
+from interpreter.interpreter import Interpreter
+from interpreter.arrays import BUILTINS
+from interpreter.memo import MISSING, memo_key
+from interpreter.budget import BudgetExceeded
+from interpreter.runtime import BloodCodeError, UNSET, run_with_python_stack, MAX_PYTHON_FRAMES, decode_number, reachable_statements, statement_line, scalar_default, vector_index, matrix_index, store_vector, store_matrix
+from semantic_analyzer.Resolver import ensure_resolved
+
+BINARY_OPERATORS = {
+    'PLUS': operator.add,
+    'MINUS': operator.sub,
+    'MULTIPLY': operator.mul,
+    'DIVIDE': operator.truediv,
+    'EQUAL': operator.eq,
+    'NOT': operator.ne,
+    'GREATER': operator.gt,
+    'LESS': operator.lt,
+    'GREATEREQUAL': operator.ge,
+    'LESSEQUAL': operator.le,
+}
+
+
+class CompiledFunction:
+    def __init__(self, name, parameter_slots, return_type, frame_size):
+        self.name = name
+        self.parameter_slots = parameter_slots
+        self.return_type = return_type
+        self.frame_size = frame_size
+        self.pure = False
+        self.body = None
+
+
+class ClosureCompiler:
+    # Traduce el AST ya analizado a funciones de Python anidadas: operadores,
+    # posiciones de variables y ramas quedan resueltos una sola vez. Cada
+    # frame es la lista de variables de la función con, al final, la tupla
+    # de frames de los niveles exteriores.
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.functions = interpreter.compiled_functions
+        self.depth = 0
+        # Anidamiento máximo de nodos compilados: cota de los frames de
+        # Python que usa cada llamada de BloodCode.
+        self.function_count = 0
+        self.nesting = 0
+        self.max_nesting = 0
+
+    def compile_program(self, node):
+        body = self.compile_block(node)
+        frame_size = node.frame_size
+
+        def run_program():
+            return body([UNSET] * frame_size + [()])
+        return run_program
+
+    def compile(self, node):
+        compile_method = getattr(self, 'compile_' + type(node).__name__, None)
+        if compile_method is None:
+            raise BloodCodeError(f"Nodo no soportado: {type(node)}", getattr(node, 'line_number', None))
+        self.nesting += 1
+        self.max_nesting = max(self.max_nesting, self.nesting)
+        try:
+            return compile_method(node)
+        finally:
+            self.nesting -= 1
+
+    def compile_block(self, node):
+        statements = tuple((self.compile(statement), statement_line(statement)) for statement in reachable_statements(node))
+
+        # Los errores de Python se traducen una sola vez, con la línea de la
+        # sentencia más interna que los produjo. RecursionError lo traduce la
+        # llamada que agotó la pila.
+        def run_block(frame):
+            result = None
+            for statement, line_number in statements:
+                try:
+                    result = statement(frame)
+                except (BloodCodeError, RecursionError):
+                    raise
+                except Exception as e:
+                    raise BloodCodeError(str(e), line_number)
+            return result
+        return run_block
+
+    compile_BlockNode = compile_block
+
+    def compile_NumberNode(self, node):
+        value = decode_number(node.value)
+        return lambda frame: value
+
+    def compile_ConstantNode(self, node):
+        value = node.value
+        return lambda frame: value
+
+    def compile_StringNode(self, node):
+        value = node.value
+        return lambda frame: value
+
+    def compile_BooleanNode(self, node):
+        value = True if str(node.value).lower() == 'true' else False
+        return lambda frame: value
+
+    def compile_RestNode(self, node):
+        return lambda frame: None
+
+    def compile_ReturnNode(self, node):
+        return self.compile(node.expression)
+
+    def compile_ArrayNode(self, node):
+        elements = tuple(self.compile(element) for element in node.elements)
+        return lambda frame: [element(frame) for element in elements]
+
+    def load(self, node):
+        # Devuelve una función que lee la variable del frame que le
+        # corresponde según la coordenada del Resolver.
+        slot = node.slot
+        if node.depth == self.depth:
+            return lambda frame: frame[slot]
+        depth = node.depth
+        return lambda frame: frame[-1][depth][slot]
+
+    def store(self, node):
+        slot = node.slot
+        if node.depth == self.depth:
+            def store_local(frame, value):
+                frame[slot] = value
+            return store_local
+        depth = node.depth
+
+        def store_outer(frame, value):
+            frame[-1][depth][slot] = value
+        return store_outer
+
+    def compile_IdentifierNode(self, node):
+        name = node.name
+        line_number = node.line_number
+        slot = node.slot
+
+        if node.depth == self.depth:
+            def read_local(frame):
+                value = frame[slot]
+                if value is UNSET:
+                    raise BloodCodeError(f"La variable '{name}' no ha sido declarada en el contexto actual.", line_number)
+                return value
+            return read_local
+
+        depth = node.depth
+
+        def read_outer(frame):
+            value = frame[-1][depth][slot]
+            if value is UNSET:
+                raise BloodCodeError(f"La variable '{name}' no ha sido declarada en el contexto actual.", line_number)
+            return value
+        return read_outer
+
+    def compile_DeclarationNode(self, node):
+        var_type = node.var_type
+        stores = [self.store(identifier) for identifier in node.identifier_list]
+        names = [identifier.name for identifier in node.identifier_list]
+
+        if isinstance(var_type, tuple):
+            element_type = var_type[0]
+            budget = self.interpreter.budget
+            line_number = node.line_number
+            size1 = self.compile(var_type[1]) if var_type[1] else (lambda frame: 0)
+            init = self.compile(node.expression) if isinstance(node.expression, ArrayNode) else None
+
+            if len(var_type) == 3:
+                size2 = self.compile(var_type[2]) if var_type[2] else (lambda frame: 0)
+
+                def make_value(frame, name):
+                    rows = size1(frame)
+                    cols = size2(frame)
+                    return budget.new_matrix(element_type, rows, cols, init(frame) if init else None, name, line_number)
+            else:
+                def make_value(frame, name):
+                    size = size1(frame)
+                    return budget.new_vector(element_type, size, init(frame) if init else None, name, line_number)
+
+        elif node.expression:
+            expression = self.compile(node.expression)
+
+            def make_value(frame, name):
+                return expression(frame)
+        else:
+            default = scalar_default(var_type)
+
+            def make_value(frame, name):
+                return default
+
+        targets = tuple(zip(stores, names))
+
+        def declare(frame):
+            for store, name in targets:
+                store(frame, make_value(frame, name))
+            return None
+        return declare
+
+    def compile_UnaryOpNode(self, node):
+        if node.operator != 'VILEBLOOD':
+            raise BloodCodeError(f"Operador unario no soportado: {node.operator}", node.line_number)
+        operand = self.compile(node.operand)
+        return lambda frame: not operand(frame)
+
+    def compile_BinaryOpNode(self, node):
+        if node.operator in ('ASSIGN', 'ARROW_ASSIGN'):
+            return self.compile_assignment(node)
+        if node.operator == 'INDEX':
+            return self.compile_index(node)
+
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+
+        if node.operator == 'BLOODBOND':
+            return lambda frame: bool(left(frame)) & bool(right(frame))
+        if node.operator == 'OLDBLOOD':
+            return lambda frame: bool(left(frame)) | bool(right(frame))
+        if node.operator == 'VILEBLOOD':
+            return lambda frame: (left(frame), not bool(right(frame)))[1]
+
+        op = BINARY_OPERATORS.get(node.operator)
+        if op is None:
+            raise BloodCodeError(f"Operador no soportado: {node.operator}", node.line_number)
+
+        if isinstance(node.right, (NumberNode, ConstantNode)):
+            constant = node.right.value if isinstance(node.right, ConstantNode) else decode_number(node.right.value)
+            return lambda frame: op(left(frame), constant)
+        return lambda frame: op(left(frame), right(frame))
+
+    def _base_identifier(self, node):
+        current_node = node
+        while isinstance(current_node, BinaryOpNode) and current_node.operator == 'INDEX':
+            current_node = current_node.left
+        if not isinstance(current_node, IdentifierNode):
+            raise BloodCodeError("Acceso de matriz inválido: falta el identificador base.", node.line_number)
+        return current_node
+
+    def _read_array(self, node):
+        base = self._base_identifier(node)
+        name = base.name
+        load = self.load(base)
+
+        def read_array(frame):
+            array = load(frame)
+            if array is UNSET:
+                raise Exception(f"Variable no definida: {name}")
+            return array
+        return name, read_array
+
+    def compile_index(self, node):
+        name, read_array = self._read_array(node)
+
+        if isinstance(node.left, BinaryOpNode) and node.left.operator == 'INDEX':
+            row = self.compile(node.left.right)
+            col = self.compile(node.right)
+
+            if not node.bounds_check:
+                def read_matrix_unchecked(frame):
+                    array = read_array(frame)
+                    return array.data[row(frame) * array.cols + col(frame)]
+                return read_matrix_unchecked
+
+            def read_matrix(frame):
+                array = read_array(frame)
+                return array.data[matrix_index(array, row(frame), col(frame), name)]
+            return read_matrix
+
+        index = self.compile(node.right)
+
+        if not node.bounds_check:
+            return lambda frame: read_array(frame).data[index(frame)]
+
+        def read_vector(frame):
+            array = read_array(frame)
+            return array.data[vector_index(array, index(frame), name)]
+        return read_vector
+
+    def compile_assignment(self, node):
+        value = self.compile(node.right)
+        target = node.left
+
+        if isinstance(target, IdentifierNode):
+            if target.depth == self.depth:
+                slot = target.slot
+
+                def assign_local(frame):
+                    result = value(frame)
+                    frame[slot] = result
+                    return result
+                return assign_local
+            store = self.store(target)
+
+            def assign(frame):
+                result = value(frame)
+                store(frame, result)
+                return result
+            return assign
+
+        if not (isinstance(target, BinaryOpNode) and target.operator == 'INDEX'):
+            raise BloodCodeError("Asignación inválida", node.line_number)
+
+        name, read_array = self._read_array(target)
+        if isinstance(target.left, BinaryOpNode) and target.left.operator == 'INDEX':
+            row = self.compile(target.left.right)
+            col = self.compile(target.right)
+
+            if not target.bounds_check:
+                def assign_matrix_unchecked(frame):
+                    result = value(frame)
+                    array = read_array(frame)
+                    array.put(row(frame) * array.cols + col(frame), result)
+                    return result
+                return assign_matrix_unchecked
+
+            def assign_matrix(frame):
+                return store_matrix(value(frame), read_array(frame), row(frame), col(frame), name)
+            return assign_matrix
+
+        index = self.compile(target.right)
+
+        if not target.bounds_check:
+            def assign_vector_unchecked(frame):
+                result = value(frame)
+                read_array(frame).put(index(frame), result)
+                return result
+            return assign_vector_unchecked
+
+        def assign_vector(frame):
+            return store_vector(value(frame), read_array(frame), index(frame), name)
+        return assign_vector
+
+    def compile_IfStatementNode(self, node):
+        arms = []
+        current_node = node
+        while True:
+            arms.append((self.compile(current_node.condition), self.compile(current_node.true_block)))
+            if not isinstance(current_node.false_block, IfStatementNode):
+                break
+            current_node = current_node.false_block
+        otherwise = self.compile(current_node.false_block) if current_node.false_block else None
+        arms = tuple(arms)
+
+        # La rama verdadera devuelve su resultado tal cual; si se llega al
+        # Madness final (o a ninguna rama) el resultado None se convierte en 0.
+        def run_if(frame):
+            for condition, block in arms:
+                if condition(frame):
+                    return block(frame)
+            if otherwise is not None:
+                result = otherwise(frame)
+                return result if result is not None else 0
+            return 0
+        return run_if
+
+    def compile_LoopNode(self, node):
+        init = self.compile(node.init) if node.init else None
+        if node.condition is None:
+            raise BloodCodeError("La condición del bucle no está definida.", node.line_number)
+        condition = self.compile(node.condition)
+        block = self.compile(node.block)
+        increment = self.compile(node.increment) if node.increment else None
+        step = self.interpreter.budget.step
+        line_number = node.line_number
+
+        def run_loop(frame):
+            if init is not None:
+                init(frame)
+            if increment is None:
+                while condition(frame):
+                    step(line_number)
+                    block(frame)
+            else:
+                while condition(frame):
+                    step(line_number)
+                    block(frame)
+                    increment(frame)
+            return None
+        return run_loop
+
+    def compile_FunctionDeclarationNode(self, node):
+        name = node.name.name
+        line_number = node.line_number
+        parameter_slots = tuple(param[0].slot for param in node.parameters)
+        function = CompiledFunction(name, parameter_slots, node.return_type, node.frame_size)
+        function.pure = node.pure
+        self.function_count += 1
+        outer_depth = self.depth
+        self.depth = node.depth
+        function.body = self.compile_block(node.block)
+        self.depth = outer_depth
+        functions = self.functions
+
+        # La función recuerda los frames visibles donde fue declarada.
+        def declare_function(frame):
+            if name in functions:
+                raise BloodCodeError(f"Función '{name}' ya ha sido declarada anteriormente.", line_number)
+            functions[name] = (function, frame[-1] + (frame,))
+            return None
+        return declare_function
+
+    def compile_FunctionCallNode(self, node):
+        function_name = node.identifier.name if isinstance(node.identifier, IdentifierNode) else node.identifier
+
+        if function_name == 'PRAY':
+            arguments = tuple(self.compile(argument) for argument in node.arguments)
+            append = self.interpreter.output.append
+            line_number = statement_line(node)
+
+            def pray(frame):
+                text = "".join(str(argument(frame)) for argument in arguments)
+                try:
+                    append(text)
+                except BudgetExceeded as e:
+                    raise BudgetExceeded(e.kind, e.limit, line_number) from None
+                return None
+            return pray
+
+        if function_name == 'EYES':
+            targets = tuple((var.name, self.store(var)) for var in node.arguments)
+            read_input = self.interpreter.read_eyes_input
+
+            def eyes(frame):
+                for var_name, store in targets:
+                    value = read_input(var_name)
+                    if value is None:
+                        return None
+                    store(frame, value)
+                return None
+            return eyes
+
+        arguments = tuple(self.compile(argument) for argument in node.arguments or [])
+
+        if function_name in BUILTINS:
+            builtin = BUILTINS[function_name]
+            return lambda frame: builtin(*[argument(frame) for argument in arguments])
+
+        functions = self.functions
+        budget = self.interpreter.budget
+        step = budget.step
+        memo = budget.memo
+        line_number = node.line_number
+
+        def call(frame):
+            entry = functions.get(function_name)
+            if entry is None:
+                raise Exception(f"Función no encontrada: {function_name}")
+            function, enclosing_frames = entry
+            step(line_number)
+            local_frame = [UNSET] * function.frame_size + [enclosing_frames]
+            for slot, argument in zip(function.parameter_slots, arguments):
+                local_frame[slot] = argument(frame)
+            key = None
+            if memo is not None and function.pure:
+                key = memo_key(function_name, [local_frame[slot] for slot in function.parameter_slots])
+                if key is not None:
+                    result = memo.lookup(key)
+                    if result is not MISSING:
+                        return result
+            # Las llamadas usan la pila de Python; si aun así se agota antes
+            # que max_depth, el error lo dice.
+            budget.enter(line_number)
+            try:
+                result = function.body(local_frame)
+            except RecursionError:
+                raise BudgetExceeded('stack', budget.depth, line_number) from None
+            finally:
+                budget.leave()
+            if result is None:
+                if function.return_type != 'Rom':
+                    raise Exception(f"La función '{function_name}' no retornó un valor.")
+                result = 0
+            if key is not None:
+                memo.store(key, result)
+            return result
+        return call
+
+
+def python_frames(budget, frames_per_call):
+    # Niveles de recursión de Python para max_depth llamadas anidadas, más
+    # los que el programa usaría sin ellas.
+    if budget.max_depth is None:
+        return MAX_PYTHON_FRAMES
+    return budget.max_depth * frames_per_call + sys.getrecursionlimit()
+
+
+class ClosureInterpreter(Interpreter):
+    def __init__(self, env):
+        super().__init__(env)
+        self.compiled_functions = {}
+
+    def execute(self, node):
+        node = ensure_resolved(node)
+        compiler = ClosureCompiler(self)
+        try:
+            program = compiler.compile_program(node)
+        except RecursionError:
+            # El compilador recorre las expresiones con la pila de Python; las
+            # demasiado largas las ejecuta el Interpreter, que no la usa.
+            return Interpreter.execute(self, node)
+        if not compiler.function_count:
+            return program()
+        return run_with_python_stack(program, python_frames(self.budget, 2 * compiler.max_nesting + 4))
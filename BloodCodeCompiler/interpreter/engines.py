@@ -0,0 +1,21 @@
+from interpreter.interpreter import Interpreter
+from interpreter.closure_compiler import ClosureInterpreter
+from interpreter.transpiler import TranspiledInterpreter
+from vm import VMInterpreter
+
+# Motores de ejecución seleccionables con el campo 'engine' de /execute.
+ENGINES = {
+    'interpreter': Interpreter,
+    'closures': ClosureInterpreter,
+    'python': TranspiledInterpreter,
+    'vm': VMInterpreter,
+}
+
+DEFAULT_ENGINE = 'interpreter'
+
+
+def get_engine(name=None):
+    engine = ENGINES.get(name or DEFAULT_ENGINE)
+    if engine is None:
+        raise Exception(f"Motor de ejecución desconocido: {name}. Disponibles: {', '.join(ENGINES)}")
+    return engine
@@ -1,49 +1,200 @@
-from parser.ast import ASTNode, NumberNode, IdentifierNode, BinaryOpNode, StringNode, DeclarationNode, BlockNode, IfStatementNode, LoopNode, FunctionCallNode, RestNode, BooleanNode, UnaryOpNode, FunctionDeclarationNode, ReturnNode, ArrayNode
+import operator
+
+from parser.ast import ASTNode, NumberNode, IdentifierNode, BinaryOpNode, StringNode, DeclarationNode, BlockNode, IfStatementNode, LoopNode, FunctionCallNode, RestNode, BooleanNode, UnaryOpNode, FunctionDeclarationNode, ReturnNode, ArrayNode, ConstantNode
+from interpreter.runtime import BloodCodeError, UNSET, scalar_default, statement_line, vector_index, matrix_index, tail_calls
+from interpreter.arrays import Matrix, BUILTINS
+from interpreter.budget import ExecutionBudget, BudgetExceeded
+from interpreter.memo import MISSING, memo_key
+from semantic_analyzer.Resolver import ensure_resolved
+
+
+def runtime_error(error, node):
+    # Un error de Python se traduce una sola vez, con la línea del nodo más
+    # interno que lo produjo; los que ya traen su línea pasan sin cambios.
+    if isinstance(error, BloodCodeError):
+        return error
+    return BloodCodeError(str(error), statement_line(node))
+
+
+def blood_and(left, right):
+    return bool(left) and bool(right)
+
+
+def blood_or(left, right):
+    return bool(left) or bool(right)
+
+
+def blood_not(left, right):
+    return not bool(right)
+
+
+# Operación de Python de cada operador binario, para operandos de cualquier
+# tipo (también arreglos completos).
+OPERATIONS = {
+    'PLUS': operator.add,
+    'MINUS': operator.sub,
+    'MULTIPLY': operator.mul,
+    'DIVIDE': operator.truediv,
+    'EQUAL': operator.eq,
+    'NOT': operator.ne,
+    'GREATER': operator.gt,
+    'LESS': operator.lt,
+    'GREATEREQUAL': operator.ge,
+    'LESSEQUAL': operator.le,
+    'BLOODBOND': blood_and,
+    'OLDBLOOD': blood_or,
+    'VILEBLOOD': blood_not,
+}
+
+ARITHMETIC_OPERATORS = ('PLUS', 'MINUS', 'MULTIPLY', 'DIVIDE')
+COMPARISON_OPERATORS = ('EQUAL', 'NOT', 'GREATER', 'LESS', 'GREATEREQUAL', 'LESSEQUAL')
+LOGICAL_OPERATORS = ('BLOODBOND', 'OLDBLOOD', 'VILEBLOOD')
+
+# Operación de cada par (operador, operand_type) que acepta el
+# SemanticAnalyzer. Eileen es siempre str y su suma es operator.concat. Los
+# demás pares quedan con la operación genérica:
+# - Maria: un valor puede ser float después de una división, así que
+#   int.__add__ y compañía devolverían NotImplemented.
+# - Gehrman: sólo se compara; los elementos de un vector Gehrman sin
+#   inicializar son "" y no float.
+# - Blood: los elementos de un vector Blood sin inicializar son "", así que
+#   la lógica sigue pasando por bool().
+TYPED_OPERATIONS = {('PLUS', 'EILEEN'): operator.concat}
+for name in ARITHMETIC_OPERATORS + COMPARISON_OPERATORS:
+    TYPED_OPERATIONS[(name, 'MARIA')] = OPERATIONS[name]
+for name in COMPARISON_OPERATORS:
+    TYPED_OPERATIONS[(name, 'GEHRMAN')] = OPERATIONS[name]
+    TYPED_OPERATIONS[(name, 'EILEEN')] = OPERATIONS[name]
+for name in LOGICAL_OPERATORS + COMPARISON_OPERATORS:
+    TYPED_OPERATIONS[(name, 'BLOOD')] = OPERATIONS[name]
+
+
+def operation_handler(operation):
+    # Manejador de un operador binario que sólo evalúa sus dos lados.
+    def execute_operation(node):
+        left_value = yield node.left
+        right_value = yield node.right
+        return operation(left_value, right_value)
+    return execute_operation
+
+
+class TailCall:
+    # Valor de una llamada de una función a sí misma en posición de cola:
+    # sube hasta la llamada en curso, que vuelve a ejecutar el cuerpo con
+    # este frame en lugar de anidar otra llamada.
+    __slots__ = ('frame',)
+
+    def __init__(self, frame):
+        self.frame = frame
+
 
 class Interpreter:
     def __init__(self, env):
         self.env = env
+        # 'context' sólo guarda la entrada pendiente para Eyes ('input_var');
+        # las variables viven en 'frames', una lista por profundidad con las
+        # posiciones que asignó el Resolver.
         self.context = {}
+        self.frames = []
         self.functions = {}
+        # Llamada en posición de cola -> función que la contiene.
+        self.tail_calls = {}
+        # Manejador especializado de cada BinaryOpNode ya ejecutado y el de
+        # cada operación.
+        self.binary_handlers = {}
+        self.operation_handlers = {}
         self.output = []
         self.prompt_var = None
         self.pending_input_var = None
+        # Si se asigna, Eyes pide el valor a esta función (que puede bloquear
+        # hasta que llegue la entrada) en lugar de cortar con prompt_var.
+        self.input_provider = None
+        # Límites de pasos, tiempo, elementos y llamadas anidadas; sin
+        # configurar sólo se limita la profundidad.
+        self.budget = ExecutionBudget()
+        # Nodos que no evalúan hijos: se ejecutan directamente.
+        self.leaves = {
+            NumberNode: self.execute_number,
+            StringNode: self.execute_string,
+            BooleanNode: self.execute_boolean,
+            IdentifierNode: self.execute_identifier,
+            ConstantNode: self.execute_constant,
+            RestNode: lambda _: None,
+            FunctionDeclarationNode: self.execute_function_declaration,
+        }
+        # El resto son generadores que piden sus hijos con `yield`.
+        self.handlers = {
+            BlockNode: self.execute_block,
+            DeclarationNode: self.execute_declaration,
+            BinaryOpNode: self.execute_binary_op,
+            IfStatementNode: self.execute_if_statement,
+            LoopNode: self.execute_loop,
+            FunctionCallNode: self.execute_function_call,
+            UnaryOpNode: self.execute_unary_op,
+            ArrayNode: self.execute_array,
+            ReturnNode: self.execute_return,
+        }
 
     def execute(self, node):
-        try:
-            node_type_to_function = {
-                BlockNode: self.execute_block,
-                DeclarationNode: self.execute_declaration,
-                BinaryOpNode: self.execute_binary_op,
-                NumberNode: self.execute_number,
-                StringNode: self.execute_string,
-                BooleanNode: self.execute_boolean,
-                IdentifierNode: self.execute_identifier,
-                IfStatementNode: self.execute_if_statement,
-                LoopNode: self.execute_loop,
-                FunctionCallNode: self.execute_function_call,
-                UnaryOpNode: self.execute_unary_op,
-                FunctionDeclarationNode: self.execute_function_declaration,
-                RestNode: lambda _: None,
-                ArrayNode: self.execute_array,
-                ReturnNode: self.execute_return,
-            }
-
-            execute_func = node_type_to_function.get(type(node))
-            if execute_func:
-                return execute_func(node)
+        # Evalúa el árbol con una pila explícita en lugar de la pila de
+        # Python: cada manejador es un generador que hace `yield` del nodo
+        # hijo que necesita y recibe su valor. Ni la recursión de BloodCode ni
+        # el largo de una expresión dependen de sys.getrecursionlimit; la
+        # profundidad de las llamadas la limita el presupuesto (max_depth).
+        # Literales y variables se evalúan sin generador.
+        leaves = self.leaves
+        handlers = self.handlers
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        value = None
+        error = None
+        while True:
+            leaf = leaves.get(type(node))
+            if leaf is not None:
+                try:
+                    value = leaf(node)
+                except Exception as e:
+                    error = runtime_error(e, node)
             else:
-                raise Exception(f"Nodo no soportado: {type(node)}")
-
-        except Exception as e:
-            line_info = f"en la línea {node.line_number}" if node and hasattr(node, 'line_number') else "en una línea desconocida"
-            raise Exception(f"Error {line_info}: {str(e)}")
+                handler = handlers.get(type(node))
+                if handler is not None:
+                    push((handler(node), node))
+                    value = None
+                else:
+                    error = BloodCodeError(f"Nodo no soportado: {type(node)}", getattr(node, 'line_number', None))
+
+            # Se reanudan los generadores hasta que uno pida otro nodo. Un
+            # error se lanza dentro del generador que esperaba el valor, así
+            # sus try/finally (los frames de una llamada) se ejecutan.
+            while stack:
+                generator, current = stack[-1]
+                try:
+                    if error is None:
+                        node = generator.send(value)
+                    else:
+                        node = generator.throw(error)
+                        error = None
+                    break
+                except StopIteration as stop:
+                    pop()
+                    value = stop.value
+                except Exception as e:
+                    pop()
+                    error = runtime_error(e, current)
+            else:
+                if error is not None:
+                    raise error
+                return value
 
     def execute_number(self, node):
         if float(node.value).is_integer():
             return int(node.value)
         return float(node.value)
 
+    def execute_constant(self, node):
+        return node.value
+
     def execute_string(self, node):
         return node.value
 
@@ -51,71 +202,118 @@ class Interpreter:
         return True if str(node.value).lower() == 'true' else False
 
     def execute_identifier(self, node):
-        if node.name in self.context:
-            return self.context[node.name]
-        elif node.name in self.env.global_context:
-            return self.env.global_context[node.name]
-        else:
-            raise Exception(f"Error en la línea {node.line_number}: La variable '{node.name}' no ha sido declarada en el contexto actual.")
+        value = self.frames[node.depth][node.slot]
+        if value is UNSET:
+            raise BloodCodeError(f"La variable '{node.name}' no ha sido declarada en el contexto actual.", node.line_number)
+        return value
 
     def execute_function_call(self, node):
         function_name = node.identifier.name if isinstance(node.identifier, IdentifierNode) else node.identifier
 
         if function_name == 'PRAY':
-            full_message = "".join(str(self.execute(expr)) for expr in node.arguments)
-            self.output.append(full_message)
+            parts = []
+            for expr in node.arguments:
+                parts.append(str((yield expr)))
+            try:
+                self.output.append("".join(parts))
+            except BudgetExceeded as e:
+                # El límite de salida lo aplica la salida transmitida, que no
+                # conoce la línea del Pray.
+                raise BudgetExceeded(e.kind, e.limit, statement_line(node)) from None
             return None
 
         elif function_name == 'EYES':
             for var in node.arguments:
-                var_name = var.name if isinstance(var, IdentifierNode) else var
-                var_type = self.env.get_variable_type(var_name)
-
-                if 'input_var' in self.context:
-                    value = self.context['input_var']
-
-                    if isinstance(var_type, tuple):
-                        element_type = var_type[0]
-                        if element_type == 'MARIA':  
-                            value = [int(v) for v in value.split()]  
-                        elif element_type == 'EILEEN':  
-                            value = value.split()  
-                        else:
-                            raise Exception(f"Tipo no soportado para 'Eyes': {element_type}")
-                    else:
-                        if var_type == 'MARIA':
-                            value = int(value)  
-                        elif var_type == 'EILEEN':
-                            value = str(value)  
-                        else:
-                            raise Exception(f"Tipo no soportado para 'Eyes': {var_type}")
-
-                    self.context[var_name] = value
-                    del self.context['input_var']
-                    self.pending_input_var = None
-                else:
-                    self.prompt_var = f"Ingrese valor para la variable {var_name}"
-                    self.pending_input_var = var_name
+                value = self.read_eyes_input(var.name)
+                if value is None:
                     return None  
+                self.frames[var.depth][var.slot] = value
+
+        elif function_name in BUILTINS:
+            arguments = []
+            for arg in node.arguments:
+                arguments.append((yield arg))
+            return BUILTINS[function_name](*arguments)
 
         elif function_name in self.functions:
-            func = self.functions[function_name]
-            local_context = {}
+            func, enclosing_frames = self.functions[function_name]
+            self.budget.step(node.line_number)
+            frame = [UNSET] * func.frame_size
 
             for param, arg in zip(func.parameters, node.arguments or []):
-                param_name = param[0].name
-                local_context[param_name] = self.execute(arg)
-
-            result = self.execute_block_with_context(func.block, local_context)
+                frame[param[0].slot] = yield arg
+
+            if self.tail_calls.get(node) is func:
+                return TailCall(frame)
+
+            memo = self.budget.memo if func.pure else None
+            key = None
+            if memo is not None:
+                key = memo_key(function_name, [frame[param[0].slot] for param in func.parameters])
+                if key is not None:
+                    result = memo.lookup(key)
+                    if result is not MISSING:
+                        return result
+
+            # El cuerpo corre con los frames donde se declaró la función más
+            # el suyo; los del llamador se restauran aunque haya un error.
+            self.budget.enter(node.line_number)
+            previous_frames = self.frames
+            self.frames = enclosing_frames + [frame]
+            try:
+                result = yield func.block
+                while type(result) is TailCall:
+                    self.frames[-1] = result.frame
+                    result = yield func.block
+            finally:
+                self.frames = previous_frames
+                self.budget.leave()
 
             if result is None and func.return_type != 'Rom':
                 raise Exception(f"La función '{function_name}' no retornó un valor.")
 
-            return result if result is not None else 0  
+            result = result if result is not None else 0
+            if key is not None:
+                memo.store(key, result)
+            return result
 
         else:
             raise Exception(f"Función no encontrada: {function_name}")
 
+    def read_eyes_input(self, var_name):
+        # Devuelve el valor leído ya convertido, o None si hay que pedirlo al
+        # cliente (queda en prompt_var).
+        var_type = self.env.get_variable_type(var_name)
+        if self.input_provider is not None:
+            with self.budget.paused():
+                value = self.input_provider(self.input_prompt(var_name))
+            return self._convert_eyes_value(var_type, value)
+        if 'input_var' in self.context:
+            value = self._convert_eyes_value(var_type, self.context.pop('input_var'))
+            self.pending_input_var = None
+            return value
+        self.prompt_var = self.input_prompt(var_name)
+        self.pending_input_var = var_name
+        return None
+
+    def input_prompt(self, var_name):
+        return f"Ingrese valor para la variable {var_name}"
+
+    def _convert_eyes_value(self, var_type, value):
+        if isinstance(var_type, tuple):
+            element_type = var_type[0]
+            if element_type == 'MARIA':  
+                return [int(v) for v in value.split()]  
+            elif element_type == 'EILEEN':  
+                return value.split()  
+            raise Exception(f"Tipo no soportado para 'Eyes': {element_type}")
+
+        if var_type == 'MARIA':
+            return int(value)  
+        elif var_type == 'EILEEN':
+            return str(value)  
+        raise Exception(f"Tipo no soportado para 'Eyes': {var_type}")
+
     def _convert_input_value(self, var_type, value, var_name):
         try:
             if var_type == 'MARIA':  
@@ -127,36 +325,14 @@ class Interpreter:
         except ValueError:
             raise Exception(f"Error: Se esperaba un valor numérico para '{var_name}'")
 
-    def _execute_user_defined_function(self, node):
-        func = self.functions.get(node.identifier.name)
-        if func is None:
-            raise Exception(f"Función '{node.identifier.name}' no encontrada.")
-        local_context = self.context.copy()
-
-        for param, arg in zip(func.parameters, node.arguments):
-            local_context[param[0].name] = self.execute(arg)
-
-        return self.execute_block_with_context(func.block, local_context)
-
-    def execute_block_with_context(self, block, context):
-        previous_context = self.context
-        self.context = context 
-        result = None
-
-        for statement in block.statements:
-            result = self.execute(statement)
-            if isinstance(statement, ReturnNode):
-                result = self.execute(statement.expression)  
-                break  
-
-        self.context = previous_context  
-        return result if result is not None else None
-
     def execute_return(self, node):
-        return self.execute(node.expression)
+        return (yield node.expression)
 
     def execute_array(self, node):
-        return [self.execute(element) for element in node.elements]
+        elements = []
+        for element in node.elements:
+            elements.append((yield element))
+        return elements
 
     def execute_declaration(self, node):
         for identifier in node.identifier_list:
@@ -164,221 +340,180 @@ class Interpreter:
 
             if isinstance(node.var_type, tuple):
                 element_type = node.var_type[0]
-                size1 = self.execute(node.var_type[1]) if node.var_type[1] else 0
+                size1 = (yield node.var_type[1]) if node.var_type[1] else 0
 
                 if len(node.var_type) == 2:
-                    if isinstance(node.expression, ArrayNode):
-                        init_value = self.execute(node.expression)
-                        if len(init_value) != size1:
-                            raise Exception(f"Tamaño del array '{identifier.name}' no coincide con la inicialización.")
-                        value = init_value
-                    else:
-                        value = [0] * size1 if element_type == 'MARIA' else [""] * size1
+                    init_value = (yield node.expression) if isinstance(node.expression, ArrayNode) else None
+                    value = self.budget.new_vector(element_type, size1, init_value, identifier.name, node.line_number)
 
                 elif len(node.var_type) == 3:
-                    size2 = self.execute(node.var_type[2]) if node.var_type[2] else 0
-                    value = [[0] * size2 for _ in range(size1)] if element_type == 'MARIA' else [[""] * size2 for _ in range(size1)]
-
-                    if isinstance(node.expression, ArrayNode):
-                        init_value = self.execute(node.expression)
-                        if len(init_value) != size1:
-                            raise Exception(f"Tamaño de la matriz '{identifier.name}' no coincide con la inicialización.")
-                        for i, row in enumerate(init_value):
-                            if len(row) != size2:
-                                raise Exception(f"Tamaño de fila {i} en la matriz '{identifier.name}' no coincide con la inicialización.")
-                        value = init_value
+                    size2 = (yield node.var_type[2]) if node.var_type[2] else 0
+                    init_value = (yield node.expression) if isinstance(node.expression, ArrayNode) else None
+                    value = self.budget.new_matrix(element_type, size1, size2, init_value, identifier.name, node.line_number)
 
             elif node.expression:
-                value = self.execute(node.expression)
+                value = yield node.expression
             else:
-                value = "" if node.var_type == 'EILEEN' else 0
-            self.context[identifier.name] = value
+                value = scalar_default(node.var_type)
+            self.frames[identifier.depth][identifier.slot] = value
         return None
     
-    def _get_base_identifier_name(self, node):
+    def _get_base_identifier(self, node):
         current_node = node
         while isinstance(current_node, BinaryOpNode) and current_node.operator == 'INDEX':
             current_node = current_node.left
         if isinstance(current_node, IdentifierNode):
-            return current_node.name
+            return current_node
         else:
             raise Exception("Acceso de matriz inválido: falta el identificador base.")
 
+    def _get_array(self, node):
+        base = self._get_base_identifier(node)
+        array = self.frames[base.depth][base.slot]
+        if array is UNSET:
+            raise Exception(f"Variable no definida: {base.name}")
+        return base.name, array
+
     def execute_binary_op(self, node):
-        if node.operator in ['ASSIGN', 'ARROW_ASSIGN']:
-            right_value = self.execute(node.right)
-            if right_value is None:
-                raise Exception(f"Error en la línea {node.line_number}: No se puede asignar un valor no inicializado a '{node.left}'.")
+        # Devuelve el generador del manejador especializado del nodo, elegido
+        # la primera vez según el operador, el destino y operand_type.
+        handler = self.binary_handlers.get(node)
+        if handler is None:
+            handler = self.binary_handlers[node] = self.select_binary_handler(node)
+        return handler(node)
+
+    def select_binary_handler(self, node):
+        if node.operator in ('ASSIGN', 'ARROW_ASSIGN'):
             if isinstance(node.left, IdentifierNode):
-                if self.env.get_variable_type(node.left.name) == 'Blood':
-                    right_value = bool(right_value)
-                self.context[node.left.name] = right_value
-                return right_value
-
-            elif isinstance(node.left, BinaryOpNode) and node.left.operator == 'INDEX':
-                base_name = self._get_base_identifier_name(node.left)
-                array = self.context.get(base_name)
-                if array is None:
-                    raise Exception(f"Variable no definida: {base_name}")
-
-                if isinstance(array[0], list):  
-                    row_index = int(self.execute(node.left.left.right))
-                    col_index = int(self.execute(node.left.right))
-                    if not (0 <= row_index < len(array)) or not (0 <= col_index < len(array[0])):
-                        raise Exception(f"Índice fuera de rango en la matriz '{base_name}'")
-                    array[row_index][col_index] = right_value
-                else:  
-                    index = int(self.execute(node.left.right))
-                    if not (0 <= index < len(array)):
-                        raise Exception(f"Índice fuera de rango en el vector '{base_name}'")
-                    array[index] = right_value
-
-                return right_value
-
-        elif node.operator == 'INDEX':
-            base_name = self._get_base_identifier_name(node.left)
-            array = self.context.get(base_name)
-            if array is None:
-                raise Exception(f"Variable no definida: {base_name}")
-
-            if isinstance(array[0], list): 
-                row_index = int(self.execute(node.left.right))
-                col_index = int(self.execute(node.right))
-                if not (0 <= row_index < len(array)) or not (0 <= col_index < len(array[0])):
-                    raise Exception(f"Índice fuera de rango en la matriz '{base_name}'")
-                return array[row_index][col_index]
-            else: 
-                index = int(self.execute(node.right))
-                if not (0 <= index < len(array)):
-                    raise Exception(f"Índice fuera de rango en el vector '{base_name}'")
-                return array[index]
-
-        left_value = self.execute(node.left)
-        right_value = self.execute(node.right)
-
-        if node.operator == 'BLOODBOND':  
-            return bool(left_value) and bool(right_value)
-        elif node.operator == 'OLDBLOOD':  
-            return bool(left_value) or bool(right_value)
-        elif node.operator == 'VILEBLOOD': 
-            return not bool(right_value)
-
-        if node.operator == 'EQUAL':
-            return left_value == right_value
-        elif node.operator == 'NOT':
-            return left_value != right_value
-
-        elif node.operator == 'GREATER':
-            return left_value > right_value
-        elif node.operator == 'LESS':
-            return left_value < right_value
-        elif node.operator == 'GREATEREQUAL':
-            return left_value >= right_value
-        elif node.operator == 'LESSEQUAL':
-            return left_value <= right_value
-        elif node.operator == 'MULTIPLY':
-            if left_value is None or right_value is None:
-                raise Exception(f"Valor inesperado 'None' en la recursión: left_value={left_value}, right_value={right_value}")
-            return left_value * right_value
-        elif node.operator in ['PLUS', 'MINUS', 'MULTIPLY', 'DIVIDE']:
-            return self._execute_arithmetic_op(node.operator, left_value, right_value)
-
+                return self.execute_variable_assignment
+            if isinstance(node.left, BinaryOpNode) and node.left.operator == 'INDEX':
+                return self.execute_element_assignment
+            return self.execute_invalid_assignment
+        if node.operator == 'INDEX':
+            return self.execute_index
+        operation = TYPED_OPERATIONS.get((node.operator, node.operand_type)) or OPERATIONS.get(node.operator)
+        if operation is None:
+            return self.execute_unsupported_operator
+        handler = self.operation_handlers.get(operation)
+        if handler is None:
+            handler = self.operation_handlers[operation] = operation_handler(operation)
+        return handler
+
+    def execute_variable_assignment(self, node):
+        # Los tipos ya los comprobó el SemanticAnalyzer: el valor se guarda
+        # sin buscar el tipo de la variable.
+        right_value = yield node.right
+        if right_value is None:
+            raise BloodCodeError(f"No se puede asignar un valor no inicializado a '{node.left}'.", node.line_number)
+        self.frames[node.left.depth][node.left.slot] = right_value
+        return right_value
+
+    def execute_invalid_assignment(self, node):
+        yield node.right
+        raise Exception("Asignación inválida")
+
+    def execute_unsupported_operator(self, node):
+        yield node.left
+        yield node.right
         raise Exception(f"Operador no soportado: {node.operator}")
 
-
-    def _execute_arithmetic_op(self, operator, left_value, right_value):
-        if operator == 'PLUS':
-            return left_value + right_value
-        elif operator == 'MINUS':
-            return left_value - right_value
-        elif operator == 'MULTIPLY':
-            return left_value * right_value
-        elif operator == 'DIVIDE':
-            return left_value / right_value
-        raise Exception(f"Operador aritmético no soportado: {operator}")
-
-    def _execute_comparison_op(self, operator, left_value, right_value):
-        if operator == 'EQUAL':
-            return left_value == right_value
-        elif operator == 'NOT':
-            return left_value != right_value
-        elif operator == 'GREATER':
-            return left_value > right_value
-        elif operator == 'LESS':
-            return left_value < right_value
-        elif operator == 'GREATEREQUAL':
-            return left_value >= right_value
-        elif operator == 'LESSEQUAL':
-            return left_value <= right_value
-        raise Exception(f"Operador comparativo no soportado: {operator}")
-
-    def _execute_logical_op(self, operator, left_value, right_value):
-        if operator == 'BLOODBOND':  
-            return bool(left_value) and bool(right_value)
-        elif operator == 'OLDBLOOD': 
-            return bool(left_value) or bool(right_value)
-        elif operator == 'VILEBLOOD':
-            return not bool(right_value)
-        raise Exception(f"Operador lógico no soportado: {operator}")
+    def execute_element_assignment(self, node):
+        right_value = yield node.right
+        if right_value is None:
+            raise BloodCodeError(f"No se puede asignar un valor no inicializado a '{node.left}'.", node.line_number)
+        base_name, array = self._get_array(node.left)
+
+        if isinstance(array, Matrix):
+            row_index = yield node.left.left.right
+            col_index = yield node.left.right
+            if node.left.bounds_check:
+                array.put(matrix_index(array, row_index, col_index, base_name), right_value)
+            else:
+                array.put(row_index * array.cols + col_index, right_value)
+        elif node.left.bounds_check:
+            array.put(vector_index(array, (yield node.left.right), base_name), right_value)
+        else:
+            array.put((yield node.left.right), right_value)
+
+        return right_value
+
+    def execute_index(self, node):
+        base_name, array = self._get_array(node.left)
+
+        # Sin bounds_check el optimizador ya probó que el índice es válido.
+        if isinstance(array, Matrix):
+            row_index = yield node.left.right
+            col_index = yield node.right
+            if node.bounds_check:
+                return array.data[matrix_index(array, row_index, col_index, base_name)]
+            return array.data[row_index * array.cols + col_index]
+        elif node.bounds_check:
+            return array.data[vector_index(array, (yield node.right), base_name)]
+        else:
+            return array.data[(yield node.right)]
 
     def execute_unary_op(self, node):
-        operand_value = self.execute(node.operand)
+        operand_value = yield node.operand
         if node.operator == 'VILEBLOOD':
             return not operand_value
         else:
             raise Exception(f"Operador unario no soportado: {node.operator}")
 
     def execute_if_statement(self, node):
-        print(f"Evaluando IF: condición -> {node.condition}")
         result = None
 
-        if self.execute(node.condition):
+        if (yield node.condition):
             if node.true_block is not None:
-                result = self.execute(node.true_block)
+                result = yield node.true_block
                 return result
         else:
             current_node = node
             while isinstance(current_node.false_block, IfStatementNode):
                 current_node = current_node.false_block
-                if self.execute(current_node.condition):
+                if (yield current_node.condition):
                     if current_node.true_block is not None:
-                        result = self.execute(current_node.true_block)
+                        result = yield current_node.true_block
                     return result
 
             if current_node.false_block:
-                result = self.execute(current_node.false_block)
+                result = yield current_node.false_block
 
-        print(f"Resultado del IF: {result}")
         return result if result is not None else 0  
 
     def execute_loop(self, node):
-        try:
-            if node.init:
-                self.execute(node.init)
-            
-            if node.condition is None:
-                raise Exception("La condición del bucle no está definida.")
-
-            while self.execute(node.condition):
-                self.execute(node.block)
+        if node.init:
+            yield node.init
+        
+        if node.condition is None:
+            raise Exception("La condición del bucle no está definida.")
 
-                if node.increment:
-                    self.execute(node.increment)
+        budget = self.budget
+        while (yield node.condition):
+            budget.step(node.line_number)
+            yield node.block
 
-        except Exception as e:
-            line_info = f"en la línea {node.line_number}" if node.line_number else "en una línea desconocida"
-            raise Exception(f"Error en el bucle {line_info}: {str(e)}")
+            if node.increment:
+                yield node.increment
 
     def execute_function_declaration(self, node):
         if node.name.name in self.functions:
             raise Exception(f"Función '{node.name.name}' ya ha sido declarada anteriormente.")
 
-        self.functions[node.name.name] = node
+        # La función guarda los frames en los que fue declarada para poder
+        # leer las variables de los niveles exteriores.
+        self.functions[node.name.name] = (node, self.frames)
+        for call in tail_calls(node):
+            self.tail_calls[call] = node
 
     def execute_block(self, node):
+        # El bloque principal (el único con frame_size) crea el frame global.
+        if not self.frames:
+            ensure_resolved(node)
+        if node.frame_size is not None:
+            self.frames = [[UNSET] * node.frame_size]
         result = None
         for statement in node.statements:
-            result = self.execute(statement)
+            result = yield statement
             if isinstance(statement, ReturnNode):
                 return result
         return result
@@ -0,0 +1,67 @@
+MISSING = object()
+
+# Sólo se memorizan llamadas con argumentos de estos tipos. El tipo va en la
+# clave: 2 y 2.0 o 1 y True son iguales como claves de un dict pero se
+# imprimen distinto. Los float quedan fuera porque 0.0 y -0.0 también lo son.
+KEY_TYPES = (int, str, bool)
+
+# Resultados que se pueden compartir entre llamadas sin copiarlos.
+VALUE_TYPES = (int, float, str, bool)
+
+
+def memo_key(name, arguments):
+    key = [name]
+    for argument in arguments:
+        kind = type(argument)
+        if kind not in KEY_TYPES:
+            return None
+        key.append(kind)
+        key.append(argument)
+    return tuple(key)
+
+
+class MemoTable:
+    # Resultados de las llamadas a funciones puras durante una ejecución. La
+    # tabla no crece más allá de max_entries (None = sin límite): cuando se
+    # llena se siguen usando las entradas guardadas pero no se agregan más.
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        value = self.entries.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def store(self, key, value):
+        if type(value) in VALUE_TYPES and (self.max_entries is None or len(self.entries) < self.max_entries):
+            self.entries[key] = value
+
+    def wrap(self, name, function):
+        # Para los motores en los que una función de BloodCode es una función
+        # de Python que recibe los argumentos.
+        def memoized(*arguments):
+            key = memo_key(name, arguments)
+            if key is None:
+                return function(*arguments)
+            value = self.lookup(key)
+            if value is MISSING:
+                value = function(*arguments)
+                self.store(key, value)
+            return value
+        return memoized
+
+    def stats(self):
+        calls = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'hit_rate': self.hits / calls if calls else 0.0,
+        }
@@ -0,0 +1,184 @@
+import time
+
+from parser.ast import ASTNode, IdentifierNode, NumberNode, StringNode, BooleanNode, ConstantNode, BlockNode, IfStatementNode, LoopNode, FunctionDeclarationNode, RestNode
+from interpreter.interpreter import Interpreter
+
+# Líneas con más tiempo propio que se muestran en el resumen.
+HOTSPOT_COUNT = 5
+
+LEAF_NODES = (IdentifierNode, NumberNode, StringNode, BooleanNode, ConstantNode)
+
+
+def source_line(node):
+    # Muchas sentencias guardan la línea del token que sigue a su ';'. Los
+    # identificadores y literales guardan la propia, así que la línea de la
+    # sentencia es la menor de ellos (sin entrar en sus bloques).
+    if isinstance(node, (LoopNode, FunctionDeclarationNode)):
+        return node.line_number
+    lines = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, LEAF_NODES):
+            if current.line_number is not None:
+                lines.append(current.line_number)
+        elif isinstance(current, ASTNode) and not isinstance(current, BlockNode):
+            stack.extend(current.field_values())
+        elif isinstance(current, (list, tuple)):
+            stack.extend(current)
+    return min(lines) if lines else node.line_number
+
+
+class ProfileEntry:
+    def __init__(self, line_number):
+        self.line_number = line_number
+        self.hits = 0
+        self.time = 0.0
+        self.self_time = 0.0
+        # Ejecuciones en curso: con recursión el tiempo acumulado sólo se
+        # suma al terminar la más externa.
+        self.active = 0
+
+    def times(self):
+        return {'time_ms': round(self.time * 1000, 3), 'self_time_ms': round(self.self_time * 1000, 3)}
+
+
+class LoopProfile(ProfileEntry):
+    def __init__(self, line_number, function, depth):
+        super().__init__(line_number)
+        self.function = function
+        self.depth = depth
+        self.iterations = 0
+
+
+class ProfilingInterpreter(Interpreter):
+    # Interpreter instrumentado para action 'profile' de /execute: mide cada
+    # sentencia (agrupada por línea), cada llamada a una función GreatOnes y
+    # cada Nightmare/Dream. El Interpreter normal no se modifica, así que la
+    # medición no cuesta nada cuando no se usa.
+    def __init__(self, env):
+        super().__init__(env)
+        # id(nodo) -> entrada de su línea / id(bloque de un bucle) -> bucle
+        self.statements = {}
+        self.loop_blocks = {}
+        self.lines = {}
+        self.loops = {}
+        self.calls = {}
+        # Tiempo de los hijos de cada medición abierta, para el tiempo propio.
+        self.line_children = []
+        self.call_children = []
+        self.loop_children = []
+        self.started = None
+        self.total_time = 0.0
+        # Las sentencias sin hijos también se miden: pasan a ser generadores.
+        for node_type in (FunctionDeclarationNode, RestNode):
+            self.handlers[node_type] = self.leaf_statement(self.leaves.pop(node_type))
+        # Cada generador pasa por `profiled`, que decide si se mide el nodo.
+        self.handlers = {node_type: self.profiled(handler) for node_type, handler in self.handlers.items()}
+
+    def execute(self, node):
+        self.collect(node)
+        self.started = time.perf_counter()
+        try:
+            return super().execute(node)
+        finally:
+            self.total_time = time.perf_counter() - self.started
+
+    def profiled(self, handler):
+        def run(node):
+            entry = self.statements.get(id(node))
+            if entry is not None:
+                return self.measure(entry, self.line_children, handler, node)
+            loop = self.loop_blocks.get(id(node))
+            if loop is not None:
+                loop.iterations += 1
+            return handler(node)
+        return run
+
+    def leaf_statement(self, leaf):
+        def run(node):
+            return leaf(node)
+            yield
+        return run
+
+    def execute_function_call(self, node):
+        function_name = node.identifier.name if isinstance(node.identifier, IdentifierNode) else node.identifier
+        if function_name not in self.functions:
+            return (yield from super().execute_function_call(node))
+        entry = self.calls.get(function_name)
+        if entry is None:
+            entry = self.calls[function_name] = ProfileEntry(self.functions[function_name][0].line_number)
+        return (yield from self.measure(entry, self.call_children, super().execute_function_call, node))
+
+    def execute_loop(self, node):
+        return (yield from self.measure(self.loops[id(node)], self.loop_children, super().execute_loop, node))
+
+    def measure(self, entry, children, run, node):
+        # Generador alrededor del manejador del nodo: el tiempo incluye el de
+        # los hijos, que se evalúan mientras está suspendido.
+        entry.hits += 1
+        entry.active += 1
+        children.append(0.0)
+        start = time.perf_counter()
+        try:
+            return (yield from run(node))
+        finally:
+            elapsed = time.perf_counter() - start
+            entry.self_time += elapsed - children.pop()
+            entry.active -= 1
+            if not entry.active:
+                entry.time += elapsed
+            if children:
+                children[-1] += elapsed
+
+    # Recorrido previo del AST: qué nodos son sentencias y en qué bucle y
+    # función está cada una.
+
+    def collect(self, block, function=None, depth=0):
+        for statement in block.statements:
+            self.collect_statement(statement, function, depth)
+
+    def collect_statement(self, node, function, depth):
+        line_number = source_line(node)
+        entry = self.lines.get(line_number)
+        if entry is None:
+            entry = self.lines[line_number] = ProfileEntry(line_number)
+        self.statements[id(node)] = entry
+
+        if isinstance(node, LoopNode):
+            loop = LoopProfile(node.line_number, function, depth)
+            self.loops[id(node)] = loop
+            self.loop_blocks[id(node.block)] = loop
+            for part in (node.init, node.increment):
+                if part is not None:
+                    self.collect_statement(part, function, depth)
+            self.collect(node.block, function, depth + 1)
+        elif isinstance(node, IfStatementNode):
+            current_node = node
+            while True:
+                if current_node.true_block is not None:
+                    self.collect(current_node.true_block, function, depth)
+                if not isinstance(current_node.false_block, IfStatementNode):
+                    break
+                current_node = current_node.false_block
+            if current_node.false_block:
+                self.collect(current_node.false_block, function, depth)
+        elif isinstance(node, FunctionDeclarationNode):
+            self.collect(node.block, node.name.name, 0)
+
+    def report(self):
+        lines = [dict(line=entry.line_number, hits=entry.hits, **entry.times())
+                 for entry in sorted(self.lines.values(), key=lambda entry: entry.line_number or 0) if entry.hits]
+        functions = [dict(name=name, line=entry.line_number, calls=entry.hits, **entry.times())
+                     for name, entry in self.calls.items()]
+        loops = [dict(line=loop.line_number, function=loop.function, depth=loop.depth, runs=loop.hits,
+                      iterations=loop.iterations, **loop.times())
+                 for loop in sorted(self.loops.values(), key=lambda loop: loop.line_number or 0) if loop.hits]
+        hotspots = sorted(lines, key=lambda line: line['self_time_ms'], reverse=True)[:HOTSPOT_COUNT]
+        return {
+            'total_time_ms': round(self.total_time * 1000, 3),
+            'lines': lines,
+            'functions': functions,
+            'loops': loops,
+            'hotspots': hotspots,
+        }
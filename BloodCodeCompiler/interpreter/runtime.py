@@ -0,0 +1,199 @@
+import sys
+import threading
+
+from parser.ast import ReturnNode, BlockNode, IfStatementNode, FunctionCallNode, IdentifierNode
+from interpreter.arrays import Vector, Matrix, make_buffer, filled_buffer
+
+# Funciones compartidas por los motores de ejecución para que todos respeten
+# la misma semántica que el Interpreter.
+
+# Los motores 'closures' y 'python' hacen cada llamada de BloodCode con
+# llamadas de Python. Para que su profundidad la fije max_depth, el programa
+# corre en un hilo con un límite de recursión y una pila de C a su medida;
+# MAX_PYTHON_FRAMES acota lo que se reserva.
+MAX_PYTHON_FRAMES = 1000000
+STACK_BYTES_PER_FRAME = 1024
+
+_stack_lock = threading.Lock()
+_stack_runs = 0
+_base_recursion_limit = None
+
+
+class BloodCodeError(Exception):
+    # Error de ejecución que ya incluye la línea de BloodCode.
+    def __init__(self, message, line_number=None):
+        self.line_number = line_number
+        line_info = f"en la línea {line_number}" if line_number is not None else "en una línea desconocida"
+        super().__init__(f"Error {line_info}: {message}")
+
+
+class Unset:
+    def __repr__(self):
+        return 'UNSET'
+
+
+UNSET = Unset()
+
+
+def decode_number(value):
+    if float(value).is_integer():
+        return int(value)
+    return float(value)
+
+
+def reachable_statements(block):
+    # Un Echoes termina el bloque en el que aparece: lo que viene después no
+    # se ejecuta nunca.
+    statements = []
+    for statement in block.statements:
+        statements.append(statement)
+        if isinstance(statement, ReturnNode):
+            break
+    return statements
+
+
+def statement_line(statement):
+    # El parser guarda en Echoes, Pray, Eyes y las llamadas la línea del
+    # token que sigue al ';'. La real es la de la expresión de Echoes, el
+    # nombre de la función llamada o el primer argumento de Pray y Eyes.
+    if isinstance(statement, ReturnNode):
+        return statement.expression.line_number
+    if isinstance(statement, FunctionCallNode):
+        if isinstance(statement.identifier, IdentifierNode):
+            return statement.identifier.line_number
+        if statement.arguments:
+            return statement.arguments[0].line_number
+    return statement.line_number
+
+
+def tail_calls(function):
+    # Llamadas de la función a sí misma cuyo valor es directamente el de la
+    # función: un `Echoes f(...)` que es la última sentencia alcanzable del
+    # cuerpo o de los bloques e Insight con los que termina. Un Echoes dentro
+    # de un Insight que no es lo último sólo termina ese bloque.
+    name = function.name.name
+    calls = []
+    blocks = [function.block]
+    while blocks:
+        statements = reachable_statements(blocks.pop())
+        if not statements:
+            continue
+        last = statements[-1]
+        if isinstance(last, ReturnNode):
+            call = last.expression
+            if isinstance(call, FunctionCallNode) and isinstance(call.identifier, IdentifierNode) and call.identifier.name == name:
+                calls.append(call)
+        elif isinstance(last, BlockNode):
+            blocks.append(last)
+        elif isinstance(last, IfStatementNode):
+            branch = last
+            while isinstance(branch, IfStatementNode):
+                if branch.true_block is not None:
+                    blocks.append(branch.true_block)
+                branch = branch.false_block
+            if branch is not None:
+                blocks.append(branch)
+    return calls
+
+
+def scalar_default(var_type):
+    return "" if var_type == 'EILEEN' else 0
+
+
+def new_vector(element_type, size, init, name):
+    if init is not None:
+        if len(init) != size:
+            raise Exception(f"Tamaño del array '{name}' no coincide con la inicialización.")
+        return Vector(make_buffer(init))
+    return Vector(filled_buffer(0 if element_type == 'MARIA' else "", size))
+
+
+def new_matrix(element_type, rows, cols, init, name):
+    if init is not None:
+        if len(init) != rows:
+            raise Exception(f"Tamaño de la matriz '{name}' no coincide con la inicialización.")
+        for i, row in enumerate(init):
+            if len(row) != cols:
+                raise Exception(f"Tamaño de fila {i} en la matriz '{name}' no coincide con la inicialización.")
+        return Matrix(rows, cols, make_buffer([value for row in init for value in row]))
+    rows = max(rows, 0)
+    cols = max(cols, 0)
+    return Matrix(rows, cols, filled_buffer(0 if element_type == 'MARIA' else "", rows * cols))
+
+
+def vector_index(vector, index, name):
+    index = int(index)
+    if not (0 <= index < len(vector.data)):
+        raise Exception(f"Índice fuera de rango en el vector '{name}'")
+    return index
+
+
+def matrix_index(matrix, row, col, name):
+    # Devuelve la posición de (fila, col) en el búfer de la matriz.
+    row = int(row)
+    col = int(col)
+    if not (0 <= row < matrix.rows) or not (0 <= col < matrix.cols):
+        raise Exception(f"Índice fuera de rango en la matriz '{name}'")
+    return row * matrix.cols + col
+
+
+def store_vector(value, vector, index, name):
+    # El valor va primero para respetar el orden de evaluación del
+    # Interpreter: se calcula antes que el índice.
+    vector.put(vector_index(vector, index, name), value)
+    return value
+
+
+def store_matrix(value, matrix, row, col, name):
+    matrix.put(matrix_index(matrix, row, col, name), value)
+    return value
+
+
+def run_with_python_stack(run, frames):
+    # Ejecuta run() con al menos `frames` niveles de recursión de Python. El
+    # límite de recursión es del proceso: se sube mientras haya ejecuciones
+    # con pila propia y se restaura al terminar la última.
+    global _stack_runs, _base_recursion_limit
+    frames = min(frames, MAX_PYTHON_FRAMES)
+    outcome = []
+
+    def target():
+        try:
+            outcome.append((True, run()))
+        except BaseException as e:
+            outcome.append((False, e))
+
+    with _stack_lock:
+        base_limit = _base_recursion_limit if _stack_runs else sys.getrecursionlimit()
+        thread = None
+        if frames > base_limit:
+            if not _stack_runs:
+                _base_recursion_limit = base_limit
+            _stack_runs += 1
+            sys.setrecursionlimit(max(frames, sys.getrecursionlimit()))
+            previous_size = threading.stack_size()
+            try:
+                threading.stack_size(frames * STACK_BYTES_PER_FRAME)
+                thread = threading.Thread(target=target, daemon=True)
+                thread.start()
+            except (RuntimeError, ValueError, MemoryError):
+                # Sin memoria para la pila, el programa usa la del hilo actual.
+                thread = None
+                _stack_runs -= 1
+                if not _stack_runs:
+                    sys.setrecursionlimit(base_limit)
+            finally:
+                threading.stack_size(previous_size)
+    if thread is None:
+        return run()
+    try:
+        thread.join()
+    finally:
+        with _stack_lock:
+            _stack_runs -= 1
+            if not _stack_runs:
+                sys.setrecursionlimit(_base_recursion_limit)
+    succeeded, value = outcome[0]
+    if not succeeded:
+        raise value
+    return value
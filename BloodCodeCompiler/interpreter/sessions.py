@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+import uuid
+
+
+class SessionError(Exception):
+    pass
+
+
+class ExecutionSession:
+    # Ejecuta el programa en un hilo propio. Cuando llega a un Eyes el hilo
+    # queda bloqueado esperando la entrada, así que al reanudar se continúa
+    # exactamente desde ese punto en lugar de volver a ejecutar todo.
+    def __init__(self, interpreter, ast, ttl):
+        self.session_id = uuid.uuid4().hex
+        self.interpreter = interpreter
+        self.ttl = ttl
+        self.last_access = time.monotonic()
+        self.lock = threading.Lock()
+        self.inputs = queue.Queue(maxsize=1)
+        self.events = queue.Queue()
+        self.sent_output = 0
+        self.finished = False
+        self.waiting = False
+        self.expired = False
+        interpreter.input_provider = self._wait_for_input
+        self.thread = threading.Thread(target=self._run, args=(ast,), daemon=True)
+
+    def _run(self, ast):
+        try:
+            self.interpreter.execute(ast)
+            self.events.put(('done', None))
+        except Exception as e:
+            self.events.put(('error', e))
+
+    def _wait_for_input(self, prompt):
+        self.events.put(('prompt', prompt))
+        try:
+            value = self.inputs.get(timeout=self.ttl)
+        except queue.Empty:
+            value = None
+        if value is None:
+            self.expired = True
+            raise SessionError("La sesión de ejecución expiró")
+        return value
+
+    def _next_event(self):
+        kind, payload = self.events.get()
+        self.last_access = time.monotonic()
+        self.waiting = kind == 'prompt'
+        output = self.interpreter.output[self.sent_output:]
+        self.sent_output += len(output)
+        if kind != 'prompt':
+            self.finished = True
+        return kind, payload, output
+
+    def start(self):
+        with self.lock:
+            self.thread.start()
+            return self._next_event()
+
+    def resume(self, user_input):
+        with self.lock:
+            if self.finished:
+                raise SessionError(f"La sesión {self.session_id} ya terminó")
+            self.waiting = False
+            self.inputs.put(str(user_input))
+            return self._next_event()
+
+    def cancel(self):
+        if not self.finished:
+            self.expired = True
+            try:
+                self.inputs.put_nowait(None)
+            except queue.Full:
+                pass
+
+    def is_expired(self, now):
+        return self.waiting and now - self.last_access > self.ttl
+
+
+class SessionStore:
+    def __init__(self, ttl, max_sessions):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def create(self, interpreter, ast):
+        self.purge_expired()
+        with self.lock:
+            if len(self.sessions) >= self.max_sessions:
+                raise SessionError("Hay demasiadas sesiones de ejecución activas")
+            session = ExecutionSession(interpreter, ast, self.ttl)
+            self.sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id):
+        self.purge_expired()
+        with self.lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            raise SessionError(f"La sesión {session_id} no existe o expiró")
+        return session
+
+    def discard(self, session):
+        with self.lock:
+            self.sessions.pop(session.session_id, None)
+        session.cancel()
+
+    def purge_expired(self):
+        now = time.monotonic()
+        with self.lock:
+            expired = [session for session in self.sessions.values() if session.is_expired(now)]
+            for session in expired:
+                del self.sessions[session.session_id]
+        for session in expired:
+            session.cancel()
@@ -0,0 +1,110 @@
+import json
+import queue
+import threading
+import time
+
+from interpreter.budget import BudgetExceeded
+
+# Bytes de salida que se juntan antes de enviar un bloque; cada bloque es un
+# evento, así que enviar línea por línea costaría más que el propio Pray.
+CHUNK_BYTES = 8192
+# Si pasó este tiempo desde el último envío, la línea sale de inmediato: la
+# salida esporádica se ve al momento y sólo la salida continua se agrupa.
+FLUSH_INTERVAL = 0.05
+# Bloques en espera cuando la ejecución corre en un hilo del servidor. Con
+# la cola llena Pray se bloquea hasta que el cliente lea (contrapresión).
+QUEUE_CHUNKS = 8
+
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream',
+}
+
+
+class StreamClosed(Exception):
+    pass
+
+
+class OutputStream:
+    # Reemplaza la lista 'output' del motor en una ejecución transmitida: los
+    # motores sólo llaman a append, y las líneas se envían por bloques con
+    # `send` en lugar de acumularse. `max_bytes` limita la salida total.
+    def __init__(self, send, max_bytes=None):
+        self.send = send
+        self.max_bytes = max_bytes
+        self.buffer = []
+        self.buffered = 0
+        self.last_flush = time.monotonic()
+        self.lines = 0
+        self.chars = 0
+        self.bytes = 0
+
+    def append(self, line):
+        size = (len(line) if line.isascii() else len(line.encode('utf-8'))) + 1
+        if self.max_bytes is not None and self.bytes + size > self.max_bytes:
+            self.flush()
+            raise BudgetExceeded('output', self.max_bytes)
+        self.bytes += size
+        self.lines += 1
+        self.chars += len(line)
+        self.buffer.append(line)
+        self.buffered += size
+        if self.buffered >= CHUNK_BYTES or time.monotonic() - self.last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if self.buffer:
+            lines = self.buffer
+            self.buffer = []
+            self.buffered = 0
+            self.send(lines)
+
+    def __len__(self):
+        return self.lines
+
+
+def stream_in_thread(run, max_bytes):
+    # Sin procesos de trabajo el programa corre en un hilo y los eventos
+    # pasan por una cola acotada. Si el cliente se desconecta, el siguiente
+    # Pray del programa termina la ejecución.
+    events = queue.Queue(maxsize=QUEUE_CHUNKS)
+    closed = threading.Event()
+
+    def send(event):
+        while not closed.is_set():
+            try:
+                events.put(event, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise StreamClosed()
+
+    def target():
+        body, status = run(OutputStream(lambda lines: send(('output', lines)), max_bytes))
+        try:
+            send(('end', body, status))
+        except StreamClosed:
+            pass
+
+    threading.Thread(target=target, daemon=True).start()
+    try:
+        while True:
+            event = events.get()
+            yield event
+            if event[0] == 'end':
+                return
+    finally:
+        closed.set()
+
+
+def format_event(event, stream_format):
+    # ('output', líneas) o ('end', cuerpo, estado) como una línea de JSON o
+    # como un evento de server-sent events.
+    if event[0] == 'output':
+        name, payload = 'output', {'lines': event[1]}
+    else:
+        name, payload = 'end', dict(event[1], status=event[2])
+    if stream_format == 'sse':
+        return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps(dict(payload, event=name)) + '\n'
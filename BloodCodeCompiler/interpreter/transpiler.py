@@ -0,0 +1,516 @@
+import hashlib
+import re
+
+from parser.ast import NumberNode, IdentifierNode, BinaryOpNode, StringNode, DeclarationNode, BlockNode, IfStatementNode, LoopNode, FunctionCallNode, RestNode, BooleanNode, UnaryOpNode, FunctionDeclarationNode, ReturnNode, ArrayNode, ConstantNode
+from interpreter.closure_compiler import ClosureInterpreter, python_frames
+from interpreter.runtime import BloodCodeError, run_with_python_stack, decode_number, reachable_statements, statement_line, scalar_default, vector_index, matrix_index, store_vector, store_matrix
+from cache import code_cache
+from interpreter.arrays import BUILTINS
+from interpreter.budget import BudgetExceeded, UNLIMITED
+from semantic_analyzer.Resolver import ensure_resolved
+
+GENERATED_FILENAME = '<bloodcode>'
+
+PYTHON_OPERATORS = {
+    'PLUS': '+',
+    'MINUS': '-',
+    'MULTIPLY': '*',
+    'DIVIDE': '/',
+    'EQUAL': '==',
+    'NOT': '!=',
+    'GREATER': '>',
+    'LESS': '<',
+    'GREATEREQUAL': '>=',
+    'LESSEQUAL': '<=',
+}
+
+# Sentencias que no producen valor: como última sentencia de una función
+# dejan el resultado en None.
+VALUELESS_CALLS = ('PRAY', 'EYES')
+
+PYTHON_NAME_REGEX = re.compile(r"'(\w+)'")
+
+
+class MissingReturn(Exception):
+    def __init__(self, function_name):
+        super().__init__(f"La función '{function_name}' no retornó un valor.")
+
+
+class SourceWriter:
+    # Acumula las líneas de Python generadas junto con la línea de BloodCode
+    # de la sentencia que las produjo.
+    def __init__(self):
+        self.lines = []
+        self.indent = 0
+
+    def emit(self, text, line_number):
+        self.lines.append(('    ' * self.indent + text, line_number))
+
+    def close_block(self, start, line_number):
+        # Un bloque vacío en Python necesita al menos un 'pass'.
+        if len(self.lines) == start:
+            self.emit('pass', line_number)
+        self.indent -= 1
+
+
+class TranspiledProgram:
+    def __init__(self, source, line_map, names, function_count=0):
+        self.source = source
+        self.line_map = line_map
+        self.names = names
+        self.function_count = function_count
+        digest = hashlib.sha256(source.encode('utf-8')).hexdigest()
+        self.code = code_cache.get_or_create(digest, lambda: compile(source, GENERATED_FILENAME, 'exec'))
+
+    def run(self, interpreter):
+        namespace = {
+            '_append': interpreter.output.append,
+            '_eyes': interpreter.read_eyes_input,
+            '_functions': interpreter.functions,
+            '_step': interpreter.budget.step,
+            '_enter': interpreter.budget.enter,
+            '_max_depth': interpreter.budget.max_depth if interpreter.budget.max_depth is not None else UNLIMITED,
+            '_budget': interpreter.budget,
+            '_declare': self._declare_function(interpreter.functions, interpreter.budget.memo),
+            '_new_vector': interpreter.budget.new_vector,
+            '_new_matrix': interpreter.budget.new_matrix,
+            '_vector_index': vector_index,
+            '_matrix_index': matrix_index,
+            '_store_vector': store_vector,
+            '_store_matrix': store_matrix,
+            '_builtins': BUILTINS,
+            '_MissingReturn': MissingReturn,
+            '_BudgetExceeded': BudgetExceeded,
+        }
+        exec(self.code, namespace)
+        program = namespace['_program']
+        try:
+            if not self.function_count:
+                return program()
+            # Cada llamada es una función generada, más la de la tabla memo.
+            return run_with_python_stack(program, python_frames(interpreter.budget, 2))
+        except BudgetExceeded as e:
+            # Al entrar a una función el paso se cuenta sin línea; se usa la
+            # de la llamada.
+            if e.line_number is None:
+                raise BudgetExceeded(e.kind, e.limit, self.error_line(e)) from None
+            raise
+        except BloodCodeError:
+            raise
+        except Exception as e:
+            raise BloodCodeError(self.error_message(e), self.error_line(e)) from None
+
+    def _declare_function(self, functions, memo):
+        def declare(name, function, pure=False):
+            if name in functions:
+                raise Exception(f"Función '{name}' ya ha sido declarada anteriormente.")
+            functions[name] = memo.wrap(name, function) if pure and memo is not None else function
+        return declare
+
+    def error_message(self, error):
+        # Los nombres de Python generados se traducen de vuelta a BloodCode.
+        if isinstance(error, NameError):
+            match = PYTHON_NAME_REGEX.search(str(error))
+            if match and match.group(1) in self.names:
+                return f"La variable '{self.names[match.group(1)]}' no ha sido declarada en el contexto actual."
+        if isinstance(error, KeyError):
+            return f"Función no encontrada: {error.args[0]}"
+        return str(error)
+
+    def error_line(self, error):
+        generated_lines = []
+        traceback = error.__traceback__
+        while traceback is not None:
+            if traceback.tb_frame.f_code.co_filename == GENERATED_FILENAME:
+                generated_lines.append(traceback.tb_lineno)
+            traceback = traceback.tb_next
+        # El error de "no retornó un valor" y el del presupuesto al entrar a
+        # una función se reportan en la llamada, como en el Interpreter. El
+        # límite de salida se alcanza en el propio Pray.
+        at_call = isinstance(error, MissingReturn) or (isinstance(error, BudgetExceeded) and error.kind != 'output')
+        if at_call and len(generated_lines) > 1:
+            generated_lines.pop()
+        if not generated_lines:
+            return None
+        return self.line_map[generated_lines[-1] - 1]
+
+
+class PythonTranspiler:
+    # Genera código fuente de Python equivalente al AST ya analizado. El
+    # programa principal es la función _program y cada función de BloodCode
+    # es una función anidada en el lugar donde se declara, así que las
+    # variables de los niveles exteriores se leen como closures de Python.
+    def __init__(self):
+        self.names = {}
+        self.python_names = {}
+        self.writer = None
+        self.function_count = 0
+        self.temp_count = 0
+        self.depth = 0
+        self.bound = set()
+        self.nonlocals = set()
+        # profundidad -> variables que una función interior declara nonlocal
+        self.required = {}
+
+    def transpile(self, node):
+        self.writer = SourceWriter()
+        self.writer.emit('def _program():', node.line_number)
+        self.writer.indent += 1
+        self.statements(node)
+        self.scope_declarations(1, node)
+        self.writer.close_block(1, node.line_number)
+
+        lines = self.writer.lines
+        source = '\n'.join(text for text, _ in lines) + '\n'
+        line_map = [line_number for _, line_number in lines]
+        return TranspiledProgram(source, line_map, self.names, self.function_count)
+
+    def variable(self, node):
+        # El nombre lleva la profundidad del Resolver, así una variable local
+        # nunca tapa a una exterior con el mismo nombre. El prefijo evita
+        # chocar con palabras reservadas y los nombres no ASCII se numeran.
+        key = (node.depth, node.name)
+        python_name = self.python_names.get(key)
+        if python_name is None:
+            if node.name.isascii():
+                python_name = f'v{node.depth}_{node.name}'
+            else:
+                python_name = f'u{node.depth}_{len(self.python_names)}'
+            self.python_names[key] = python_name
+            self.names[python_name] = node.name
+        return python_name
+
+    def target(self, node):
+        # Nombre de Python para escribir la variable.
+        python_name = self.variable(node)
+        if node.depth == self.depth:
+            self.bound.add(python_name)
+        else:
+            self.nonlocals.add(python_name)
+            self.required.setdefault(node.depth, set()).add(python_name)
+        return python_name
+
+    def scope_declarations(self, position, node):
+        # 'nonlocal' para las variables exteriores que la función modifica.
+        # Python exige que estén asignadas en la función que las declara; si
+        # esa asignación quedó después de un Echoes se agrega una inalcanzable.
+        lines = []
+        if self.nonlocals:
+            lines.append(f"nonlocal {', '.join(sorted(self.nonlocals))}")
+        missing = sorted(self.required.pop(self.depth, set()) - self.bound)
+        if missing:
+            lines.append('if False:')
+            lines.extend(f'    {python_name} = None' for python_name in missing)
+        indent = '    ' * self.writer.indent
+        self.writer.lines[position:position] = [(indent + text, node.line_number) for text in lines]
+
+    def temporary(self):
+        self.temp_count += 1
+        return f'_t{self.temp_count}'
+
+    def emit(self, text, node):
+        # Pray, Eyes, Echoes y las llamadas llevan la línea del token que
+        # sigue al ';'; el mapa de líneas usa la de la propia sentencia.
+        self.writer.emit(text, statement_line(node))
+
+    # Sentencias
+
+    def statements(self, node):
+        for statement in reachable_statements(node):
+            self.statement(statement)
+
+    def statement(self, node):
+        if isinstance(node, BlockNode):
+            self.statements(node)
+        elif isinstance(node, ReturnNode):
+            self.statement(node.expression)
+        elif isinstance(node, DeclarationNode):
+            self.declaration(node)
+        elif isinstance(node, IfStatementNode):
+            self.if_statement(node)
+        elif isinstance(node, LoopNode):
+            self.loop(node)
+        elif isinstance(node, FunctionDeclarationNode):
+            self.function_declaration(node)
+        elif isinstance(node, FunctionCallNode) and self.call_name(node) == 'EYES':
+            self.eyes(node)
+        elif isinstance(node, RestNode):
+            self.emit('pass', node)
+        elif self.is_assignment(node):
+            self.emit(self.assignment(node, self.expression(node.right)), node)
+        else:
+            self.emit(self.expression(node), node)
+
+    def block(self, node):
+        start = len(self.writer.lines)
+        self.writer.indent += 1
+        self.statements(node)
+        self.writer.close_block(start, node.line_number)
+
+    def declaration(self, node):
+        var_type = node.var_type
+        for identifier in node.identifier_list:
+            name = identifier.name
+            target = self.target(identifier)
+            if isinstance(var_type, tuple):
+                element_type = var_type[0]
+                init = self.expression(node.expression) if isinstance(node.expression, ArrayNode) else 'None'
+                size1 = self.expression(var_type[1]) if var_type[1] else '0'
+                if len(var_type) == 3:
+                    size2 = self.expression(var_type[2]) if var_type[2] else '0'
+                    value = f'_new_matrix({element_type!r}, {size1}, {size2}, {init}, {name!r}, {node.line_number})'
+                else:
+                    value = f'_new_vector({element_type!r}, {size1}, {init}, {name!r}, {node.line_number})'
+            elif node.expression:
+                value = self.expression(node.expression)
+            else:
+                value = repr(scalar_default(var_type))
+            self.emit(f'{target} = {value}', node)
+
+    def if_statement(self, node):
+        keyword = 'if'
+        current_node = node
+        while True:
+            self.emit(f'{keyword} {self.expression(current_node.condition)}:', node)
+            self.block(current_node.true_block)
+            if not isinstance(current_node.false_block, IfStatementNode):
+                break
+            keyword = 'elif'
+            current_node = current_node.false_block
+        if current_node.false_block:
+            self.emit('else:', current_node)
+            self.block(current_node.false_block)
+
+    def loop(self, node):
+        if node.condition is None:
+            raise BloodCodeError("La condición del bucle no está definida.", node.line_number)
+        if node.init:
+            self.statement(node.init)
+        self.emit(f'while {self.expression(node.condition)}:', node)
+        start = len(self.writer.lines)
+        self.writer.indent += 1
+        self.emit(f'_step({node.line_number})', node)
+        self.statements(node.block)
+        if node.increment:
+            self.statement(node.increment)
+        self.writer.close_block(start, node.line_number)
+
+    def eyes(self, node):
+        # Si falta la entrada, las variables restantes no se leen: cada
+        # lectura depende de la anterior en lugar de anidar un if por variable.
+        previous = None
+        for var in node.arguments:
+            value = self.temporary()
+            read = f'_eyes({var.name!r})'
+            if previous is not None:
+                read = f'{read} if {previous} is not None else None'
+            self.emit(f'{value} = {read}', node)
+            self.emit(f'if {value} is not None:', node)
+            self.emit(f'    {self.target(var)} = {value}', node)
+            previous = value
+
+    def function_declaration(self, node):
+        name = node.name.name
+        self.function_count += 1
+        python_name = f'f_{name}_{self.function_count}' if name.isascii() else f'f_{self.function_count}'
+        on_none = 'return 0' if node.return_type == 'Rom' else f'raise _MissingReturn({name!r})'
+
+        outer_scope = (self.depth, self.bound, self.nonlocals)
+        self.depth, self.bound, self.nonlocals = node.depth, set(), set()
+        parameters = ', '.join(self.target(param[0]) for param in node.parameters)
+        header = len(self.writer.lines)
+        self.emit(f'def {python_name}({parameters}):', node)
+        self.writer.indent += 1
+        # Las llamadas usan la pila de Python; si aun así se agota antes que
+        # max_depth, el error lo dice. La profundidad se cuenta aquí mismo;
+        # enter() sólo se llama para lanzar el error.
+        self.emit('_step(None)', node)
+        self.emit('if _budget.depth >= _max_depth:', node)
+        self.emit('    _enter(None)', node)
+        self.emit('_budget.depth += 1', node)
+        self.emit('try:', node)
+        self.writer.indent += 1
+        self.value_block(node.block, on_none)
+        self.writer.indent -= 1
+        self.emit('except RecursionError:', node)
+        self.emit("    raise _BudgetExceeded('stack', _budget.depth) from None", node)
+        self.emit('finally:', node)
+        self.emit('    _budget.depth -= 1', node)
+        self.scope_declarations(header + 1, node)
+        self.writer.indent -= 1
+        self.depth, self.bound, self.nonlocals = outer_scope
+
+        self.emit(f'_declare({name!r}, {python_name}, True)' if node.pure else f'_declare({name!r}, {python_name})', node)
+
+    # Sentencias cuyo valor es el resultado de la función
+
+    def value_block(self, node, on_none):
+        statements = reachable_statements(node)
+        for statement in statements[:-1]:
+            self.statement(statement)
+        if statements:
+            self.value_statement(statements[-1], on_none)
+        else:
+            self.emit(on_none, node)
+
+    def value_statement(self, node, on_none):
+        if isinstance(node, BlockNode):
+            self.value_block(node, on_none)
+        elif isinstance(node, ReturnNode):
+            self.value_statement(node.expression, on_none)
+        elif isinstance(node, IfStatementNode):
+            self.value_if(node, on_none)
+        elif isinstance(node, (DeclarationNode, LoopNode, FunctionDeclarationNode, RestNode)) or (
+                isinstance(node, FunctionCallNode) and self.call_name(node) in VALUELESS_CALLS):
+            self.statement(node)
+            self.emit(on_none, node)
+        elif self.is_assignment(node):
+            value = self.temporary()
+            self.emit(f'{value} = {self.expression(node.right)}', node)
+            self.emit(self.assignment(node, value), node)
+            self.emit(f'return {value}', node)
+        else:
+            self.emit(f'return {self.expression(node)}', node)
+
+    def value_if(self, node, on_none):
+        # La rama verdadera devuelve su resultado tal cual; el Madness final
+        # convierte None en 0 y si no entra en ninguna rama el valor es 0.
+        keyword = 'if'
+        current_node = node
+        while True:
+            self.emit(f'{keyword} {self.expression(current_node.condition)}:', node)
+            self.writer.indent += 1
+            self.value_block(current_node.true_block, on_none)
+            self.writer.indent -= 1
+            if not isinstance(current_node.false_block, IfStatementNode):
+                break
+            keyword = 'elif'
+            current_node = current_node.false_block
+        if current_node.false_block:
+            self.emit('else:', current_node)
+            self.writer.indent += 1
+            self.value_block(current_node.false_block, 'return 0')
+            self.writer.indent -= 1
+        else:
+            self.emit('return 0', current_node)
+
+    # Expresiones
+
+    def call_name(self, node):
+        return node.identifier.name if isinstance(node.identifier, IdentifierNode) else node.identifier
+
+    def is_assignment(self, node):
+        return isinstance(node, BinaryOpNode) and node.operator in ('ASSIGN', 'ARROW_ASSIGN')
+
+    def expression(self, node):
+        if isinstance(node, NumberNode):
+            return repr(decode_number(node.value))
+        if isinstance(node, (StringNode, ConstantNode)):
+            return repr(node.value)
+        if isinstance(node, BooleanNode):
+            return 'True' if str(node.value).lower() == 'true' else 'False'
+        if isinstance(node, RestNode):
+            return 'None'
+        if isinstance(node, IdentifierNode):
+            return self.variable(node)
+        if isinstance(node, ArrayNode):
+            return '[' + ', '.join(self.expression(element) for element in node.elements) + ']'
+        if isinstance(node, UnaryOpNode):
+            if node.operator != 'VILEBLOOD':
+                raise BloodCodeError(f"Operador unario no soportado: {node.operator}", node.line_number)
+            return f'(not {self.expression(node.operand)})'
+        if isinstance(node, BinaryOpNode):
+            return self.binary_expression(node)
+        if isinstance(node, FunctionCallNode):
+            return self.call_expression(node)
+        raise BloodCodeError(f"Nodo no soportado: {type(node)}", getattr(node, 'line_number', None))
+
+    def binary_expression(self, node):
+        if self.is_assignment(node):
+            if not isinstance(node.left, IdentifierNode):
+                raise BloodCodeError("Asignación inválida", node.line_number)
+            return f'({self.target(node.left)} := {self.expression(node.right)})'
+        if node.operator == 'INDEX':
+            return self.index_expression(node)
+
+        left = self.expression(node.left)
+        right = self.expression(node.right)
+        if node.operator == 'BLOODBOND':
+            return f'(bool({left}) & bool({right}))'
+        if node.operator == 'OLDBLOOD':
+            return f'(bool({left}) | bool({right}))'
+        if node.operator == 'VILEBLOOD':
+            return f'({left}, not {right})[1]'
+
+        op = PYTHON_OPERATORS.get(node.operator)
+        if op is None:
+            raise BloodCodeError(f"Operador no soportado: {node.operator}", node.line_number)
+        return f'({left} {op} {right})'
+
+    def base_identifier(self, node):
+        current_node = node
+        while isinstance(current_node, BinaryOpNode) and current_node.operator == 'INDEX':
+            current_node = current_node.left
+        if not isinstance(current_node, IdentifierNode):
+            raise BloodCodeError("Acceso de matriz inválido: falta el identificador base.", node.line_number)
+        return current_node
+
+    def index_parts(self, node):
+        base = self.base_identifier(node)
+        array = self.variable(base)
+        if isinstance(node.left, BinaryOpNode) and node.left.operator == 'INDEX':
+            return base.name, array, (self.expression(node.left.right), self.expression(node.right))
+        return base.name, array, (self.expression(node.right),)
+
+    def index_expression(self, node):
+        # Maria[i].[j] lee m.data en la posición fila * cols + col, con los
+        # límites comprobados una sola vez.
+        name, array, indices = self.index_parts(node)
+        if not node.bounds_check:
+            if len(indices) == 2:
+                return f'{array}.data[{indices[0]} * {array}.cols + {indices[1]}]'
+            return f'{array}.data[{indices[0]}]'
+        if len(indices) == 2:
+            return f'{array}.data[_matrix_index({array}, {indices[0]}, {indices[1]}, {name!r})]'
+        return f'{array}.data[_vector_index({array}, {indices[0]}, {name!r})]'
+
+    def assignment(self, node, value):
+        # Una escritura en un vector o matriz pasa por put(), que cambia el
+        # búfer a lista si el valor no entra en él.
+        target = node.left
+        if isinstance(target, IdentifierNode):
+            return f'{self.target(target)} = {value}'
+        if isinstance(target, BinaryOpNode) and target.operator == 'INDEX':
+            name, array, indices = self.index_parts(target)
+            if not target.bounds_check:
+                # Los índices ya probados son variables: el orden no importa.
+                position = f'{indices[0]} * {array}.cols + {indices[1]}' if len(indices) == 2 else indices[0]
+                return f'{array}.put({position}, {value})'
+            if len(indices) == 2:
+                return f'_store_matrix({value}, {array}, {indices[0]}, {indices[1]}, {name!r})'
+            return f'_store_vector({value}, {array}, {indices[0]}, {name!r})'
+        raise BloodCodeError("Asignación inválida", node.line_number)
+
+    def call_expression(self, node):
+        function_name = self.call_name(node)
+        arguments = [self.expression(argument) for argument in node.arguments or []]
+        if function_name == 'PRAY':
+            text = ' + '.join(f'str({argument})' for argument in arguments) or "''"
+            return f'_append({text})'
+        if function_name == 'EYES':
+            raise BloodCodeError("Eyes no puede usarse dentro de una expresión.", node.line_number)
+        if function_name in BUILTINS:
+            return f'_builtins[{function_name!r}]({", ".join(arguments)})'
+        return f'_functions[{function_name!r}]({", ".join(arguments)})'
+
+
+class TranspiledInterpreter(ClosureInterpreter):
+    def execute(self, node):
+        node = ensure_resolved(node)
+        try:
+            program = PythonTranspiler().transpile(node)
+        except (SyntaxError, RecursionError, MemoryError):
+            # CPython no compila más de 100 niveles de indentación ni 20 bucles
+            # anidados; esos programas se ejecutan con el motor de closures.
+            return super().execute(node)
+        return program.run(self)
@@ -0,0 +1,264 @@
+import multiprocessing
+import queue
+import sys
+import threading
+
+from cache import compile_cache
+from interpreter.engines import get_engine
+from interpreter.budget import ExecutionBudget, BudgetExceeded
+from interpreter.profiler import ProfilingInterpreter
+from interpreter.streaming import OutputStream, stream_in_thread
+from metrics.timings import PhaseTimings
+from semantic_analyzer.SemanticAnalyzer import SemanticError
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def budget_response(error, output):
+    # Error estructurado de /execute cuando un programa agota su presupuesto.
+    return {'error': str(error), 'budget': error.to_dict(), 'output': output}, 400
+
+
+def with_profile(response, interpreter):
+    # Con action 'profile' la respuesta lleva también el perfil, incluso si
+    # el programa agotó su presupuesto.
+    body, status = response
+    if isinstance(interpreter, ProfilingInterpreter):
+        body['profile'] = interpreter.report()
+    return body, status
+
+
+def run_job(code, engine=None, user_input=None, limits=None, action=None, stream=None):
+    # Compila y ejecuta un programa completo. Devuelve el cuerpo y el código
+    # de estado de la respuesta de /execute, así el resultado se puede enviar
+    # desde un proceso de trabajo sin serializar excepciones. El cuerpo lleva
+    # siempre 'timings' para las métricas; app.py decide si lo devuelve.
+    # Con `stream` (un OutputStream) la salida se envía mientras se ejecuta y
+    # no se repite en el cuerpo.
+    timings = PhaseTimings()
+    compilation = None
+    interpreter = None
+    try:
+        compilation = compile_cache.entry(code)
+        timings.cache = 'hit' if compilation.analyzed else 'miss'
+        env = compilation.analysis(timings)
+        ast = compilation.program()
+        # El perfil siempre se toma con el Interpreter, sea cual sea el motor.
+        interpreter = ProfilingInterpreter(env) if action == 'profile' else get_engine(engine)(env)
+        interpreter.budget = ExecutionBudget(**(limits or {}))
+        if stream is not None:
+            interpreter.output = stream
+        if user_input:
+            interpreter.context["input_var"] = user_input
+        with timings.phase('execute'):
+            try:
+                interpreter.execute(ast)
+            finally:
+                if stream is not None:
+                    stream.flush()
+        if interpreter.prompt_var:
+            response = with_profile(({"prompt": interpreter.prompt_var}, 200), interpreter)
+        else:
+            response = with_profile(({"output": interpreter.output}, 200), interpreter)
+    except BudgetExceeded as e:
+        response = with_profile(budget_response(e, interpreter.output), interpreter)
+    except SemanticError as e:
+        response = {'error': str(e)}, 400
+    except Exception as e:
+        response = {'error': f"Error inesperado: {str(e)}"}, 500
+
+    body, status = response
+    if compilation is not None:
+        timings.count_program(compilation)
+    if interpreter is not None and interpreter.budget.memo is not None:
+        memo = interpreter.budget.memo
+        # Sólo si el programa llamó a alguna función pura.
+        if memo.hits or memo.misses:
+            body['memo'] = memo.stats()
+    if interpreter is not None:
+        output = interpreter.output
+        if isinstance(output, OutputStream):
+            body.pop('output', None)
+            timings.counts['output_lines'] = output.lines
+            timings.counts['output_chars'] = output.chars
+        else:
+            timings.counts['output_lines'] = len(output)
+            timings.counts['output_chars'] = sum(len(line) for line in output)
+    body['timings'] = timings.as_dict()
+    return body, status
+
+
+def stream_job(code, engine=None, user_input=None, limits=None, action=None, max_bytes=None):
+    # Igual que run_job pero como generador de eventos ('output', líneas) y
+    # al final ('end', cuerpo, estado), ejecutando en un hilo de este proceso.
+    return stream_in_thread(lambda stream: run_job(code, engine, user_input, limits, action, stream), max_bytes)
+
+
+def peak_rss():
+    # Memoria residente máxima del proceso, en KB.
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def worker_main(connection):
+    # Los módulos del compilador ya se importaron al cargar este módulo en el
+    # proceso nuevo; cada trabajo reutiliza además la caché de compilación.
+    # Un trabajo transmitido envía ('output', líneas) por la tubería durante
+    # la ejecución; si el servidor no lee, send se bloquea y el programa
+    # espera en su siguiente Pray.
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        args, streamed, max_bytes = job
+        stream = None
+        if streamed:
+            stream = OutputStream(lambda lines: connection.send(('output', lines)), max_bytes)
+        connection.send(('end', run_job(*args, stream=stream), peak_rss()))
+
+
+class Worker:
+    def __init__(self, context):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.jobs = 0
+        self.rss = 0
+
+    def run(self, job, streamed=False, max_bytes=None):
+        # Genera los eventos del trabajo; sin transmisión sólo hay el final.
+        self.connection.send((job, streamed, max_bytes))
+        while True:
+            message = self.connection.recv()
+            if message[0] == 'output':
+                yield message
+                continue
+            _, result, self.rss = message
+            self.jobs += 1
+            yield ('end',) + tuple(result)
+            return
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.connection.close()
+
+
+class WorkerPool:
+    # Procesos de trabajo que ejecutan lex → parse → análisis → ejecución
+    # fuera del hilo de la petición y sin compartir el GIL. Un proceso se
+    # reemplaza después de `max_jobs` trabajos o si su memoria supera
+    # `max_rss_mb`; el reemplazo arranca en segundo plano.
+    def __init__(self, size, max_jobs, max_rss_mb):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss_mb * 1024
+        self.context = multiprocessing.get_context('spawn')
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.started = False
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.cancelled = 0
+
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        for _ in range(self.size):
+            self.idle.put(Worker(self.context))
+
+    def run(self, code, engine=None, user_input=None, limits=None, action=None):
+        for event in self.events((code, engine, user_input, limits, action)):
+            pass
+        return event[1], event[2]
+
+    def stream(self, code, engine=None, user_input=None, limits=None, action=None, max_bytes=None):
+        # Como stream_job, pero en un proceso de trabajo.
+        return self.events((code, engine, user_input, limits, action), True, max_bytes)
+
+    def events(self, job, streamed=False, max_bytes=None):
+        self.start()
+        with self.lock:
+            self.waiting += 1
+        worker = self.idle.get()
+        while not worker.process.is_alive():
+            # Murió mientras esperaba trabajo: el programa todavía no se envió.
+            with self.lock:
+                self.crashed += 1
+            self._replace(worker)
+            worker = self.idle.get()
+        with self.lock:
+            self.waiting -= 1
+            self.running += 1
+        try:
+            for event in worker.run(job, streamed, max_bytes):
+                if event[0] == 'end':
+                    break
+                yield event
+        except (EOFError, OSError):
+            # El proceso murió durante el trabajo (por ejemplo, sin memoria).
+            with self.lock:
+                self.running -= 1
+                self.crashed += 1
+            self._replace(worker)
+            event = 'end', {'error': "Error inesperado: el proceso de ejecución terminó de forma inesperada"}, 500
+        except GeneratorExit:
+            # El cliente dejó de leer un trabajo transmitido y el proceso
+            # sigue ejecutando el programa, así que se reemplaza.
+            with self.lock:
+                self.running -= 1
+                self.cancelled += 1
+            self._replace(worker)
+            raise
+        else:
+            with self.lock:
+                self.running -= 1
+                self.completed += 1
+            if worker.jobs >= self.max_jobs or worker.rss > self.max_rss:
+                with self.lock:
+                    self.recycled += 1
+                self._replace(worker)
+            else:
+                self.idle.put(worker)
+        yield event
+
+    def _replace(self, worker):
+        def replace():
+            worker.stop()
+            self.idle.put(Worker(self.context))
+        threading.Thread(target=replace, daemon=True).start()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': self.size,
+                'started': self.started,
+                'idle': self.idle.qsize(),
+                'running': self.running,
+                'queue_depth': self.waiting,
+                'completed': self.completed,
+                'recycled': self.recycled,
+                'crashed': self.crashed,
+                'cancelled': self.cancelled,
+                'max_jobs': self.max_jobs,
+                'max_rss_mb': self.max_rss // 1024,
+            }
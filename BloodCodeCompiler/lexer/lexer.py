@@ -1,11 +1,59 @@
+import codecs
 import re
 from .tokens import tokens
 
+# El lexer compila la tabla de tokens una sola vez al importar el módulo.
+# Las palabras reservadas se resuelven con un diccionario a partir de la
+# expresión de identificadores, y los símbolos con una única alternancia en el
+# mismo orden de la tabla, de modo que se conserva la regla de "gana el primer
+# patrón que coincide" del recorrido original.
+SCANNED_TOKENS = ('WHITESPACE', 'NUMBER', 'STRING', 'IDENTIFIER')
+
+keyword_tokens = [(token_type, regex) for token_type, regex in tokens if regex.isalpha()]
+symbol_tokens = [(token_type, regex) for token_type, regex in tokens
+                 if token_type not in SCANNED_TOKENS and not regex.isalpha()]
+scanned_patterns = dict((token_type, regex) for token_type, regex in tokens if token_type in SCANNED_TOKENS)
+
+keyword_prefix_regex = re.compile('|'.join(f'(?P<{token_type}>{regex})' for token_type, regex in keyword_tokens))
+keyword_initials = frozenset(regex[0] for _, regex in keyword_tokens)
+
+symbol_table = {}
+for token_type, regex in symbol_tokens:
+    symbol_table.setdefault(re.sub(r'\\(.)', r'\1', regex), token_type)
+
+WHITESPACE_GROUP, WORD_GROUP, NUMBER_GROUP, STRING_GROUP, SYMBOL_GROUP = 1, 2, 3, 4, 5
+
+token_regex = re.compile('|'.join([
+    f"({scanned_patterns['WHITESPACE']})",
+    f"({scanned_patterns['IDENTIFIER']})",
+    f"((?:{scanned_patterns['NUMBER'].replace('(', '(?:')}))",
+    f"({scanned_patterns['STRING']})",
+    '(' + '|'.join(regex for _, regex in symbol_tokens) + ')',
+]))
+
+
+def _keyword_type(word):
+    # Una palabra reservada gana aunque solo sea prefijo del identificador
+    # ("trueValue" -> TRUE + IDENTIFIER), igual que con la tabla original.
+    match = keyword_prefix_regex.match(word)
+    if match and match.end() == len(word):
+        return match.lastgroup
+    return None
+
+
+keyword_table = dict((regex, _keyword_type(regex)) for _, regex in keyword_tokens)
+keyword_table = dict((word, token_type) for word, token_type in keyword_table.items() if token_type)
+
+READ_CHUNK_SIZE = 64 * 1024
+ERROR_CONTEXT_SIZE = 40
+
 class Token:
-    def __init__(self, token_type, value, line_number):
+    def __init__(self, token_type, value, line_number, position=None):
         self.type = token_type  
         self.value = value      
         self.line_number = line_number        
+        # Offset del primer carácter del token en el código fuente.
+        self.position = position
 
     def __repr__(self):
         return f'Token({self.type}, {self.value}, Line: {self.line})'
@@ -18,26 +66,88 @@ class Token:
         }
 
 class Lexer:
-    def __init__(self, code):
+    def __init__(self, code, line_number=1):
+        # `code` puede ser un str, un archivo (texto o binario) o un mmap.
         self.code = code
         self.tokens = []
         self.position = 0
-        self.line_number = 1 
+        self.line_number = line_number 
+        # Offset en el código del comienzo del bloque que se está analizando.
+        self.offset = 0
 
     def tokenize(self):
-        while self.position < len(self.code):
-            match = None
-            for token_type, token_regex in tokens:
-                regex = re.compile(token_regex)
-                match = regex.match(self.code, self.position)
-                if match:
-                    text = match.group(0)
-                    if token_type == 'WHITESPACE':
-                        self.line_number += text.count('\n')  
-                    elif token_type != 'WHITESPACE':
-                        self.tokens.append(Token(token_type, text, self.line_number))
-                    self.position = match.end(0)
-                    break
+        self.tokens.extend(self.stream())
+        return self.tokens
+
+    def stream(self):
+        if isinstance(self.code, str):
+            yield from self._scan(self.code, len(self.code), True)
+            return
+
+        buffer = ''
+        for chunk, final in self._read_chunks():
+            buffer = buffer[self.position:] + chunk
+            self.offset += self.position
+            self.position = 0
+            # Fuera del último bloque solo se analiza hasta el último salto de
+            # línea: ningún token salvo las cadenas cruza una línea, así que lo
+            # que se emite no puede cambiar al leer más texto.
+            end = len(buffer) if final else buffer.rfind('\n') + 1
+            yield from self._scan(buffer, end, final, self.offset)
+
+    def _read_chunks(self):
+        decoder = None
+        while True:
+            chunk = self.code.read(READ_CHUNK_SIZE)
+            if isinstance(chunk, (bytes, bytearray)):
+                if decoder is None:
+                    decoder = codecs.getincrementaldecoder('utf-8')()
+                final = not chunk
+                yield decoder.decode(chunk, final), final
+            else:
+                yield chunk, not chunk
+            if not chunk:
+                return
+
+    def _scan(self, code, end, final, offset=0):
+        match_token = token_regex.match
+        position = self.position
+        line_number = self.line_number
+
+        while position < end:
+            match = match_token(code, position, end)
             if not match:
-                raise SyntaxError(f'Error de sintaxis en la línea {self.line_number}: token no reconocido en "{self.code[self.position:]}"')
-        return self.tokens
\ No newline at end of file
+                if not final and code.startswith('"', position):
+                    break
+                self.position = position
+                self.line_number = line_number
+                context = code[position:position + ERROR_CONTEXT_SIZE].split('\n', 1)[0]
+                raise SyntaxError(f'Error de sintaxis en la línea {line_number}: token no reconocido en "{context}"')
+            group = match.lastindex
+            text = match.group()
+            if group == WHITESPACE_GROUP:
+                # Sólo se suma si hay saltos: 'n + 0' crea otro int y cada
+                # token (y cada nodo del AST) guardaría su propia copia.
+                newlines = text.count('\n')
+                if newlines:
+                    line_number += newlines
+            elif group == WORD_GROUP:
+                token_type = keyword_table.get(text)
+                if token_type is None:
+                    prefix = keyword_prefix_regex.match(text) if text[0] in keyword_initials else None
+                    if prefix:
+                        yield Token(prefix.lastgroup, prefix.group(), line_number, offset + position)
+                        position += prefix.end()
+                        continue
+                    token_type = 'IDENTIFIER'
+                yield Token(token_type, text, line_number, offset + position)
+            elif group == SYMBOL_GROUP:
+                yield Token(symbol_table[text], text, line_number, offset + position)
+            elif group == NUMBER_GROUP:
+                yield Token('NUMBER', text, line_number, offset + position)
+            else:
+                yield Token('STRING', text, line_number, offset + position)
+            position = match.end()
+
+        self.position = position
+        self.line_number = line_number
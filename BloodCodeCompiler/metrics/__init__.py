@@ -0,0 +1,2 @@
+from .registry import MetricsRegistry, Counter, Histogram, CallbackMetric, LATENCY_BUCKETS, SIZE_BUCKETS
+from .timings import PhaseTimings, TimedTokens
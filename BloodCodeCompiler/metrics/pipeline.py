@@ -0,0 +1,46 @@
+from cache import compile_cache, code_cache
+from .registry import MetricsRegistry, LATENCY_BUCKETS, SIZE_BUCKETS
+
+# Métricas del servidor que expone /metrics. Las etapas que corren en los
+# procesos de trabajo vuelven en la respuesta del trabajo y se registran aquí.
+registry = MetricsRegistry()
+
+request_seconds = registry.histogram(
+    'bloodcode_request_duration_seconds', 'Duración de las peticiones HTTP.',
+    LATENCY_BUCKETS, ('endpoint', 'status'))
+phase_seconds = registry.histogram(
+    'bloodcode_phase_duration_seconds', 'Duración de cada etapa: lex, parse, analyze, resolve, optimize, execute, y load/store del AST en disco.',
+    LATENCY_BUCKETS, ('phase',))
+program_tokens = registry.histogram('bloodcode_program_tokens', 'Tokens del programa de cada petición.', SIZE_BUCKETS)
+program_nodes = registry.histogram('bloodcode_program_ast_nodes', 'Nodos del AST del programa de cada petición.', SIZE_BUCKETS)
+output_lines = registry.histogram('bloodcode_output_lines', 'Líneas de salida (Pray) por ejecución.', SIZE_BUCKETS)
+output_chars = registry.histogram('bloodcode_output_chars', 'Caracteres de salida por ejecución.', SIZE_BUCKETS)
+compilations = registry.counter(
+    'bloodcode_compilations_total', 'Programas pedidos, según si su compilación ya estaba en la caché.', ('cache',))
+
+
+def cache_stat(name):
+    def read():
+        return {('compile',): compile_cache.stats()[name], ('code',): code_cache.stats()[name]}
+    return read
+
+
+registry.callback('bloodcode_cache_hits_total', 'Aciertos de las cachés.', 'counter', cache_stat('hits'), ('cache',))
+registry.callback('bloodcode_cache_misses_total', 'Fallos de las cachés.', 'counter', cache_stat('misses'), ('cache',))
+registry.callback('bloodcode_cache_evictions_total', 'Entradas descartadas por las cachés.', 'counter', cache_stat('evictions'), ('cache',))
+registry.callback('bloodcode_cache_entries', 'Entradas guardadas en las cachés.', 'gauge', cache_stat('size'), ('cache',))
+
+
+def record_timings(timings):
+    # `timings` es PhaseTimings.as_dict(), tal como viaja en las respuestas.
+    for name, milliseconds in timings['phases_ms'].items():
+        phase_seconds.observe(milliseconds / 1000, phase=name)
+    if timings.get('cache'):
+        compilations.inc(cache=timings['cache'])
+    if timings.get('tokens') is not None:
+        program_tokens.observe(timings['tokens'])
+    if timings.get('ast_nodes') is not None:
+        program_nodes.observe(timings['ast_nodes'])
+    if 'output_lines' in timings:
+        output_lines.observe(timings['output_lines'])
+        output_chars.observe(timings['output_chars'])
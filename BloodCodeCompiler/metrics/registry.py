@@ -0,0 +1,134 @@
+import math
+import threading
+from bisect import bisect_left
+
+# Límites de los histogramas de latencia, en segundos.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Límites para tamaños (tokens, nodos, líneas de salida).
+SIZE_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    # Métrica con etiquetas opcionales; cada combinación de valores de las
+    # etiquetas es una serie propia.
+    kind = None
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self.lock:
+            for key, value in sorted(self.series.items()):
+                lines.extend(self.render_series(key, value))
+        return lines
+
+    def render_series(self, key, value):
+        return [f'{self.name}{format_labels(self.label_names, key)} {format_value(value)}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+
+class CallbackMetric(Metric):
+    # Valores leídos en cada consulta de /metrics a partir de `function`, que
+    # devuelve {tupla de valores de etiquetas: valor}. Sirve para exponer
+    # contadores que ya llevan otros objetos (las cachés, los procesos).
+    def __init__(self, name, documentation, kind, function, label_names=()):
+        super().__init__(name, documentation, label_names)
+        self.kind = kind
+        self.function = function
+
+    def render(self):
+        with self.lock:
+            self.series = dict(self.function())
+        return super().render()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, label_names=()):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                # Conteo por intervalo (no acumulado), suma y cantidad.
+                series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render_series(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = format_labels(self.label_names, key, [('le', format_value(float(bound)))])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = format_labels(self.label_names, key)
+        lines.append(f'{self.name}_sum{labels} {format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, label_names=()):
+        return self.register(Counter(name, documentation, label_names))
+
+    def callback(self, name, documentation, kind, function, label_names=()):
+        return self.register(CallbackMetric(name, documentation, kind, function, label_names))
+
+    def histogram(self, name, documentation, buckets, label_names=()):
+        return self.register(Histogram(name, documentation, buckets, label_names))
+
+    def render(self):
+        # Formato de texto de Prometheus (versión 0.0.4).
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
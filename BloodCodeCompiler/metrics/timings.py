@@ -0,0 +1,59 @@
+import contextlib
+import time
+
+
+class PhaseTimings:
+    # Tiempos (reloj monótono) y tamaños de una petición. Sólo cuenta las
+    # etapas que se ejecutaron en ella: con la compilación en caché el
+    # análisis no se repite y no aparece.
+    def __init__(self):
+        self.phases = {}
+        self.counts = {}
+        self.cache = None
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def count_program(self, compilation):
+        self.counts['tokens'] = compilation.token_count
+        self.counts['ast_nodes'] = compilation.node_count
+
+    def as_dict(self):
+        return {
+            'phases_ms': {phase: round(seconds * 1000, 3) for phase, seconds in self.phases.items()},
+            'cache': self.cache,
+            **self.counts,
+        }
+
+
+def phase(timings, name):
+    return timings.phase(name) if timings is not None else contextlib.nullcontext()
+
+
+class TimedTokens:
+    # Envuelve el generador del lexer para separar el tiempo de lexing del
+    # de parsing cuando el parser consume los tokens a demanda.
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.count = 0
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            token = next(self.tokens)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.count += 1
+        return token
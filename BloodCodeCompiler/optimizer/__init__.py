@@ -0,0 +1,2 @@
+from .stats import OptimizationStats
+from .optimizer import Optimizer
@@ -0,0 +1,449 @@
+from parser.ast import IdentifierNode, BinaryOpNode, DeclarationNode, BlockNode, IfStatementNode, LoopNode, FunctionCallNode, UnaryOpNode, FunctionDeclarationNode, ReturnNode, ArrayNode, ConstantNode
+from interpreter.arrays import BUILTINS
+from .nodes import replace
+
+ASSIGN_OPERATORS = ('ASSIGN', 'ARROW_ASSIGN')
+
+# Operadores que nunca fallan con números y booleanos, con el tipo de su
+# resultado. Una expresión invariante hecha sólo con ellos puede calcularse
+# antes del bucle aunque el cuerpo no llegue a evaluarla; DIVIDE queda afuera
+# por la división por cero.
+HOISTABLE_OPERATORS = {
+    'PLUS': 'MARIA',
+    'MINUS': 'MARIA',
+    'MULTIPLY': 'MARIA',
+    'EQUAL': 'BLOOD',
+    'NOT': 'BLOOD',
+    'GREATER': 'BLOOD',
+    'LESS': 'BLOOD',
+    'GREATEREQUAL': 'BLOOD',
+    'LESSEQUAL': 'BLOOD',
+    'BLOODBOND': 'BLOOD',
+    'OLDBLOOD': 'BLOOD',
+    'VILEBLOOD': 'BLOOD',
+}
+
+SCALAR_TYPES = ('MARIA', 'BLOOD')
+
+
+def child_nodes(node):
+    if isinstance(node, BlockNode):
+        return node.statements
+    if isinstance(node, DeclarationNode):
+        sizes = list(node.var_type[1:]) if isinstance(node.var_type, tuple) else []
+        return sizes + list(node.identifier_list) + [node.expression]
+    if isinstance(node, BinaryOpNode):
+        return [node.left, node.right]
+    if isinstance(node, UnaryOpNode):
+        return [node.operand]
+    if isinstance(node, IfStatementNode):
+        return [node.condition, node.true_block, node.false_block]
+    if isinstance(node, LoopNode):
+        return [node.init, node.condition, node.increment, node.block]
+    if isinstance(node, FunctionCallNode):
+        return node.arguments or []
+    if isinstance(node, FunctionDeclarationNode):
+        return [param[0] for param in node.parameters] + [node.block]
+    if isinstance(node, ReturnNode):
+        return [node.expression]
+    if isinstance(node, ArrayNode):
+        return node.elements
+    return []
+
+
+def walk(*nodes):
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if node is not None:
+            yield node
+            stack.extend(child_nodes(node))
+
+
+def call_name(node):
+    return node.identifier.name if isinstance(node.identifier, IdentifierNode) else node.identifier
+
+
+def is_assignment(node):
+    return isinstance(node, BinaryOpNode) and node.operator in ASSIGN_OPERATORS
+
+
+def is_name(node, name):
+    return isinstance(node, IdentifierNode) and node.name == name
+
+
+def assigned_names(*nodes):
+    # Variables que se escriben con una asignación o con Eyes.
+    names = set()
+    for node in walk(*nodes):
+        if is_assignment(node) and isinstance(node.left, IdentifierNode):
+            names.add(node.left.name)
+        elif isinstance(node, FunctionCallNode) and call_name(node) == 'EYES':
+            names.update(argument.name for argument in node.arguments if isinstance(argument, IdentifierNode))
+    return names
+
+
+def written_names(*nodes):
+    names = assigned_names(*nodes)
+    for node in walk(*nodes):
+        if isinstance(node, DeclarationNode):
+            names.update(identifier.name for identifier in node.identifier_list)
+    return names
+
+
+class FrameSlots:
+    # Posiciones que se agregan al frame de una función (o del programa) para
+    # guardar los valores calculados antes de los bucles.
+    def __init__(self, depth, frame_size):
+        self.depth = depth
+        self.frame_size = frame_size
+
+    def new_identifier(self, name, line_number):
+        identifier = IdentifierNode(name, line_number)
+        identifier.depth = self.depth
+        identifier.slot = self.frame_size
+        self.frame_size += 1
+        return identifier
+
+
+class Hoister:
+    # Reemplaza las expresiones invariantes de un bucle por variables ocultas
+    # declaradas justo antes de él.
+    def __init__(self, loops, variant, defined, frame):
+        self.loops = loops
+        self.variant = variant
+        self.defined = defined
+        self.frame = frame
+        self.declarations = []
+        self.hoisted = {}
+
+    def invariant(self, node):
+        if isinstance(node, ConstantNode):
+            return type(node.value) in (int, float, bool)
+        if isinstance(node, IdentifierNode):
+            return (node.name not in self.variant and node.name in self.defined
+                    and self.loops.scalar_types.get(node.name) in SCALAR_TYPES)
+        if isinstance(node, BinaryOpNode):
+            return node.operator in HOISTABLE_OPERATORS and self.invariant(node.left) and self.invariant(node.right)
+        if isinstance(node, UnaryOpNode):
+            return node.operator == 'VILEBLOOD' and self.invariant(node.operand)
+        return False
+
+    def hoistable(self, node):
+        # Una variable o constante sola no gana nada al moverse.
+        return (isinstance(node, (BinaryOpNode, UnaryOpNode)) and self.invariant(node)
+                and any(isinstance(child, IdentifierNode) for child in walk(node)))
+
+    def temporary(self, node):
+        # La misma expresión (según su repr) comparte una sola variable.
+        key = repr(node)
+        identifier = self.hoisted.get(key)
+        if identifier is None:
+            var_type = HOISTABLE_OPERATORS.get(node.operator, 'BLOOD')
+            identifier = self.frame.new_identifier(self.loops.hidden_name(var_type), node.line_number)
+            self.declarations.append(DeclarationNode([identifier], var_type, node, node.line_number))
+            self.hoisted[key] = identifier
+            self.loops.stats.hoisted_expressions += 1
+        use = IdentifierNode(identifier.name, node.line_number)
+        use.depth = identifier.depth
+        use.slot = identifier.slot
+        return use
+
+    def block(self, node):
+        statements = [self.statement(statement) for statement in node.statements]
+        if all(a is b for a, b in zip(statements, node.statements)):
+            return node
+        return replace(node, statements=statements)
+
+    def statement(self, node):
+        if isinstance(node, BlockNode):
+            return self.block(node)
+        if isinstance(node, LoopNode):
+            return replace(node,
+                           init=self.statement(node.init) if node.init else node.init,
+                           condition=self.expression(node.condition),
+                           increment=self.expression(node.increment),
+                           block=self.block(node.block))
+        if isinstance(node, IfStatementNode):
+            return replace(node,
+                           condition=self.expression(node.condition),
+                           true_block=self.block(node.true_block) if node.true_block else node.true_block,
+                           false_block=self.statement(node.false_block) if node.false_block else node.false_block)
+        if isinstance(node, DeclarationNode):
+            var_type = node.var_type
+            if isinstance(var_type, tuple):
+                sizes = tuple(self.expression(size) for size in var_type[1:])
+                if any(a is not b for a, b in zip(sizes, var_type[1:])):
+                    var_type = (var_type[0],) + sizes
+            return replace(node, var_type=var_type, expression=self.expression(node.expression))
+        if isinstance(node, ReturnNode):
+            return replace(node, expression=self.expression(node.expression))
+        return self.expression(node)
+
+    def expression(self, node):
+        if node is None:
+            return None
+        if self.hoistable(node):
+            return self.temporary(node)
+        if isinstance(node, BinaryOpNode):
+            if is_assignment(node) and isinstance(node.left, IdentifierNode):
+                return replace(node, right=self.expression(node.right))
+            return replace(node, left=self.expression(node.left), right=self.expression(node.right))
+        if isinstance(node, UnaryOpNode):
+            return replace(node, operand=self.expression(node.operand))
+        if isinstance(node, FunctionCallNode):
+            if call_name(node) == 'EYES' or not node.arguments:
+                return node
+            arguments = [self.expression(argument) for argument in node.arguments]
+            if all(a is b for a, b in zip(arguments, node.arguments)):
+                return node
+            return replace(node, arguments=arguments)
+        if isinstance(node, ArrayNode):
+            elements = [self.expression(element) for element in node.elements]
+            if all(a is b for a, b in zip(elements, node.elements)):
+                return node
+            return replace(node, elements=elements)
+        return node
+
+
+class LoopOptimizer:
+    # Segunda pasada del Optimizer, sobre los Nightmare y Dream:
+    #  - las expresiones invariantes del bucle se calculan una vez antes de
+    #    entrar, en variables ocultas con su propia posición en el frame;
+    #  - en los bucles con contador (Hunter i: Maria => 0; i < n; i => i + 1)
+    #    los accesos v[i] o m[i].[j] que no pueden salir del rango declarado
+    #    quedan con bounds_check = False y los motores no comprueban el índice.
+    # Todo se decide por nombre de variable, con las mismas reglas de alcance
+    # que el SemanticAnalyzer, así que ante la duda no se optimiza.
+    def __init__(self, stats):
+        self.stats = stats
+        self.hidden_count = 0
+        self.names = set()
+        self.scalar_types = {}
+        self.arrays = {}
+        self.constants = {}
+        self.function_writes = set()
+
+    def optimize(self, program):
+        self.collect(program)
+        frame = FrameSlots(0, program.frame_size)
+        block = self.block(program, frame, set(), {})
+        return replace(block, frame_size=frame.frame_size)
+
+    def collect(self, program):
+        declarations = {}
+        parameters = {}
+        for node in walk(program):
+            if isinstance(node, IdentifierNode):
+                self.names.add(node.name)
+            elif isinstance(node, DeclarationNode):
+                for identifier in node.identifier_list:
+                    declarations.setdefault(identifier.name, []).append(node)
+            elif isinstance(node, FunctionDeclarationNode):
+                for param in node.parameters:
+                    parameters.setdefault(param[0].name, set()).add(str(param[1]).upper())
+                # Una llamada puede cambiar cualquier variable que la función asigne.
+                self.function_writes |= assigned_names(node.block)
+        assigned = assigned_names(program)
+
+        for name in set(declarations) | set(parameters):
+            nodes = declarations.get(name, [])
+            types = {node.var_type for node in nodes} | parameters.get(name, set())
+            if len(types) == 1 and next(iter(types)) in SCALAR_TYPES:
+                self.scalar_types[name] = next(iter(types))
+            if len(nodes) != 1 or name in parameters or name in assigned:
+                continue
+            # Una sola declaración y ninguna asignación: el valor o el tamaño
+            # no cambian mientras la variable existe.
+            node = nodes[0]
+            if isinstance(node.var_type, tuple):
+                self.arrays[name] = node.var_type
+            elif node.var_type == 'MARIA' and isinstance(node.expression, ConstantNode) and type(node.expression.value) is int:
+                self.constants[name] = node.expression.value
+
+    def hidden_name(self, var_type):
+        while True:
+            self.hidden_count += 1
+            name = f'_inv{self.hidden_count}'
+            if name not in self.names:
+                self.names.add(name)
+                self.scalar_types[name] = var_type
+                return name
+
+    def constant_value(self, node):
+        if isinstance(node, ConstantNode) and type(node.value) is int:
+            return node.value
+        if isinstance(node, IdentifierNode):
+            return self.constants.get(node.name)
+        return None
+
+    def calls_functions(self, node):
+        return any(isinstance(child, FunctionCallNode) and call_name(child) not in ('PRAY', 'EYES') and call_name(child) not in BUILTINS
+                   for child in walk(node))
+
+    # Recorrido
+
+    def block(self, node, frame, defined, ranges):
+        # 'defined' son las variables que seguro tienen valor en este punto y
+        # 'ranges' las cotas de los contadores de los bucles que lo rodean.
+        defined = set(defined)
+        statements = []
+        for statement in node.statements:
+            for new_statement in self.statement(statement, frame, defined, ranges):
+                statements.append(new_statement)
+                if isinstance(new_statement, DeclarationNode):
+                    defined.update(identifier.name for identifier in new_statement.identifier_list)
+        if len(statements) == len(node.statements) and all(a is b for a, b in zip(statements, node.statements)):
+            return node
+        return replace(node, statements=statements)
+
+    def statement(self, node, frame, defined, ranges):
+        if isinstance(node, LoopNode):
+            return self.loop(node, frame, defined, ranges)
+        if isinstance(node, IfStatementNode):
+            return [self.if_statement(node, frame, defined, ranges)]
+        if isinstance(node, FunctionDeclarationNode):
+            function_frame = FrameSlots(node.depth, node.frame_size)
+            function_defined = defined | {param[0].name for param in node.parameters}
+            block = self.block(node.block, function_frame, function_defined, {})
+            return [replace(node, block=block, frame_size=function_frame.frame_size)]
+        if isinstance(node, BlockNode):
+            return [self.block(node, frame, defined, ranges)]
+        return [self.mark(node, ranges)]
+
+    def if_statement(self, node, frame, defined, ranges):
+        false_block = node.false_block
+        if isinstance(false_block, IfStatementNode):
+            false_block = self.if_statement(false_block, frame, defined, ranges)
+        elif false_block is not None:
+            false_block = self.block(false_block, frame, defined, ranges)
+        true_block = self.block(node.true_block, frame, defined, ranges) if node.true_block else node.true_block
+        return replace(node, condition=self.mark(node.condition, ranges), true_block=true_block, false_block=false_block)
+
+    def loop(self, node, frame, defined, ranges):
+        if any(isinstance(child, FunctionDeclarationNode) for child in walk(node.block)):
+            # La función puede llamarse después del bucle, con otros valores.
+            return [node]
+
+        written = written_names(node.condition, node.block)
+        if self.calls_functions(node):
+            written |= self.function_writes
+        counter = self.counter(node, written)
+
+        hoister = Hoister(self, written | written_names(node.init, node.increment), defined, frame)
+        condition = hoister.expression(node.condition)
+        increment = hoister.expression(node.increment)
+        block = hoister.block(node.block)
+
+        inner_defined = defined | {declaration.identifier_list[0].name for declaration in hoister.declarations}
+        if isinstance(node.init, DeclarationNode):
+            inner_defined |= {identifier.name for identifier in node.init.identifier_list}
+        inner_ranges = ranges
+        if counter is not None:
+            inner_ranges = dict(ranges)
+            inner_ranges[counter[0]] = counter[1]
+
+        loop = replace(node,
+                       init=self.mark(node.init, ranges),
+                       condition=self.mark(condition, ranges),
+                       increment=self.mark(increment, ranges),
+                       block=self.block(block, frame, inner_defined, inner_ranges))
+        return hoister.declarations + [loop]
+
+    def counter(self, node, written):
+        # Reconoce Nightmare (Hunter i: Maria => c; i < n; i => i + k;) con c
+        # y k enteros (c >= 0, k > 0), n constante e i sin otras escrituras
+        # en el bucle. Devuelve (i, (operador, n)): dentro del cuerpo vale
+        # c <= i < n (o i <= n).
+        init = node.init
+        if isinstance(init, DeclarationNode) and len(init.identifier_list) == 1:
+            name, start = init.identifier_list[0].name, init.expression
+        elif is_assignment(init) and isinstance(init.left, IdentifierNode):
+            name, start = init.left.name, init.right
+        else:
+            return None
+        if self.scalar_types.get(name) != 'MARIA' or name in written:
+            return None
+        start = self.constant_value(start)
+        if start is None or start < 0:
+            return None
+
+        condition = node.condition
+        if not (isinstance(condition, BinaryOpNode) and condition.operator in ('LESS', 'LESSEQUAL') and is_name(condition.left, name)):
+            return None
+        bound = self.constant_value(condition.right)
+        if bound is None:
+            return None
+
+        increment = node.increment
+        if not (is_assignment(increment) and is_name(increment.left, name)):
+            return None
+        step = increment.right
+        if not (isinstance(step, BinaryOpNode) and step.operator == 'PLUS'):
+            return None
+        if is_name(step.left, name):
+            amount = self.constant_value(step.right)
+        elif is_name(step.right, name):
+            amount = self.constant_value(step.left)
+        else:
+            return None
+        if amount is None or amount <= 0:
+            return None
+        return name, (condition.operator, bound)
+
+    # Accesos sin comprobación de rango
+
+    def mark(self, node, ranges):
+        if not ranges or node is None:
+            return node
+        if isinstance(node, DeclarationNode):
+            var_type = node.var_type
+            if isinstance(var_type, tuple):
+                sizes = tuple(self.mark(size, ranges) for size in var_type[1:])
+                if any(a is not b for a, b in zip(sizes, var_type[1:])):
+                    var_type = (var_type[0],) + sizes
+            return replace(node, var_type=var_type, expression=self.mark(node.expression, ranges))
+        if isinstance(node, ReturnNode):
+            return replace(node, expression=self.mark(node.expression, ranges))
+        if isinstance(node, BinaryOpNode):
+            marked = replace(node, left=self.mark(node.left, ranges), right=self.mark(node.right, ranges))
+            if node.operator == 'INDEX' and node.bounds_check and self.in_bounds(node, ranges):
+                self.stats.unchecked_indexes += 1
+                marked = replace(marked, bounds_check=False)
+            return marked
+        if isinstance(node, UnaryOpNode):
+            return replace(node, operand=self.mark(node.operand, ranges))
+        if isinstance(node, FunctionCallNode):
+            if call_name(node) == 'EYES' or not node.arguments:
+                return node
+            arguments = [self.mark(argument, ranges) for argument in node.arguments]
+            if all(a is b for a, b in zip(arguments, node.arguments)):
+                return node
+            return replace(node, arguments=arguments)
+        if isinstance(node, ArrayNode):
+            elements = [self.mark(element, ranges) for element in node.elements]
+            if all(a is b for a, b in zip(elements, node.elements)):
+                return node
+            return replace(node, elements=elements)
+        return node
+
+    def in_bounds(self, node, ranges):
+        if isinstance(node.left, BinaryOpNode) and node.left.operator == 'INDEX':
+            base, indices = node.left.left, (node.left.right, node.right)
+        else:
+            base, indices = node.left, (node.right,)
+        if not isinstance(base, IdentifierNode):
+            return False
+        var_type = self.arrays.get(base.name)
+        if var_type is None or len(var_type) != len(indices) + 1:
+            return False
+        return all(self.index_in_range(index, size, ranges) for index, size in zip(indices, var_type[1:]))
+
+    def index_in_range(self, index, size, ranges):
+        if not isinstance(index, IdentifierNode) or index.name not in ranges:
+            return False
+        size = self.constant_value(size)
+        if size is None:
+            return False
+        operator, bound = ranges[index.name]
+        return bound < size if operator == 'LESSEQUAL' else bound <= size
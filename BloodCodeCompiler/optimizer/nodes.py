@@ -0,0 +1,18 @@
+import copy
+
+from parser.ast import ConstantNode, StringNode
+
+
+def is_constant(node):
+    return isinstance(node, (ConstantNode, StringNode))
+
+
+def replace(node, **fields):
+    # Copia el nodo sólo si cambia algún campo, para no tocar el AST del parser
+    # (el que devuelve /compile con action 'ast').
+    if all(getattr(node, name) is value for name, value in fields.items()):
+        return node
+    new_node = copy.copy(node)
+    for name, value in fields.items():
+        setattr(new_node, name, value)
+    return new_node
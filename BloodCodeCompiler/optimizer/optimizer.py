@@ -0,0 +1,212 @@
+import math
+import operator
+
+from parser.ast import NumberNode, IdentifierNode, BinaryOpNode, StringNode, DeclarationNode, BlockNode, IfStatementNode, LoopNode, FunctionCallNode, RestNode, BooleanNode, UnaryOpNode, FunctionDeclarationNode, ReturnNode, ArrayNode, ConstantNode
+from interpreter.runtime import decode_number, reachable_statements
+from .stats import OptimizationStats
+from .nodes import is_constant, replace
+from .loops import LoopOptimizer
+
+# Mismas operaciones que hacen los motores en tiempo de ejecución.
+FOLDABLE_OPERATORS = {
+    'PLUS': operator.add,
+    'MINUS': operator.sub,
+    'MULTIPLY': operator.mul,
+    'DIVIDE': operator.truediv,
+    'EQUAL': operator.eq,
+    'NOT': operator.ne,
+    'GREATER': operator.gt,
+    'LESS': operator.lt,
+    'GREATEREQUAL': operator.ge,
+    'LESSEQUAL': operator.le,
+    'BLOODBOND': lambda left, right: bool(left) and bool(right),
+    'OLDBLOOD': lambda left, right: bool(left) or bool(right),
+    'VILEBLOOD': lambda left, right: not bool(right),
+}
+
+# Expresiones con hijos; el resto se optimiza sin recorrer nada.
+COMPOUND_EXPRESSIONS = (BinaryOpNode, UnaryOpNode, FunctionCallNode, ArrayNode)
+
+
+def has_top_level_return(block):
+    return any(isinstance(statement, ReturnNode) for statement in block.statements)
+
+
+class Optimizer:
+    # Se ejecuta después del Resolver, así las variables de las ramas
+    # eliminadas conservan su lugar en el frame. Una sentencia está "en
+    # posición de valor" cuando puede ser la última de un bloque cuyo
+    # resultado se usa (el cuerpo de una función y sus Insight); ahí se
+    # conserva la forma del Insight para no cambiar el valor que devuelve.
+    def __init__(self):
+        self.stats = OptimizationStats()
+
+    def optimize(self, program):
+        # Los bucles se optimizan al final, ya con las constantes plegadas.
+        program = self.block(program, True)
+        return LoopOptimizer(self.stats).optimize(program), self.stats
+
+    def block(self, node, value_position):
+        statements = reachable_statements(node)
+        self.stats.removed_statements += len(node.statements) - len(statements)
+        optimized = []
+        for index, statement in enumerate(statements):
+            optimized.extend(self.statement(statement, value_position and index == len(statements) - 1))
+        if len(optimized) == len(node.statements) and all(a is b for a, b in zip(optimized, node.statements)):
+            return node
+        return replace(node, statements=optimized)
+
+    def statement(self, node, value_position):
+        # Devuelve la lista de sentencias que reemplazan a 'node'.
+        if isinstance(node, IfStatementNode):
+            return self.if_statement(node, value_position)
+        if isinstance(node, LoopNode):
+            return [replace(node,
+                            init=self.statement(node.init, False)[0] if node.init else node.init,
+                            condition=self.expression(node.condition),
+                            increment=self.expression(node.increment),
+                            block=self.block(node.block, False))]
+        if isinstance(node, FunctionDeclarationNode):
+            return [replace(node, block=self.block(node.block, True))]
+        if isinstance(node, DeclarationNode):
+            var_type = node.var_type
+            if isinstance(var_type, tuple):
+                sizes = tuple(self.expression(size) for size in var_type[1:])
+                if any(a is not b for a, b in zip(sizes, var_type[1:])):
+                    var_type = (var_type[0],) + sizes
+            return [replace(node, var_type=var_type, expression=self.expression(node.expression))]
+        if isinstance(node, ReturnNode):
+            return [replace(node, expression=self.expression(node.expression))]
+        if isinstance(node, BlockNode):
+            return [self.block(node, value_position)]
+        return [self.expression(node)]
+
+    def if_statement(self, node, value_position):
+        arms = []
+        current_node = node
+        while True:
+            arms.append((current_node, self.expression(current_node.condition)))
+            if not isinstance(current_node.false_block, IfStatementNode):
+                break
+            current_node = current_node.false_block
+        else_block = current_node.false_block
+
+        # Las ramas con condición falsa no se ejecutan nunca y una condición
+        # verdadera deja sin alcanzar todo lo que viene después.
+        kept = []
+        always_taken = False
+        for index, (arm, condition) in enumerate(arms):
+            if is_constant(condition) and not condition.value:
+                self.stats.pruned_branches += 1
+                continue
+            kept.append((arm, condition))
+            if is_constant(condition):
+                always_taken = True
+                self.stats.pruned_branches += len(arms) - index - 1 + (else_block is not None)
+                else_block = None
+                break
+
+        if else_block is not None:
+            else_block = self.block(else_block, value_position)
+
+        if not kept:
+            if else_block is None:
+                # Sin ramas el Insight vale 0.
+                return [ConstantNode(0, node.line_number)] if value_position else []
+            if not value_position and not has_top_level_return(else_block):
+                self.stats.inlined_branches += 1
+                return else_block.statements
+            # El Madness convierte None en 0: se mantiene como tal.
+            return [IfStatementNode(ConstantNode(False, node.line_number), BlockNode([], node.line_number), else_block, node.line_number)]
+
+        if len(kept) == 1 and always_taken:
+            arm, condition = kept[0]
+            block = self.block(arm.true_block, value_position)
+            if not value_position and not has_top_level_return(block):
+                self.stats.inlined_branches += 1
+                return block.statements
+            return [replace(arm, condition=condition, true_block=block, false_block=None)]
+
+        false_block = else_block
+        for arm, condition in reversed(kept):
+            false_block = replace(arm, condition=condition, true_block=self.block(arm.true_block, value_position), false_block=false_block)
+        return [false_block]
+
+    def expression(self, node):
+        # Los nodos con hijos se reconstruyen con generadores que hacen
+        # `yield` de cada hijo y reciben su versión optimizada; los que están
+        # en curso quedan en una pila explícita, no en la de Python.
+        stack = []
+        while True:
+            if isinstance(node, COMPOUND_EXPRESSIONS):
+                stack.append(self.compound_expression(node))
+                value = None
+            else:
+                value = self.simple_expression(node)
+            while stack:
+                try:
+                    node = stack[-1].send(value)
+                    break
+                except StopIteration as stop:
+                    stack.pop()
+                    value = stop.value
+            else:
+                return value
+
+    def simple_expression(self, node):
+        if isinstance(node, NumberNode):
+            self.stats.decoded_literals += 1
+            return ConstantNode(decode_number(node.value), node.line_number)
+        if isinstance(node, BooleanNode):
+            self.stats.decoded_literals += 1
+            return ConstantNode(str(node.value).lower() == 'true', node.line_number)
+        return node
+
+    def compound_expression(self, node):
+        if isinstance(node, BinaryOpNode):
+            if node.operator in ('ASSIGN', 'ARROW_ASSIGN', 'INDEX'):
+                left = yield node.left
+                right = yield node.right
+                return replace(node, left=left, right=right)
+            left = yield node.left
+            right = yield node.right
+            if is_constant(left) and is_constant(right) and node.operator in FOLDABLE_OPERATORS:
+                folded = self.fold(FOLDABLE_OPERATORS[node.operator], left.value, right.value, node)
+                if folded is not None:
+                    return folded
+            return replace(node, left=left, right=right)
+        if isinstance(node, UnaryOpNode):
+            operand = yield node.operand
+            if node.operator == 'VILEBLOOD' and is_constant(operand):
+                self.stats.folded_expressions += 1
+                return ConstantNode(not operand.value, node.line_number)
+            return replace(node, operand=operand)
+        if isinstance(node, FunctionCallNode):
+            if node.identifier == 'EYES' or not node.arguments:
+                return node
+            arguments = []
+            for argument in node.arguments:
+                arguments.append((yield argument))
+            if all(a is b for a, b in zip(arguments, node.arguments)):
+                return node
+            return replace(node, arguments=arguments)
+        elements = []
+        for element in node.elements:
+            elements.append((yield element))
+        if all(a is b for a, b in zip(elements, node.elements)):
+            return node
+        return replace(node, elements=elements)
+
+    def fold(self, op, left, right, node):
+        # Si la operación falla (división por cero, tipos incompatibles) se
+        # deja para que el error aparezca al ejecutar, con su línea.
+        try:
+            value = op(left, right)
+        except Exception:
+            return None
+        if not isinstance(value, (int, float, str, bool)):
+            return None
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+        self.stats.folded_expressions += 1
+        return ConstantNode(value, node.line_number)
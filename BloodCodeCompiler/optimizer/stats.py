@@ -0,0 +1,24 @@
+class OptimizationStats:
+    # Cantidad de transformaciones que aplicó el optimizador a un programa.
+    def __init__(self):
+        self.folded_expressions = 0
+        self.decoded_literals = 0
+        self.pruned_branches = 0
+        self.inlined_branches = 0
+        self.removed_statements = 0
+        self.hoisted_expressions = 0
+        self.unchecked_indexes = 0
+
+    def total(self):
+        return sum(self.as_dict().values())
+
+    def as_dict(self):
+        return {
+            'folded_expressions': self.folded_expressions,
+            'decoded_literals': self.decoded_literals,
+            'pruned_branches': self.pruned_branches,
+            'inlined_branches': self.inlined_branches,
+            'removed_statements': self.removed_statements,
+            'hoisted_expressions': self.hoisted_expressions,
+            'unchecked_indexes': self.unchecked_indexes,
+        }
@@ -1,18 +1,51 @@
+from sys import intern
+
+
 class ASTNode:
+    # Los nodos usan __slots__ en lugar de un __dict__ por instancia: en un
+    # programa grande el AST ocupa bastante menos. 'fields' son todos los
+    # slots de la clase, para recorrer el árbol sin vars().
+    __slots__ = ('line_number',)
+    fields = ('line_number',)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.fields = tuple(name for klass in reversed(cls.__mro__) for name in klass.__dict__.get('__slots__', ()))
+
     def __init__(self, line_number):
         self.line_number = line_number 
 
+    def field_values(self):
+        return [getattr(self, name) for name in self.fields]
+
+    def __copy__(self):
+        # El optimizador copia nodos con copy.copy; sin __dict__ el camino
+        # genérico de copy (por __reduce_ex__) es más lento.
+        node = object.__new__(type(self))
+        for name in self.fields:
+            setattr(node, name, getattr(self, name))
+        return node
+
 
 class IdentifierNode(ASTNode):
+    __slots__ = ('name', 'depth', 'slot')
+
     def __init__(self, name, line_number):
         super().__init__(line_number)
-        self.name = name
+        # Cada aparición de un nombre comparte la misma cadena.
+        self.name = intern(name)
+        # Coordenada asignada por el Resolver: profundidad de la función que
+        # declara la variable (0 = programa principal) y posición en su frame.
+        self.depth = None
+        self.slot = None
 
     def __repr__(self):
         return f"Identifier({self.name})"
 
 
 class NumberNode(ASTNode):
+    __slots__ = ('value',)
+
     def __init__(self, value, line_number):
         super().__init__(line_number)
         self.value = value
@@ -22,6 +55,8 @@ class NumberNode(ASTNode):
 
 
 class StringNode(ASTNode):
+    __slots__ = ('value',)
+
     def __init__(self, value, line_number):
         super().__init__(line_number)
         self.value = value
@@ -31,17 +66,28 @@ class StringNode(ASTNode):
 
 
 class BinaryOpNode(ASTNode):
+    __slots__ = ('left', 'operator', 'right', 'bounds_check', 'operand_type')
+
     def __init__(self, left, operator, right, line_number):
         super().__init__(line_number)
         self.left = left
-        self.operator = operator
+        self.operator = intern(operator)
         self.right = right
+        # Sólo en INDEX: el optimizador de bucles lo pone en False cuando
+        # demuestra que el índice no puede salir del rango del arreglo.
+        self.bounds_check = True
+        # Tipo de los operandos cuando ambos son escalares del mismo tipo
+        # ('MARIA', 'EILEEN', 'BLOOD', ...); lo anota el SemanticAnalyzer y
+        # el Interpreter elige con él la operación una sola vez.
+        self.operand_type = None
 
     def __repr__(self):
         return f"BinaryOp({self.left}, {self.operator}, {self.right})"
 
 
 class DeclarationNode(ASTNode):
+    __slots__ = ('identifier_list', 'var_type', 'expression')
+
     def __init__(self, identifier_list, var_type, expression=None, line_number=None):
         super().__init__(line_number)
         self.identifier_list = identifier_list
@@ -53,15 +99,21 @@ class DeclarationNode(ASTNode):
 
 
 class BlockNode(ASTNode):
+    __slots__ = ('statements', 'frame_size')
+
     def __init__(self, statements, line_number=None):
         super().__init__(line_number)
         self.statements = statements
+        # Sólo en el bloque principal: cantidad de variables globales.
+        self.frame_size = None
 
     def __repr__(self):
         return f"Block({self.statements})"
 
 
 class IfStatementNode(ASTNode):
+    __slots__ = ('condition', 'true_block', 'false_block')
+
     def __init__(self, condition, true_block, false_block=None, line_number=None):
         super().__init__(line_number)
         self.condition = condition
@@ -73,6 +125,8 @@ class IfStatementNode(ASTNode):
 
 
 class LoopNode(ASTNode):
+    __slots__ = ('init', 'condition', 'increment', 'block')
+
     def __init__(self, init, condition, increment, block, line_number=None):
         super().__init__(line_number)
         self.init = init
@@ -85,6 +139,8 @@ class LoopNode(ASTNode):
 
 
 class FunctionCallNode(ASTNode):
+    __slots__ = ('identifier', 'arguments')
+
     def __init__(self, identifier, arguments, line_number=None):
         super().__init__(line_number)
         self.identifier = identifier
@@ -95,6 +151,8 @@ class FunctionCallNode(ASTNode):
 
 
 class RestNode(ASTNode):
+    __slots__ = ()
+
     def __init__(self, line_number=None):
         super().__init__(line_number)
 
@@ -103,6 +161,8 @@ class RestNode(ASTNode):
 
 
 class BooleanNode(ASTNode):
+    __slots__ = ('value',)
+
     def __init__(self, value, line_number=None):
         super().__init__(line_number)
         self.value = value
@@ -112,9 +172,11 @@ class BooleanNode(ASTNode):
 
 
 class UnaryOpNode(ASTNode):
+    __slots__ = ('operator', 'operand')
+
     def __init__(self, operator, operand, line_number=None):
         super().__init__(line_number)
-        self.operator = operator
+        self.operator = intern(operator)
         self.operand = operand
 
     def __repr__(self):
@@ -122,21 +184,51 @@ class UnaryOpNode(ASTNode):
 
 
 class FunctionDeclarationNode(ASTNode):
+    __slots__ = ('name', 'parameters', 'return_type', 'block', 'depth', 'frame_size', 'pure')
+
     def __init__(self, name, parameters, return_type, block, line_number=None):
         super().__init__(line_number)
         self.name = name
         self.parameters = parameters
         self.return_type = return_type
         self.block = block
+        self.depth = None
+        self.frame_size = None
+        # Lo marca el SemanticAnalyzer: la función sólo depende de sus
+        # argumentos y sus llamadas se pueden memorizar.
+        self.pure = False
+
+    def __repr__(self):
+        return f"FunctionDeclaration({self.name}, {self.parameters}, {self.return_type}, {self.block})"
 
 
 class ReturnNode(ASTNode):
+    __slots__ = ('expression',)
+
     def __init__(self, expression, line_number=None):
         super().__init__(line_number)
         self.expression = expression
 
+    def __repr__(self):
+        return f"Return({self.expression})"
+
+
+class ConstantNode(ASTNode):
+    # Valor final ya calculado por el optimizador: un literal decodificado o
+    # una expresión constante plegada.
+    __slots__ = ('value',)
+
+    def __init__(self, value, line_number=None):
+        super().__init__(line_number)
+        self.value = value
+
+    def __repr__(self):
+        return f"Constant({self.value!r})"
+
 
 class ArrayNode(ASTNode):
+    __slots__ = ('elements',)
+
     def __init__(self, elements, line_number=None):
         super().__init__(line_number)
         self.elements = elements
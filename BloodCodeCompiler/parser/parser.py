@@ -1,68 +1,124 @@
 from .ast import ASTNode, NumberNode, IdentifierNode, BinaryOpNode, StringNode, DeclarationNode, BlockNode, IfStatementNode, LoopNode, FunctionCallNode, RestNode, BooleanNode, UnaryOpNode, FunctionDeclarationNode, ReturnNode, ArrayNode
+from collections import deque
+from typing import Iterable
 from lexer.lexer import Token
-def error_handler(func):
-    def wrapper(self, *args, **kwargs):
-        try:
-            return func(self, *args, **kwargs)
-        except Exception as e:
-            raise SyntaxError(f"Error en {func.__name__}: {str(e)} ")
-    return wrapper
+
+# Precedencia de los operadores binarios (mayor = se agrupa antes); todos
+# asocian a la izquierda.
+BINARY_PRECEDENCE = {
+    'OLDBLOOD': 1,
+    'BLOODBOND': 2,
+    'EQUAL': 3, 'NOT': 3,
+    'GREATER': 4, 'LESS': 4, 'GREATEREQUAL': 4, 'LESSEQUAL': 4,
+    'PLUS': 5, 'MINUS': 5,
+    'MULTIPLY': 6, 'DIVIDE': 6,
+}
+
+
+class ParseError(SyntaxError):
+    # Error de sintaxis con el token donde se detectó.
+    def __init__(self, message, token):
+        self.token = token
+        self.line_number = token.line_number if token is not None else None
+        super().__init__(f"Error de sintaxis en la línea {self.line_number}: {message}")
+
 
 class Parser:
-    def __init__(self, tokens: list[Token]):
-        self.tokens = tokens
+    def __init__(self, tokens: Iterable[Token]):
+        # Acepta una lista o un generador (Lexer.stream()); los tokens se piden
+        # a demanda y solo se retienen los de `lookahead`.
+        self.token_stream = iter(tokens)
+        self.lookahead = deque()
         self.token_position = 0
-        self.current_token = self.tokens[self.token_position]
+        self.current_token = self.pull_token()
+        self.end_of_input = self.current_token is None
+        # Tablas de despacho por tipo de token, armadas una sola vez: la de
+        # sentencias y la de lo que puede empezar un operando.
+        self.statement_parsers = {
+            'HUNTER': self.parse_declaration,
+            'GREATONES': self.parse_function_declaration,
+            'ECHOES': self.parse_return_statement,
+            'INSIGHT': self.parse_if_statement,
+            'NIGHTMARE': self.parse_nightmare_loop,
+            'DREAM': self.parse_dream_loop,
+            'PRAY': self.parse_pray,
+            'EYES': self.parse_eyes_statement,
+            'REST': self.parse_rest_statement,
+            'IDENTIFIER': self.parse_assignment_or_expression
+        }
+        self.prefix_parsers = {
+            'NUMBER': self.parse_number,
+            'STRING': self.parse_string,
+            'TRUE': self.parse_boolean,
+            'FALSE': self.parse_boolean,
+            'IDENTIFIER': self.parse_identifier_expression,
+            'LPAREN': self.parse_parenthesized,
+            'VILEBLOOD': self.parse_unary_operation,
+        }
+
+    def pull_token(self):
+        if self.lookahead:
+            return self.lookahead.popleft()
+        return next(self.token_stream, None)
+
+    def peek_token(self, offset=1):
+        while len(self.lookahead) < offset:
+            token = next(self.token_stream, None)
+            if token is None:
+                return None
+            self.lookahead.append(token)
+        return self.lookahead[offset - 1]
+
+    def peek_token_type(self, offset=1):
+        token = self.peek_token(offset)
+        return token.type if token is not None else None
 
     def check_token_type(self, token_type):
         if self.current_token.type != token_type:
-            raise SyntaxError(f"Se esperaba {token_type}, pero se encontró {self.current_token.type} en la línea {self.current_token.line_number}")
+            raise ParseError(f"Se esperaba {token_type}, pero se encontró {self.current_token.type} ('{self.current_token.value}')", self.current_token)
 
     def consume_token(self):
         self.token_position += 1
-        if self.token_position < len(self.tokens):
-            self.current_token = self.tokens[self.token_position]
+        next_token = self.lookahead.popleft() if self.lookahead else next(self.token_stream, None)
+        if next_token is not None:
+            self.current_token = next_token
+        else:
+            self.end_of_input = True
 
     def validate_and_consume_token(self, token_type):
         self.check_token_type(token_type)
         self.consume_token()
 
-    @error_handler
     def parse(self):
-        return self.parse_main_block()
+        try:
+            return self.parse_main_block()
+        except Exception as e:
+            raise self.syntax_error(e) from None
+
+    def syntax_error(self, error):
+        # Única traducción de errores del parser: los errores propios y los del
+        # lexer ya traen la línea; cualquier otro se asocia al token actual.
+        if isinstance(error, SyntaxError):
+            return error
+        return ParseError(str(error), self.current_token)
 
-    @error_handler
     def parse_block(self):
         statements = []
         self.validate_and_consume_token('LBRACE')
         while self.current_token.type != 'RBRACE':
-            if self.token_position >= len(self.tokens):  
-                raise SyntaxError(f"Bloque no cerrado correctamente en la línea {self.current_token.line_number}")
+            if self.end_of_input:  
+                raise ParseError("Bloque no cerrado correctamente", self.current_token)
             statements.append(self.parse_statement())
         self.validate_and_consume_token('RBRACE')
         return BlockNode(statements, self.current_token.line_number)
     
-    @error_handler
     def parse_statement(self):
-        parse_map = {
-            'HUNTER': self.parse_declaration,
-            'GREATONES': self.parse_function_declaration,
-            'ECHOES': self.parse_return_statement,
-            'INSIGHT': self.parse_if_statement,
-            'NIGHTMARE': self.parse_nightmare_loop,
-            'DREAM': self.parse_dream_loop,
-            'PRAY': self.parse_pray,
-            'EYES': self.parse_eyes_statement,
-            'REST': self.parse_rest_statement,
-            'IDENTIFIER': self.parse_assignment_or_expression
-        }
-        parse_func = parse_map.get(self.current_token.type)
+        parse_func = self.statement_parsers.get(self.current_token.type)
         if parse_func:
             return parse_func()
         else:
             return self.parse_expression()
-        
-    @error_handler
+
     def parse_declaration(self):
         self.validate_and_consume_token('HUNTER')
         identifier_list = self.parse_identifier_list()
@@ -80,7 +136,7 @@ class Parser:
                 size1 = self.parse_expression() 
                 self.validate_and_consume_token('RBRACKET')
 
-                if self.current_token.type == 'DOT' and self.tokens[self.token_position + 1].type == 'LBRACKET':
+                if self.current_token.type == 'DOT' and self.peek_token_type() == 'LBRACKET':
                     self.consume_token() 
                     self.consume_token() 
                     size2 = self.parse_expression()  
@@ -102,7 +158,6 @@ class Parser:
 
 
 
-    @error_handler
     def parse_identifier_list(self):
         identifiers = [self.parse_identifier()] 
         while self.current_token.type == 'COMMA':  
@@ -110,18 +165,6 @@ class Parser:
             identifiers.append(self.parse_identifier())  
         return identifiers
 
-    @error_handler
-    def parse_identifier(self):
-        self.check_token_type('IDENTIFIER')
-        name = self.current_token.value
-        line_number = self.current_token.line_number
-        if not any(name in scope for scope in self.env.scopes):  
-            raise Exception(f"Error en línea {line_number}: El identificador '{name}' no ha sido declarado en ningún ámbito.")
-        self.consume_token()
-        return IdentifierNode(name, line_number)
-
-        
-    @error_handler
     def parse_function_declaration(self):
         self.validate_and_consume_token('GREATONES')  
         func_name = self.parse_identifier()  
@@ -141,7 +184,6 @@ class Parser:
         block = self.parse_block() 
         return FunctionDeclarationNode(func_name, params, return_type, block, line_number)
 
-    @error_handler
     def parse_parameter_list(self):
         params = [self.parse_parameter()]
         while self.current_token.type == 'COMMA':
@@ -211,20 +253,6 @@ class Parser:
 
 
 
-    @error_handler
-    def parse_array_assignment_or_access(self, identifier):
-        self.consume_token()  
-        index = self.parse_expression()  
-        self.validate_and_consume_token('RBRACKET')
-
-        if self.current_token.type == 'ASSIGN':
-            self.consume_token()  
-            expression = self.parse_expression()  
-            self.validate_and_consume_token('SEMICOLON')
-            return BinaryOpNode(BinaryOpNode(identifier, 'INDEX', index, self.current_token.line_number), 'ASSIGN', expression, self.current_token.line_number)
-        
-        return BinaryOpNode(identifier, 'INDEX', index, self.current_token.line_number)
-
     def parse_function_call(self, identifier):
         self.consume_token()  
         arguments = []
@@ -237,19 +265,6 @@ class Parser:
 
 
 
-    @error_handler
-    def parse_assignment(self, identifier):
-        self.consume_token()
-        
-        if self.current_token.type == 'EYES':
-            expression = self.parse_eyes()
-        else:
-            expression = self.parse_expression()
-        
-        self.validate_and_consume_token('SEMICOLON')
-        
-        return BinaryOpNode(identifier, 'ASSIGN', expression, self.current_token.line_number)
-
     def parse_if_statement(self):
         self.validate_and_consume_token('INSIGHT')
         self.validate_and_consume_token('LPAREN')
@@ -282,41 +297,12 @@ class Parser:
 
         return root_if_node 
 
-    @error_handler
-    def parse_primary(self):
-        if self.current_token.type == 'NUMBER':
-            return self.parse_number()
-
-        elif self.current_token.type == 'STRING':
-            return self.parse_string()
-
-        elif self.current_token.type in ('TRUE', 'FALSE'):
-            return self.parse_boolean()
-
-        elif self.current_token.type == 'IDENTIFIER':
-            identifier = self.parse_identifier()
-            if self.current_token.type == 'LBRACKET':
-                return self.parse_matrix_or_array_access(identifier)
-            elif self.current_token.type == 'LPAREN':
-                return self.parse_function_call(identifier)
-            return identifier
-
-        elif self.current_token.type == 'LPAREN':
-            self.consume_token()
-            expr = self.parse_expression()
-            self.validate_and_consume_token('RPAREN')
-            return expr
-
-        else:
-            raise SyntaxError(f"Token inesperado {self.current_token.type} en la línea {self.current_token.line_number} --> {self.current_token.value}")
-
-    @error_handler
     def parse_matrix_or_array_access(self, identifier):
         self.consume_token()  
         index1 = self.parse_expression()  
         self.validate_and_consume_token('RBRACKET')
 
-        if self.current_token.type == 'DOT' and self.tokens[self.token_position + 1].type == 'LBRACKET':
+        if self.current_token.type == 'DOT' and self.peek_token_type() == 'LBRACKET':
             self.consume_token()  
             self.consume_token()  
             index2 = self.parse_expression()
@@ -359,80 +345,54 @@ class Parser:
     def parse_expression(self):
         if self.current_token.type == 'LBRACKET': 
             self.consume_token()  
-            elements = []
-            while self.current_token.type != 'RBRACKET':
-                elements.append(self.parse_expression()) 
-                if self.current_token.type == 'COMMA':
-                    self.consume_token() 
-            self.validate_and_consume_token('RBRACKET')  
+            elements = self.parse_array_elements()
             return ArrayNode(elements, self.current_token.line_number)
-        return self.parse_logical_or()
-
-    def parse_binary_operation(self, parse_lower_precedence, operators):
-        node = parse_lower_precedence()
-        while self.current_token.type in operators:
-            operator = self.current_token.type
+        return self.parse_binary_operation()
+
+    def parse_binary_operation(self, min_precedence=0):
+        # Precedence climbing: cada llamada junta los operadores de mayor
+        # precedencia que `min_precedence`; un nivel de llamada por operador
+        # en lugar de uno por nivel de precedencia.
+        node = self.parse_unary()
+        operator = self.current_token.type
+        precedence = BINARY_PRECEDENCE.get(operator, 0)
+        while precedence > min_precedence:
             self.consume_token()
-            right = parse_lower_precedence()
+            right = self.parse_binary_operation(precedence)
             node = BinaryOpNode(node, operator, right, self.current_token.line_number)
+            operator = self.current_token.type
+            precedence = BINARY_PRECEDENCE.get(operator, 0)
         return node
 
-    def parse_logical_or(self):
-        return self.parse_binary_operation(self.parse_logical_and, {'OLDBLOOD'})
-
-    def parse_logical_and(self):
-        return self.parse_binary_operation(self.parse_equality, {'BLOODBOND'})
-
-    def parse_equality(self):
-        return self.parse_binary_operation(self.parse_relational, {'EQUAL', 'NOT'})
-
-    def parse_relational(self):
-        return self.parse_binary_operation(self.parse_additive, {'GREATER', 'LESS', 'GREATEREQUAL', 'LESSEQUAL'})
-
-    def parse_additive(self):
-        return self.parse_binary_operation(self.parse_multiplicative, {'PLUS', 'MINUS'})
-
-    def parse_multiplicative(self):
-        return self.parse_binary_operation(self.parse_unary, {'MULTIPLY', 'DIVIDE'})
-
     def parse_unary(self):
-        if self.current_token.type == 'VILEBLOOD':
-            operator = self.current_token.type
-            self.consume_token()
-            operand = self.parse_unary()
-            return UnaryOpNode(operator, operand, self.current_token.line_number)
-        else:
-            return self.parse_primary()
-
-
-    @error_handler
-    def parse_primary(self):
-        if self.current_token.type == 'NUMBER':
-            return self.parse_number()
-
-        elif self.current_token.type == 'STRING':
-            return self.parse_string()
-
-        elif self.current_token.type in ('TRUE', 'FALSE'):
-            return self.parse_boolean()
-
-        elif self.current_token.type == 'IDENTIFIER':
-            identifier = self.parse_identifier()
-            if self.current_token.type == 'LBRACKET':
-                return self.parse_matrix_or_array_access(identifier)
-            elif self.current_token.type == 'LPAREN':
-                return self.parse_function_call(identifier)
-            return identifier
+        # Al terminar la entrada current_token sigue siendo el último token,
+        # ya consumido: un '(' final se volvería a leer sin fin.
+        if self.end_of_input:
+            raise ParseError("Expresión incompleta al final de la entrada", self.current_token)
+        parse_func = self.prefix_parsers.get(self.current_token.type)
+        if parse_func is None:
+            raise ParseError(f"Token inesperado {self.current_token.type} ('{self.current_token.value}')", self.current_token)
+        return parse_func()
+
+    def parse_unary_operation(self):
+        operator = self.current_token.type
+        self.consume_token()
+        operand = self.parse_unary()
+        return UnaryOpNode(operator, operand, self.current_token.line_number)
 
+    def parse_identifier_expression(self):
+        identifier = self.parse_identifier()
+        if self.current_token.type == 'LBRACKET':
+            return self.parse_matrix_or_array_access(identifier)
         elif self.current_token.type == 'LPAREN':
-            self.consume_token()
-            expr = self.parse_expression()
-            self.validate_and_consume_token('RPAREN')
-            return expr
-
-        else:
-            raise SyntaxError(f"Token inesperado {self.current_token.type} en la línea {self.current_token.line_number} --> {self.current_token.value}")
+            return self.parse_function_call(identifier)
+        return identifier
 
+    def parse_parenthesized(self):
+        self.consume_token()
+        expr = self.parse_expression()
+        self.validate_and_consume_token('RPAREN')
+        return expr
 
     def parse_number(self):
         value = self.current_token.value
@@ -452,20 +412,6 @@ class Parser:
         self.consume_token()
         return BooleanNode(value, line_number)
 
-    def parse_identifier_expression(self):
-        identifier = self.parse_identifier()
-        if self.current_token.type == 'LBRACKET':
-            return self.parse_array_access(identifier)
-        elif self.current_token.type == 'LPAREN':
-            return self.parse_function_call(identifier)
-        return identifier
-
-    def parse_array_access(self, identifier):
-        self.consume_token()
-        index = self.parse_expression()
-        self.validate_and_consume_token('RBRACKET')
-        return BinaryOpNode(identifier, 'INDEX', index, self.current_token.line_number)
-
     def parse_argument_list(self):
         arguments = [self.parse_expression()] 
         while self.current_token.type == 'COMMA':  
@@ -481,25 +427,30 @@ class Parser:
 
     def parse_main_block(self):
         statements = []
-        while self.token_position < len(self.tokens): 
+        while not self.end_of_input: 
             statements.append(self.parse_statement()) 
-        return BlockNode(statements, self.current_token.line_number)
+        line_number = self.current_token.line_number if self.current_token else None
+        return BlockNode(statements, line_number)
 
-    def parse_eyes(self):
-        self.validate_and_consume_token('EYES')
-        self.validate_and_consume_token('LPAREN')  
-        prompt = self.parse_expression()  
-        self.validate_and_consume_token('RPAREN') 
-        return FunctionCallNode('EYES', [prompt], self.current_token.line_number)
-    
-    @error_handler
     def parse_array(self):
-        elements = []
         self.validate_and_consume_token('LBRACKET')  
-        while self.current_token.type != 'RBRACKET':
-            elements.append(self.parse_expression())  
-            if self.current_token.type == 'COMMA':
-                self.consume_token()  
-        self.validate_and_consume_token('RBRACKET')
+        elements = self.parse_array_elements()
         return ArrayNode(elements, self.current_token.line_number)
 
+    def parse_array_elements(self):
+        # Al terminar la entrada current_token sigue siendo el último token,
+        # así que un arreglo sin cerrar se detecta por end_of_input.
+        elements = []
+        while not self.end_of_input and self.current_token.type != 'RBRACKET':
+            elements.append(self.parse_expression())
+            if self.end_of_input:
+                break
+            if self.current_token.type == 'COMMA':
+                self.consume_token()
+            elif self.current_token.type != 'RBRACKET':
+                raise ParseError(f"Se esperaba ',' o ']', pero se encontró {self.current_token.type} ('{self.current_token.value}')", self.current_token)
+        if self.end_of_input:
+            raise ParseError("Arreglo no cerrado: se esperaba ']'", self.current_token)
+        self.consume_token()
+        return elements
+
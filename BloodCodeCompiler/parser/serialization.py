@@ -0,0 +1,325 @@
+import gc
+import json
+import math
+import struct
+
+from .ast import (ASTNode, IdentifierNode, NumberNode, StringNode, BinaryOpNode, DeclarationNode, BlockNode,
+                  IfStatementNode, LoopNode, FunctionCallNode, RestNode, BooleanNode, UnaryOpNode,
+                  FunctionDeclarationNode, ReturnNode, ConstantNode, ArrayNode)
+
+# Codificación binaria del AST que arma el parser, para guardarlo en disco o
+# enviarlo a otro proceso sin volver a parsear:
+#
+#   'BCAST' | versión (1 byte) | tabla de cadenas | valor raíz
+#
+# La tabla de cadenas es un varint con la cantidad y cada cadena como varint
+# de longitud + UTF-8; los identificadores, operadores, tipos y literales se
+# escriben una sola vez y el árbol las referencia por su índice. Cada valor
+# empieza con un byte de tipo; un nodo lleva después su línea como varint
+# (0 = sin línea) y sus campos en el orden del constructor.
+#
+# FORMAT_VERSION debe incrementarse si cambia el formato o los campos de un
+# nodo en NODE_FIELDS.
+MAGIC = b'BCAST'
+FORMAT_VERSION = 1
+
+NONE, TRUE, FALSE, INT, FLOAT, STRING, LIST, TUPLE, WHOLE_FLOAT = range(9)
+NODE_BASE = 16
+
+# Orden fijo: la posición de cada clase es su etiqueta en el formato.
+NODE_FIELDS = (
+    (IdentifierNode, ('name',)),
+    (NumberNode, ('value',)),
+    (StringNode, ('value',)),
+    (BinaryOpNode, ('left', 'operator', 'right')),
+    (DeclarationNode, ('identifier_list', 'var_type', 'expression')),
+    (BlockNode, ('statements',)),
+    (IfStatementNode, ('condition', 'true_block', 'false_block')),
+    (LoopNode, ('init', 'condition', 'increment', 'block')),
+    (FunctionCallNode, ('identifier', 'arguments')),
+    (RestNode, ()),
+    (BooleanNode, ('value',)),
+    (UnaryOpNode, ('operator', 'operand')),
+    (FunctionDeclarationNode, ('name', 'parameters', 'return_type', 'block')),
+    (ReturnNode, ('expression',)),
+    (ConstantNode, ('value',)),
+    (ArrayNode, ('elements',)),
+)
+
+NODE_TAGS = {node_class: (NODE_BASE + tag, fields) for tag, (node_class, fields) in enumerate(NODE_FIELDS)}
+
+FLOAT_FORMAT = struct.Struct('<d')
+
+
+class SerializationError(Exception):
+    pass
+
+
+def write_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint_at(data, position):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def read_strings(data, position):
+    count, position = read_varint_at(data, position)
+    strings = []
+    for _ in range(count):
+        length, position = read_varint_at(data, position)
+        if position + length > len(data):
+            raise IndexError(position + length)
+        strings.append(bytes(data[position:position + length]).decode('utf-8', 'surrogatepass'))
+        position += length
+    return strings, position
+
+
+def zigzag(value):
+    # Los negativos también quedan como varint corto.
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+class ASTEncoder:
+    def __init__(self):
+        self.strings = {}
+        self.body = bytearray()
+
+    def encode(self, node):
+        self.write(node)
+        out = bytearray(MAGIC)
+        out.append(FORMAT_VERSION)
+        write_varint(out, len(self.strings))
+        for string in self.strings:
+            data = string.encode('utf-8', 'surrogatepass')
+            write_varint(out, len(data))
+            out += data
+        out += self.body
+        return bytes(out)
+
+    def write(self, root):
+        # El árbol se recorre con una pila propia en lugar de la de Python: una
+        # expresión de miles de términos es un árbol de esa profundidad. Los
+        # hijos se apilan al revés para escribirlos en orden.
+        body = self.body
+        strings = self.strings
+        stack = [root]
+        while stack:
+            value = stack.pop()
+            node_tag = NODE_TAGS.get(type(value))
+            if node_tag is not None:
+                tag, fields = node_tag
+                body.append(tag)
+                write_varint(body, value.line_number + 1 if value.line_number is not None else 0)
+                for field in reversed(fields):
+                    stack.append(getattr(value, field))
+            elif isinstance(value, str):
+                index = strings.get(value)
+                if index is None:
+                    index = strings[value] = len(strings)
+                body.append(STRING)
+                write_varint(body, index)
+            elif value is None:
+                body.append(NONE)
+            elif value is True:
+                body.append(TRUE)
+            elif value is False:
+                body.append(FALSE)
+            elif isinstance(value, int):
+                body.append(INT)
+                write_varint(body, zigzag(value))
+            elif isinstance(value, float):
+                # Los números del parser son float aunque sean enteros.
+                if value.is_integer() and abs(value) < 2 ** 53 and (value or math.copysign(1.0, value) > 0):
+                    body.append(WHOLE_FLOAT)
+                    write_varint(body, zigzag(int(value)))
+                else:
+                    body.append(FLOAT)
+                    body += FLOAT_FORMAT.pack(value)
+            elif isinstance(value, (list, tuple)):
+                body.append(LIST if isinstance(value, list) else TUPLE)
+                write_varint(body, len(value))
+                stack.extend(reversed(value))
+            else:
+                raise SerializationError(f"No se puede serializar un valor de tipo {type(value).__name__} en el AST")
+
+
+def decode_ast(data):
+    if data[:len(MAGIC)] != MAGIC:
+        raise SerializationError("Los datos no son un AST de BloodCode serializado")
+    version = data[len(MAGIC)] if len(data) > len(MAGIC) else None
+    if version != FORMAT_VERSION:
+        raise SerializationError(f"Versión de AST serializado no soportada: {version} (se esperaba {FORMAT_VERSION})")
+    try:
+        strings, position = read_strings(data, len(MAGIC) + 1)
+    except IndexError:
+        raise SerializationError("El AST serializado está incompleto") from None
+    # El árbol se recorre con un iterador de bytes en lugar de llevar la
+    # posición: es lo que más pesa al decodificar.
+    stream = iter(memoryview(data)[position:])
+    next_byte = stream.__next__
+
+    def read_varint():
+        byte = next_byte()
+        if byte < 0x80:
+            return byte
+        value = byte & 0x7F
+        shift = 7
+        while True:
+            byte = next_byte()
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def read_bytes(length):
+        return bytes([next_byte() for _ in range(length)])
+
+    node_count = len(NODE_FIELDS)
+
+    def read():
+        # Lectura en preorden con una pila propia. Cada nodo o lista abierta
+        # es (valores leídos, cantidad esperada, clase, línea); cuando se
+        # completa se construye y pasa a ser un valor de su contenedor.
+        stack = []
+        while True:
+            tag = next_byte()
+            if tag >= NODE_BASE:
+                if tag - NODE_BASE >= node_count:
+                    raise SerializationError(f"Tipo de nodo desconocido en el AST serializado: {tag}")
+                node_class, fields = NODE_FIELDS[tag - NODE_BASE]
+                line_number = read_varint() - 1
+                if line_number < 0:
+                    line_number = None
+                if fields:
+                    stack.append(([], len(fields), node_class, line_number))
+                    continue
+                value = node_class(line_number)
+            elif tag == STRING:
+                value = strings[read_varint()]
+            elif tag == NONE:
+                value = None
+            elif tag == LIST or tag == TUPLE:
+                count = read_varint()
+                kind = list if tag == LIST else tuple
+                if count:
+                    stack.append(([], count, kind, None))
+                    continue
+                value = kind()
+            elif tag == WHOLE_FLOAT:
+                value = float(unzigzag(read_varint()))
+            elif tag == TRUE:
+                value = True
+            elif tag == FALSE:
+                value = False
+            elif tag == INT:
+                value = unzigzag(read_varint())
+            elif tag == FLOAT:
+                value = FLOAT_FORMAT.unpack(read_bytes(FLOAT_FORMAT.size))[0]
+            else:
+                raise SerializationError(f"Etiqueta desconocida en el AST serializado: {tag}")
+
+            while stack:
+                values, count, kind, line_number = stack[-1]
+                values.append(value)
+                if len(values) < count:
+                    break
+                stack.pop()
+                if kind is list:
+                    value = values
+                elif kind is tuple:
+                    value = tuple(values)
+                else:
+                    value = kind(*values, line_number)
+            else:
+                return value
+
+    # Los nodos nuevos no forman ciclos: el recolector de ciclos sólo haría
+    # pasadas completas inútiles mientras se crean.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        node = read()
+    except (StopIteration, IndexError):
+        raise SerializationError("El AST serializado está incompleto") from None
+    finally:
+        if enabled:
+            gc.enable()
+    if next(stream, None) is not None:
+        raise SerializationError("Sobran datos después del AST serializado")
+    return node
+
+
+def encode_ast(node):
+    return ASTEncoder().encode(node)
+
+
+def ast_to_json(root):
+    # Forma estructurada para el frontend: cada nodo es un objeto con 'type'
+    # (el nombre de la clase sin 'Node'), 'line' y sus campos. Como en el
+    # codificador, el árbol se recorre con una pila propia; cada objeto se
+    # crea con sus claves en orden y los campos se completan después.
+    result = [None]
+    stack = [(result, 0, root)]
+    while stack:
+        container, key, value = stack.pop()
+        node_tag = NODE_TAGS.get(type(value))
+        if node_tag is not None:
+            converted = {'type': type(value).__name__[:-len('Node')], 'line': value.line_number}
+            for field in node_tag[1]:
+                converted[field] = None
+                stack.append((converted, field, getattr(value, field)))
+        elif isinstance(value, (list, tuple)):
+            converted = [None] * len(value)
+            stack.extend((converted, index, item) for index, item in enumerate(value))
+        elif isinstance(value, ASTNode):
+            raise SerializationError(f"Nodo sin formato JSON: {type(value).__name__}")
+        else:
+            converted = value
+        container[key] = converted
+    return result[0]
+
+
+def json_text(root, sort_keys=False):
+    # json.dumps recursivo no admite la forma JSON de un árbol muy profundo;
+    # este la escribe con una pila propia (compacta y con escape ASCII, como
+    # las respuestas de Flask). Cada elemento de la pila es (texto fijo, valor).
+    parts = []
+    stack = [(False, root)]
+    while stack:
+        literal, value = stack.pop()
+        if literal:
+            parts.append(value)
+        elif isinstance(value, dict):
+            items = sorted(value.items()) if sort_keys else list(value.items())
+            parts.append('{')
+            stack.append((True, '}'))
+            for index in range(len(items) - 1, -1, -1):
+                key, item = items[index]
+                stack.append((False, item))
+                stack.append((True, (',' if index else '') + json.dumps(str(key)) + ':'))
+        elif isinstance(value, (list, tuple)):
+            parts.append('[')
+            stack.append((True, ']'))
+            for index in range(len(value) - 1, -1, -1):
+                stack.append((False, value[index]))
+                if index:
+                    stack.append((True, ','))
+        else:
+            parts.append(json.dumps(value))
+    return ''.join(parts)
@@ -0,0 +1,110 @@
+from parser.ast import NumberNode, IdentifierNode, BinaryOpNode, StringNode, DeclarationNode, BlockNode, IfStatementNode, LoopNode, FunctionCallNode, RestNode, BooleanNode, UnaryOpNode, FunctionDeclarationNode, ReturnNode, ArrayNode
+
+
+class Resolver:
+    # Se ejecuta después del SemanticAnalyzer y con sus mismas reglas de
+    # alcance (sólo las funciones abren un scope nuevo). Cada IdentifierNode
+    # recibe su coordenada (profundidad, posición) para que los intérpretes
+    # usen listas preasignadas en lugar de buscar nombres en diccionarios.
+    def __init__(self):
+        self.scopes = []
+
+    def resolve_program(self, node):
+        self.scopes = [{}]
+        self.resolve(node)
+        node.frame_size = len(self.scopes[0])
+        return node
+
+    def resolve(self, node):
+        # Los métodos de los nodos con hijos son generadores que hacen
+        # `yield` de cada hijo en orden; los pendientes quedan en una pila
+        # explícita, así una expresión muy larga no agota la pila de Python.
+        stack = []
+        while True:
+            if node is not None:
+                resolve_method = getattr(self, 'resolve_' + type(node).__name__, None)
+                if resolve_method is not None:
+                    children = resolve_method(node)
+                    if children is not None:
+                        stack.append(children)
+            while stack:
+                try:
+                    node = next(stack[-1])
+                    break
+                except StopIteration:
+                    stack.pop()
+            else:
+                return
+
+    def declare(self, identifier):
+        scope = self.scopes[-1]
+        if identifier.name not in scope:
+            scope[identifier.name] = len(scope)
+        identifier.depth = len(self.scopes) - 1
+        identifier.slot = scope[identifier.name]
+
+    def resolve_IdentifierNode(self, node):
+        for depth in range(len(self.scopes) - 1, -1, -1):
+            slot = self.scopes[depth].get(node.name)
+            if slot is not None:
+                node.depth = depth
+                node.slot = slot
+                return
+        # El SemanticAnalyzer ya rechaza los nombres sin declarar; por las
+        # dudas se tratan como locales que nunca reciben valor.
+        self.declare(node)
+
+    def resolve_BlockNode(self, node):
+        yield from node.statements
+
+    def resolve_DeclarationNode(self, node):
+        # Mismo orden que el SemanticAnalyzer: tamaños, nombres y después la
+        # expresión inicial.
+        if isinstance(node.var_type, tuple):
+            yield from node.var_type[1:]
+        for identifier in node.identifier_list:
+            self.declare(identifier)
+        yield node.expression
+
+    def resolve_BinaryOpNode(self, node):
+        yield node.left
+        yield node.right
+
+    def resolve_UnaryOpNode(self, node):
+        yield node.operand
+
+    def resolve_ArrayNode(self, node):
+        yield from node.elements
+
+    def resolve_FunctionCallNode(self, node):
+        yield from node.arguments or []
+
+    def resolve_ReturnNode(self, node):
+        yield node.expression
+
+    def resolve_IfStatementNode(self, node):
+        yield node.condition
+        yield node.true_block
+        yield node.false_block
+
+    def resolve_LoopNode(self, node):
+        yield node.init
+        yield node.condition
+        yield node.block
+        yield node.increment
+
+    def resolve_FunctionDeclarationNode(self, node):
+        self.scopes.append({})
+        for param in node.parameters:
+            self.declare(param[0])
+        yield node.block
+        node.depth = len(self.scopes) - 1
+        node.frame_size = len(self.scopes[-1])
+        self.scopes.pop()
+
+
+def ensure_resolved(program):
+    # Los ASTs que no pasan por CompilationEntry se resuelven al ejecutarse.
+    if program.frame_size is None:
+        Resolver().resolve_program(program)
+    return program
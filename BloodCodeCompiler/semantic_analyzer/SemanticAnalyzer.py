@@ -13,45 +13,94 @@ class SemanticError(Exception):
         return f"Error semántico: {self.message}{node_info}{line_info}"
 
 
-def semantic_error_handler(func):
-    def wrapper(self, *args, **kwargs):
-        try:
-            return func(self, *args, **kwargs)
-        except SemanticError as e:
-            raise SyntaxError(f"Error en {func.__name__}: {str(e)}")
-        except Exception as e:
-            raise SyntaxError(f"Error inesperado en {func.__name__}: {str(e)}")
-    return wrapper
+def semantic_error(error, node):
+    if isinstance(error, SemanticError):
+        return error
+    return SemanticError(str(error), node)
+
+
+# Funciones predefinidas sobre vectores y matrices; se ejecutan con
+# interpreter.arrays.BUILTINS.
+ARRAY_BUILTINS = ('Sum', 'Min', 'Max', 'MatMul')
 
 
 class SemanticAnalyzer:
     def __init__(self, env):
         self.env = env
-
-    @semantic_error_handler
-    def analyze(self, node):
-        node_type_to_method = {
-            BlockNode: self.analyze_block,
-            DeclarationNode: self.analyze_declaration,
-            BinaryOpNode: self.analyze_binary_op,
+        # Nodos del AST analizados, para las métricas de /metrics, más los
+        # nombres de variables declaradas, funciones y parámetros, que se
+        # leen sin analizarlos.
+        self.node_count = 0
+        # Funciones que se están analizando, de la más externa a la actual:
+        # [nombre, sigue siendo pura].
+        self.function_stack = []
+        self.leaves = {
             NumberNode: self.analyze_number,
             StringNode: self.analyze_string,
             IdentifierNode: self.analyze_identifier,
+            BooleanNode: self.analyze_boolean,
+        }
+        self.handlers = {
+            BlockNode: self.analyze_block,
+            DeclarationNode: self.analyze_declaration,
+            BinaryOpNode: self.analyze_binary_op,
             ArrayNode: self.analyze_array,
             FunctionCallNode: self.analyze_function_call,
             IfStatementNode: self.analyze_if_statement,
             LoopNode: self.analyze_loop,
             FunctionDeclarationNode: self.analyze_function_declaration,
             ReturnNode: self.analyze_return,
-            BooleanNode: self.analyze_boolean,
             UnaryOpNode: self.analyze_unary_op,
         }
-        
-        analyze_method = node_type_to_method.get(type(node))
-        if analyze_method:
-            return analyze_method(node)
-        else:
-            raise SemanticError(f"Nodo no soportado: {type(node)}", node)
+
+    def analyze(self, node):
+        # Mismo esquema que el Interpreter: los métodos de los nodos con hijos
+        # son generadores que hacen `yield` del hijo y reciben su tipo, y los
+        # generadores en curso se guardan en una pila explícita en lugar de
+        # la pila de Python. Un error sale una sola vez como SemanticError,
+        # con el nodo más interno que lo produjo.
+        leaves = self.leaves
+        handlers = self.handlers
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        value = None
+        error = None
+        while True:
+            self.node_count += 1
+            leaf = leaves.get(type(node))
+            if leaf is not None:
+                try:
+                    value = leaf(node)
+                except Exception as e:
+                    error = semantic_error(e, node)
+            else:
+                method = handlers.get(type(node))
+                if method is not None:
+                    push((method(node), node))
+                    value = None
+                else:
+                    error = SemanticError(f"Nodo no soportado: {type(node)}", node)
+
+            while stack:
+                generator, current = stack[-1]
+                try:
+                    if error is None:
+                        node = generator.send(value)
+                    else:
+                        node = generator.throw(error)
+                        error = None
+                    break
+                except StopIteration as stop:
+                    pop()
+                    value = stop.value
+                except Exception as e:
+                    pop()
+                    error = semantic_error(e, current)
+            else:
+                if error is not None:
+                    raise error
+                return value
 
     def analyze_number(self, node):
         if float(node.value).is_integer():
@@ -63,15 +112,23 @@ class SemanticAnalyzer:
         return 'EILEEN'
 
     def analyze_identifier(self, node):
-        return self.env.get_variable_type(node.name)
+        var_type = self.env.get_variable_type(node.name)
+        # Sólo las funciones abren un scope: una variable que no está en el
+        # último es global o de una función exterior.
+        if self.function_stack and node.name not in self.env.scopes[-1]:
+            self.mark_impure()
+        return var_type
+
+    def mark_impure(self):
+        if self.function_stack:
+            self.function_stack[-1][1] = False
 
     def analyze_boolean(self, node):
         return 'BLOOD'
 
-    @semantic_error_handler
     def analyze_block(self, node):
         for statement in node.statements:
-            self.analyze(statement)
+            yield statement
 
     def analyze_declaration(self, node):
         var_type = node.var_type
@@ -82,29 +139,30 @@ class SemanticAnalyzer:
                 size1 = var_type[1]
                 size2 = var_type[2]
                 if size1:
-                    self._validate_array_size(size1, node.identifier_list[0], node)
+                    yield from self._validate_array_size(size1, node.identifier_list[0], node)
                 if size2:
-                    self._validate_array_size(size2, node.identifier_list[0], node)
+                    yield from self._validate_array_size(size2, node.identifier_list[0], node)
                 array_type = (element_type, 'MATRIX')
             
             elif len(var_type) == 2:
                 size_expr = var_type[1]
                 if size_expr:
-                    self._validate_array_size(size_expr, node.identifier_list[0], node)
+                    yield from self._validate_array_size(size_expr, node.identifier_list[0], node)
                 array_type = (element_type, 'ARRAY')
         else:
             array_type = var_type.upper()
 
+        self.node_count += len(node.identifier_list)
         for identifier in node.identifier_list:
             self.env.declare_variable(identifier.name, array_type)
 
         if node.expression:
-            expr_type = self.analyze(node.expression)
+            expr_type = yield node.expression
             if isinstance(var_type, tuple):
                 if len(var_type) == 3:
-                    self._validate_matrix_declaration(var_type, expr_type, identifier, node)
+                    yield from self._validate_matrix_declaration(var_type, expr_type, identifier, node)
                 else:
-                    self._validate_array_declaration(var_type, expr_type, identifier, node)
+                    yield from self._validate_array_declaration(var_type, expr_type, identifier, node)
             else:
                 self._validate_type_match(array_type, expr_type.upper(), identifier, node)
 
@@ -119,13 +177,13 @@ class SemanticAnalyzer:
                 if not isinstance(row, ArrayNode):
                     raise SemanticError(f"Se esperaba una matriz 2D para '{identifier.name}'", node)
                 for element in row.elements:
-                    element_type_from_expr = self.analyze(element).upper()
+                    element_type_from_expr = (yield element).upper()
                     if element_type_from_expr != element_type:
                         raise SemanticError(f"Todos los elementos de la matriz '{identifier.name}' deben ser de tipo '{element_type}', pero se encontró {element_type_from_expr}", node)
         return 'MATRIX'
 
     def _validate_array_size(self, size, identifier, node):
-        size_type = self.analyze(size)
+        size_type = yield size
         if size_type != 'MARIA':  
             raise SemanticError(f"El tamaño del array '{identifier.name}' debe ser de tipo 'MARIA', pero se encontró '{size_type}'", node)
 
@@ -137,8 +195,7 @@ class SemanticAnalyzer:
 
         if isinstance(node.expression, ArrayNode):
             for element in node.expression.elements:
-                element_type_from_expr = self.analyze(element).upper()
-                print(f"Declarando array {identifier.name}, tipo esperado: {element_type}, tipo encontrado: {element_type_from_expr}")
+                element_type_from_expr = (yield element).upper()
 
                 if element_type_from_expr != element_type:
                     raise SemanticError(f"Todos los elementos del array '{identifier.name}' deben ser de tipo '{element_type}', pero se encontró {element_type_from_expr}", node)
@@ -149,18 +206,17 @@ class SemanticAnalyzer:
         if self.normalize_type(expr_type) != self.normalize_type(var_type):
             raise SemanticError(f"Error de tipo: Se esperaba '{var_type}' para la variable '{identifier.name}', pero se encontró '{expr_type}'", node)
 
-    @semantic_error_handler
     def analyze_binary_op(self, node):
         if node.operator == 'INDEX':
-            return self._analyze_index_op(node)
+            return (yield from self._analyze_index_op(node))
 
-        left_type = self.analyze(node.left)
-        right_type = self.analyze(node.right)
+        left_type = yield node.left
+        right_type = yield node.right
+        if isinstance(left_type, str) and isinstance(right_type, str) and left_type.upper() == right_type.upper():
+            node.operand_type = left_type.upper()
 
         if node.operator in ['ASSIGN', 'ARROW_ASSIGN']:
             if isinstance(node.left, IdentifierNode):
-                left_type = self.analyze(node.left)
-                right_type = self.analyze(node.right)
                 if left_type != right_type:
                     raise SemanticError(f"No se puede asignar un valor de tipo '{right_type}' a '{left_type}'", node)
                 return left_type
@@ -196,11 +252,13 @@ class SemanticAnalyzer:
     def _analyze_index_op(self, node):
         base_identifier_name = self._get_base_identifier_name(node.left)
         array_type = self.env.get_variable_type(base_identifier_name)
+        if base_identifier_name not in self.env.scopes[-1]:
+            self.mark_impure()
 
         if not isinstance(array_type, tuple):
             raise SemanticError(f"{base_identifier_name} no es un array o matriz", node)
 
-        index_type = self.analyze(node.right)
+        index_type = yield node.right
         if index_type != 'MARIA':
             raise SemanticError(f"Índice debe ser de tipo 'MARIA', pero se encontró '{index_type}'", node)
 
@@ -216,6 +274,8 @@ class SemanticAnalyzer:
             raise SemanticError("Estructura de acceso inválida: falta identificador base en matriz o array.", node)
 
     def _analyze_arithmetic_op(self, left_type, right_type, node):
+        if isinstance(left_type, tuple) or isinstance(right_type, tuple):
+            return self._analyze_elementwise_op(left_type, right_type, node, self._analyze_arithmetic_op)
         left_type = self.normalize_type(left_type)
         right_type = self.normalize_type(right_type)
         if left_type == 'MARIA' and right_type == 'MARIA':
@@ -229,30 +289,9 @@ class SemanticAnalyzer:
                 node
             )
 
-    def _analyze_assignment_op(self, node, left_type, right_type):
-        if isinstance(node.left, BinaryOpNode) and node.left.operator == 'INDEX':
-            array_type = self.analyze(node.left.left)
-
-            if not isinstance(array_type, tuple) or array_type[1] not in ['ARRAY', 'MATRIX']:
-                raise SemanticError(f"Acceso inválido: {node.left.left.name} no es un array o matriz", node)
-
-            element_type = array_type[0]
-            if element_type != right_type:
-                raise SemanticError(f"No se puede asignar '{right_type}' a un '{element_type}' en el array o matriz", node)
-
-            index_type = self.analyze(node.left.right)
-            if index_type != 'MARIA':
-                raise SemanticError(f"Índice del array/matriz debe ser 'MARIA', no '{index_type}'", node)
-
-            if isinstance(node.left.left, BinaryOpNode) and node.left.left.operator == 'INDEX':
-                col_index_type = self.analyze(node.left.left.right)
-                if col_index_type != 'MARIA':
-                    raise SemanticError(f"Índice de columna debe ser 'MARIA', no '{col_index_type}'", node)
-
-            return element_type
-
-
     def _analyze_comparison_op(self, left_type, right_type, node):
+        if isinstance(left_type, tuple) or isinstance(right_type, tuple):
+            return self._analyze_elementwise_op(left_type, right_type, node, self._analyze_comparison_op)
         left_type = self.normalize_type(left_type)
         right_type = self.normalize_type(right_type)
         if left_type != right_type:
@@ -260,6 +299,16 @@ class SemanticAnalyzer:
         return 'BLOOD'
  
 
+    def _analyze_elementwise_op(self, left_type, right_type, node, element_rule):
+        # Un arreglo opera con otro de la misma forma o con un escalar; el tipo
+        # de los elementos sigue la misma regla que la operación escalar.
+        if isinstance(left_type, tuple) and isinstance(right_type, tuple) and left_type[1] != right_type[1]:
+            raise SemanticError(f"No se puede operar un '{left_type[1]}' con un '{right_type[1]}'", node)
+        shape = left_type[1] if isinstance(left_type, tuple) else right_type[1]
+        left_element = left_type[0] if isinstance(left_type, tuple) else left_type
+        right_element = right_type[0] if isinstance(right_type, tuple) else right_type
+        return (element_rule(left_element, right_element, node), shape)
+
     def _analyze_logical_op(self, left_type, right_type, node):
         left_type = self.normalize_type(left_type)
         right_type = self.normalize_type(right_type)
@@ -268,11 +317,10 @@ class SemanticAnalyzer:
         return 'BLOOD'
 
 
-    @semantic_error_handler
     def analyze_array(self, node):
         element_type = None
         for element in node.elements:
-            elem_type = self.analyze(element)
+            elem_type = yield element
             if element_type is None:
                 element_type = elem_type
             elif elem_type != element_type:
@@ -283,7 +331,7 @@ class SemanticAnalyzer:
         if len(node.arguments) != 1:
             raise SemanticError(f"La función '{node.identifier}' espera 1 argumento, pero se encontraron {len(node.arguments)}", node)
         
-        arg_type = self.analyze(node.arguments[0]).upper()
+        arg_type = (yield node.arguments[0]).upper()
 
         if node.identifier == 'PRAY':
             if arg_type not in ['MARIA', 'EILEEN', 'GEHRMAN', 'BLOOD']:
@@ -294,12 +342,20 @@ class SemanticAnalyzer:
         return None
 
     
-    @semantic_error_handler
     def analyze_function_call(self, node):
         if node.identifier in ['PRAY', 'EYES']:
-            return self._analyze_builtin_function_call(node)
+            self.mark_impure()
+            return (yield from self._analyze_builtin_function_call(node))
+        self.node_count += 1
+        if node.identifier.name in ARRAY_BUILTINS:
+            return (yield from self._analyze_array_builtin_call(node))
 
         func_type = self.env.get_function_type(node.identifier.name)
+        # Una llamada recursiva no cambia la pureza; cualquier otra función
+        # ya terminó de analizarse o es una exterior que aún no se decide.
+        if self.function_stack and node.identifier.name != self.function_stack[-1][0] \
+                and node.identifier.name not in self.env.pure_functions:
+            self.mark_impure()
         param_types, return_type = func_type
 
         if len(node.arguments or []) != len(param_types):
@@ -309,7 +365,7 @@ class SemanticAnalyzer:
             )
 
         for i, (arg, expected_type) in enumerate(zip(node.arguments, param_types)):
-            arg_type = self.analyze(arg).upper()
+            arg_type = (yield arg).upper()
             expected_type = expected_type.upper()
             if arg_type != expected_type:
                 raise SemanticError(f"Argumento {i+1} de la función '{node.identifier.name}' esperaba '{expected_type}', pero se encontró '{arg_type}'", node)
@@ -318,69 +374,71 @@ class SemanticAnalyzer:
 
 
 
-    def _analyze_user_defined_function_call(self, node):
-        func_type = self.env.get_function_type(node.identifier.name)
-        param_types, return_type = func_type
+    def _analyze_array_builtin_call(self, node):
+        name = node.identifier.name
+        arguments = node.arguments or []
+        expected = 2 if name == 'MatMul' else 1
+        if len(arguments) != expected:
+            raise SemanticError(f"La función '{name}' espera {expected} argumento(s), pero se encontraron {len(arguments)}", node)
 
-        if len(node.arguments or []) != len(param_types):
-            raise SemanticError(
-                f"La función '{node.identifier.name}' espera {len(param_types)} argumentos, pero se encontraron {len(node.arguments or [])}",
-                node
-            )
+        arg_types = []
+        for arg in arguments:
+            arg_types.append((yield arg))
+        for arg_type in arg_types:
+            if not isinstance(arg_type, tuple) or arg_type[0] not in ['MARIA', 'GEHRMAN']:
+                raise SemanticError(f"La función '{name}' espera un vector o matriz de tipo 'MARIA' o 'GEHRMAN', pero se encontró '{arg_type}'", node)
 
-        for i, arg in enumerate(node.arguments or []):
-            arg_type = self.analyze(arg).upper()  
-            expected_type = param_types[i].upper()  
-            if arg_type != expected_type:
-                raise SemanticError(f"Argumento {i+1} de la función '{node.identifier.name}' esperaba '{expected_type}', pero se encontró '{arg_type}'", node)
-
-        return return_type.upper()
+        if name != 'MatMul':
+            return arg_types[0][0]
 
+        left_type, right_type = arg_types
+        if left_type[1] != 'MATRIX':
+            raise SemanticError("El primer argumento de 'MatMul' debe ser una matriz", node)
+        if left_type[0] != right_type[0]:
+            raise SemanticError(f"Los argumentos de 'MatMul' deben ser del mismo tipo, pero se encontró '{left_type[0]}' y '{right_type[0]}'", node)
+        return (left_type[0], right_type[1])
 
     def normalize_type(self, type_str):
         return type_str.upper() 
 
-    @semantic_error_handler
     def analyze_if_statement(self, node):
-        condition_type = self.analyze(node.condition)
+        condition_type = yield node.condition
         if condition_type != 'BLOOD':
             raise SemanticError("La condición en un 'Insight' debe ser de tipo 'BLOOD'", node.condition)
         
-        self.analyze(node.true_block)
+        yield node.true_block
         
         current_node = node
         while current_node.false_block:
             if isinstance(current_node.false_block, IfStatementNode):
                 current_node = current_node.false_block
-                condition_type = self.analyze(current_node.condition)
+                condition_type = yield current_node.condition
                 if condition_type != 'BLOOD':
                     raise SemanticError("La condición en un 'Madness Insight' debe ser de tipo 'BLOOD'", current_node.condition)
-                self.analyze(current_node.true_block)
+                yield current_node.true_block
             else:
-                self.analyze(current_node.false_block)
+                yield current_node.false_block
                 break
 
-    @semantic_error_handler
     def analyze_loop(self, node):
         if node.init:
-            self.analyze(node.init)
+            yield node.init
 
         if not node.condition:
             raise SemanticError("El bucle debe tener una condición de tipo 'BLOOD'", node)
 
-        condition_type = self.analyze(node.condition)
+        condition_type = yield node.condition
         if condition_type != 'BLOOD':
             raise SemanticError("La condición del bucle debe ser de tipo 'BLOOD'", node.condition)
 
-        self.analyze(node.block)
+        yield node.block
 
         if node.increment:
-            self.analyze(node.increment)
+            yield node.increment
 
 
-    @semantic_error_handler
     def analyze_unary_op(self, node):
-        operand_type = self.analyze(node.operand)
+        operand_type = yield node.operand
         
         if node.operator == 'VILEBLOOD':
             if operand_type != 'BLOOD':
@@ -390,24 +448,33 @@ class SemanticAnalyzer:
             raise SemanticError(f"Operador unario no soportado: {node.operator}", node)
 
     def analyze_function_declaration(self, node):
+        if node.name.name in ARRAY_BUILTINS:
+            raise SemanticError(f"'{node.name.name}' es una función predefinida y no se puede redeclarar", node)
         param_types = [param_type for _, param_type in node.parameters]
         return_type = node.return_type.upper() 
         self.env.declare_function(node.name.name, param_types, return_type)
+        # Una función declarada dentro de otra captura sus variables.
+        self.mark_impure()
+        self.function_stack.append([node.name.name, True])
         self.env.enter_scope() 
 
+        self.node_count += 1 + len(node.parameters)
         for param_name, param_type in node.parameters:
             self.env.declare_variable(param_name.name, param_type)
 
-        self.analyze(node.block)
+        yield node.block
 
         if return_type != 'ROM': 
             if not self.has_return(node.block):
                 raise SemanticError(f"La función '{node.name.name}' debe tener una instrucción de retorno de tipo '{return_type}'", node)
 
         self.env.exit_scope()
+        _, pure = self.function_stack.pop()
+        if pure:
+            self.env.pure_functions.add(node.name.name)
+        node.pure = pure
 
 
-    @semantic_error_handler
     def has_return(self, block_node):
         for statement in block_node.statements:
             if isinstance(statement, ReturnNode):
@@ -419,9 +486,8 @@ class SemanticAnalyzer:
                     return True
         return False
 
-    @semantic_error_handler
     def analyze_return(self, node):
-        return_type = self.analyze(node.expression).upper()
+        return_type = (yield node.expression).upper()
         if return_type != 'MARIA':
             raise SemanticError(
                 f"Error de tipo en retorno: se esperaba 'MARIA', pero se encontró '{return_type}'",
@@ -2,6 +2,9 @@ class TypeEnvironment:
     def __init__(self):
         self.scopes = [{}]  
         self.functions = {}  
+        # Funciones sin efectos: sólo leen sus parámetros y llaman a otras
+        # funciones puras.
+        self.pure_functions = set()
 
     def enter_scope(self):
         self.scopes.append({})
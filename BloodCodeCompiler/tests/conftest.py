@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del compilador se importan desde la raíz de BloodCodeCompiler.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,156 @@
+import random
+
+import pytest
+from cache.compile_cache import CompilationEntry
+from cache.documents import Document
+from parser import ast_to_json
+from parser.parser import ParseError
+
+ARRAY_CODE = 'Hunter a: Maria[2] => [1, 2];'
+
+
+@pytest.mark.parametrize('code', [
+    'Hunter a: Maria[2] => [1',
+    'Pray([1',
+    'Hunter a: Maria[2] => [1 2];',
+])
+def test_unclosed_array_is_a_syntax_error(code):
+    assert isinstance(Document(code).result(), ParseError)
+
+
+@pytest.mark.parametrize('code', ['Pray(', 'Pray((', 'Hunter a: Maria => 1 +'])
+def test_expression_cut_at_end_of_input(code):
+    error = Document(code).result()
+    assert isinstance(error, ParseError)
+    assert 'Expresión incompleta' in str(error)
+
+
+def test_edit_that_leaves_array_open():
+    document = Document(ARRAY_CODE)
+    start = ARRAY_CODE.index(', 2]')
+    document.edit(document.version, start, len(ARRAY_CODE), '')
+    assert isinstance(document.result(), ParseError)
+
+
+def test_edit_endpoint_rejects_unclosed_array():
+    pytest.importorskip('flask')
+    from app import app
+
+    client = app.test_client()
+    opened = client.post('/documents', json={'code': ARRAY_CODE})
+    assert opened.status_code == 200
+    body = opened.get_json()
+    start = ARRAY_CODE.index(', 2]')
+    edited = client.post(f"/documents/{body['documentId']}/edits", json={
+        'version': body['version'],
+        'range': {'start': start, 'end': len(ARRAY_CODE)},
+        'text': '',
+    })
+    assert edited.status_code == 400
+    assert 'Arreglo no cerrado' in edited.get_json()['error']
+
+
+PROGRAM = """Hunter x: Maria => 1;
+GreatOnes f(n: Maria): Maria {
+    Echoes n + x;
+}
+Pray(f(2));
+Insight (x < 5) {
+    x => x + 2;
+} Madness {
+    Pray("no");
+}
+Pray(x);
+"""
+
+STATEMENTS = [
+    'Hunter z: Maria => 3;\n',
+    'Pray(z);\n',
+    'x => x + 1;\n',
+    '\n\n',
+    'GreatOnes g(n: Maria): Maria {\n    Echoes n * 2;\n}\n',
+    'Pray(g(x));\n',
+    'Insight (x > 2) {\n    Pray("mayor");\n}\n',
+    'Nightmare (Hunter k: Maria => 0; k < 3; k => k + 1;) {\n    x => x + k;\n}\n',
+    'Hunter s: Eileen => "hola";\n',
+]
+
+TOKENS = ['}', '{', ';', 'Hunter', ' ', '\n', 'Pray(', '[1, 2', 'x', '1']
+
+# Cada edición reemplaza la primera aparición de un texto por otro; se
+# aplican en orden sobre el mismo documento.
+EDITS = [
+    ('Pray(x);\n', 'Pray(x);\nPray(f(x));\n'),
+    ('Hunter x: Maria => 1;\n', ''),
+    ('', 'Hunter x: Maria => 1;\n'),
+    ('Echoes n + x;', 'Echoes n + y;'),
+    ('Echoes n + y;', 'Echoes n + x;'),
+    ('} Madness {', '}\n\n\nMadness {'),
+    ('Pray("no");', 'Pray("no";'),
+    ('Pray("no";', 'Pray("no");'),
+    ('GreatOnes f', 'GreatOnes h'),
+    ('GreatOnes h', 'GreatOnes f'),
+    ('x => x + 2;\n', 'Hunter x: Eileen => "dos";\n'),
+    ('Pray(f(2));\n', ''),
+]
+
+
+def compiled(text):
+    # Lo que da compilar el texto completo: el error o el AST con sus líneas.
+    compilation = CompilationEntry(text)
+    try:
+        compilation.analysis()
+    except Exception as error:
+        return type(error), str(error)
+    return ast_to_json(compilation.ast())
+
+
+def incremental(document):
+    error = document.result()
+    if error is not None:
+        return type(error), str(error)
+    return ast_to_json(document.ast())
+
+
+def edit(document, start, end, text):
+    expected = document.text[:start] + text + document.text[end:]
+    document.edit(document.version, start, end, text)
+    assert document.text == expected
+    assert incremental(document) == compiled(expected)
+
+
+def test_edits_match_full_compilation():
+    document = Document(PROGRAM)
+    assert incremental(document) == compiled(PROGRAM)
+    for old, new in EDITS:
+        start = document.text.index(old)
+        edit(document, start, start + len(old), new)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_edits_match_full_compilation(seed):
+    rng = random.Random(seed)
+    document = Document(PROGRAM)
+    history = []
+    for _ in range(40):
+        text = document.text
+        if history and document.result() is not None and rng.random() < 0.7:
+            # Como en el editor, un error suele deshacerse.
+            start, removed, inserted = history.pop()
+            edit(document, start, start + len(inserted), removed)
+            continue
+        lines = [0] + [i + 1 for i, char in enumerate(text) if char == '\n']
+        choice = rng.random()
+        if choice < 0.5:
+            start = end = rng.choice(lines)
+            inserted = rng.choice(STATEMENTS)
+        elif choice < 0.75:
+            first = rng.randrange(len(lines))
+            start, end = lines[first], lines[min(len(lines) - 1, first + rng.randint(1, 2))]
+            inserted = ''
+        else:
+            start = rng.randint(0, len(text))
+            end = min(len(text), start + rng.randint(0, 3))
+            inserted = rng.choice(TOKENS)
+        history.append((start, text[start:end], inserted))
+        edit(document, start, end, inserted)
@@ -0,0 +1,89 @@
+import sys
+
+import pytest
+from cache.compile_cache import CompilationEntry
+from interpreter import closure_compiler, runtime
+from interpreter.runtime import BloodCodeError
+from interpreter.budget import ExecutionBudget, BudgetExceeded, MAX_DEPTH
+from interpreter.engines import ENGINES
+from benchmarks.programs import recursion_program, chain_program
+
+
+def run(engine, code, **limits):
+    compilation = CompilationEntry(code)
+    ast = compilation.program()
+    interpreter = ENGINES[engine](compilation.analysis())
+    interpreter.budget = ExecutionBudget(max_steps=100000, **limits)
+    interpreter.execute(ast)
+    return interpreter.output
+
+
+@pytest.mark.parametrize('engine', list(ENGINES))
+def test_deeply_nested_insight(engine):
+    depth = 105
+    code = 'Hunter x: Maria => 1;\n' + 'Insight (x == 1) {\n' * depth + 'Pray(x);\n' + '}\n' * depth
+    assert run(engine, code) == ['1']
+
+
+@pytest.mark.parametrize('engine', list(ENGINES))
+def test_deeply_nested_loops(engine):
+    loops = ''.join(f'Nightmare (Hunter i{k}: Maria => 0; i{k} < 1; i{k} => i{k} + 1;) {{\n' for k in range(25))
+    code = 'Hunter x: Maria => 0;\n' + loops + 'x => x + 1;\n' + '}\n' * 25 + 'Pray(x);\n'
+    assert run(engine, code) == ['1']
+
+
+@pytest.mark.parametrize('engine', list(ENGINES))
+def test_call_depth_limit(engine):
+    with pytest.raises(BudgetExceeded) as error:
+        run(engine, recursion_program(100), max_depth=50)
+    assert error.value.to_dict() == {'kind': 'depth', 'limit': 50, 'line': 5}
+
+
+@pytest.mark.parametrize('engine', list(ENGINES))
+def test_call_depth_does_not_depend_on_python_stack(engine):
+    limit = sys.getrecursionlimit()
+    assert run(engine, recursion_program(MAX_DEPTH - 1)) == [str(MAX_DEPTH * (MAX_DEPTH - 1) // 2)]
+    with pytest.raises(BudgetExceeded) as error:
+        run(engine, recursion_program(MAX_DEPTH + 1))
+    assert error.value.to_dict() == {'kind': 'depth', 'limit': MAX_DEPTH, 'line': 5}
+    assert sys.getrecursionlimit() == limit
+
+
+@pytest.mark.parametrize('engine', ['closures', 'python'])
+def test_python_stack_exhaustion_is_not_a_depth_limit(engine, monkeypatch):
+    # Sin max_depth la pila reservada tiene un tope; al agotarla el error no
+    # se presenta como el límite de profundidad configurado.
+    monkeypatch.setattr(runtime, 'MAX_PYTHON_FRAMES', 5000)
+    monkeypatch.setattr(closure_compiler, 'MAX_PYTHON_FRAMES', 5000)
+    with pytest.raises(BudgetExceeded) as error:
+        run(engine, recursion_program(20000), max_depth=None)
+    assert error.value.kind == 'stack'
+    assert 0 < error.value.limit < 5000
+    assert error.value.line_number == 5
+
+
+@pytest.mark.parametrize('engine', list(ENGINES))
+def test_long_expression(engine):
+    assert run(engine, chain_program(5000)) == ['5000']
+
+
+# El parser guarda en Pray, Eyes y Echoes la línea del token que sigue al
+# ';': aquí ese token está una o dos líneas más abajo.
+ERROR_LINES = [
+    ('Hunter a: Maria => 0;\nPray(1 / a);\n\nPray(1);\n', None, 2),
+    ('Hunter a: Maria => 0;\nInsight (a == 0) {\n    Pray(1 / a);\n}\n\nPray(1);\n', None, 3),
+    ('GreatOnes f(n: Maria): Maria {\n    Echoes 1 / n;\n}\nf(0);\n\nPray(1);\n', None, 2),
+    ('Hunter v: Maria;\nEyes(v);\n\nPray(v);\n', 'abc', 2),
+]
+
+
+@pytest.mark.parametrize('code, user_input, line', ERROR_LINES)
+@pytest.mark.parametrize('engine', list(ENGINES))
+def test_error_line(engine, code, user_input, line):
+    compilation = CompilationEntry(code)
+    interpreter = ENGINES[engine](compilation.analysis())
+    if user_input is not None:
+        interpreter.context['input_var'] = user_input
+    with pytest.raises(BloodCodeError) as error:
+        interpreter.execute(compilation.program())
+    assert error.value.line_number == line
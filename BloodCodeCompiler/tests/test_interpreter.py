@@ -0,0 +1,84 @@
+import operator
+
+from cache.compile_cache import CompilationEntry
+from parser.ast import ASTNode, BinaryOpNode
+from interpreter.interpreter import Interpreter, OPERATIONS, TYPED_OPERATIONS
+
+SYMBOLS = {
+    'PLUS': '+', 'MINUS': '-', 'MULTIPLY': '*', 'DIVIDE': '/',
+    'EQUAL': '==', 'NOT': '!=', 'GREATER': '>', 'LESS': '<',
+    'BLOODBOND': 'Bloodbond', 'OLDBLOOD': 'OldBlood',
+}
+
+VARIABLES = '''Hunter m1: Maria => 7;
+Hunter m2: Maria => 2;
+Hunter g1: Gehrman => 1.5;
+Hunter g2: Gehrman => 2.5;
+Hunter e1: Eileen => "a";
+Hunter e2: Eileen => "b";
+Hunter b1: Blood => true;
+Hunter b2: Blood => false;
+'''
+
+PREFIXES = {'MARIA': 'm', 'GEHRMAN': 'g', 'EILEEN': 'e', 'BLOOD': 'b'}
+
+
+def binary_nodes(value):
+    if isinstance(value, BinaryOpNode):
+        yield value
+    if isinstance(value, ASTNode):
+        for field in value.field_values():
+            yield from binary_nodes(field)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from binary_nodes(item)
+
+
+def test_typed_nodes_get_the_typed_handler():
+    # Una operación por cada par de TYPED_OPERATIONS, sobre variables para
+    # que el optimizador no la pliegue. '>=' y '<=' no se pueden escribir (el
+    # lexer reconoce antes '>' y '<') y Vileblood sólo es unario en el parser.
+    pairs = {pair for pair in TYPED_OPERATIONS if pair[0] in SYMBOLS}
+    lines = [VARIABLES]
+    for operator_name, operand_type in sorted(pairs):
+        prefix = PREFIXES[operand_type]
+        lines.append(f'Pray({prefix}1 {SYMBOLS[operator_name]} {prefix}2);\n')
+    compilation = CompilationEntry(''.join(lines))
+    ast = compilation.program()
+    interpreter = Interpreter(compilation.analysis())
+
+    seen = set()
+    for node in binary_nodes(ast):
+        if node.operand_type is None:
+            continue
+        pair = (node.operator, node.operand_type)
+        handler = interpreter.select_binary_handler(node)
+        assert handler is interpreter.operation_handlers[TYPED_OPERATIONS[pair]]
+        assert handler.__qualname__ == 'operation_handler.<locals>.execute_operation'
+        seen.add(pair)
+    assert seen == pairs
+
+
+def test_typed_operations_cover_the_analyzer_pairs():
+    assert TYPED_OPERATIONS[('PLUS', 'EILEEN')] is operator.concat
+    for operand_type in ('MARIA', 'GEHRMAN', 'EILEEN', 'BLOOD'):
+        assert ('EQUAL', operand_type) in TYPED_OPERATIONS
+    for operator_name in ('BLOODBOND', 'OLDBLOOD', 'VILEBLOOD'):
+        assert TYPED_OPERATIONS[(operator_name, 'BLOOD')] is OPERATIONS[operator_name]
+
+
+def test_typed_operations_keep_generic_results():
+    # Maria después de una división es float; los elementos sin inicializar
+    # de un vector Blood son "".
+    code = '''Hunter a: Maria => 7;
+Hunter b: Maria => 2;
+Hunter c: Maria => a / b;
+Hunter v: Blood[2];
+Pray(c + b);
+Pray(v[0] Bloodbond v[1]);
+Pray(v[0] OldBlood true);
+'''
+    compilation = CompilationEntry(code)
+    interpreter = Interpreter(compilation.analysis())
+    interpreter.execute(compilation.program())
+    assert interpreter.output == ['5.5', 'False', 'True']
@@ -0,0 +1,27 @@
+import pytest
+from cache.compile_cache import CompilationEntry
+from cache.documents import ast_nodes
+from benchmarks.programs import generate_source, recursion_program, nested_loops_program, factorial_program, chain_program
+
+
+def node_count(code):
+    compilation = CompilationEntry(code)
+    compilation.analysis()
+    return compilation.node_count
+
+
+def test_assignment_is_counted_once():
+    code = 'Hunter x: Maria => 2;\n' + 'x => x + 1;\n' * 3
+    assert node_count(code) == 19
+
+
+@pytest.mark.parametrize('code', [
+    generate_source(100),
+    recursion_program(5),
+    nested_loops_program(3),
+    factorial_program(3, 4),
+    chain_program(20),
+])
+def test_node_count_matches_tree(code):
+    ast = CompilationEntry(code).ast()
+    assert node_count(code) == sum(1 for _ in ast_nodes([ast]))
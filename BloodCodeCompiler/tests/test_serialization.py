@@ -0,0 +1,184 @@
+import json
+
+import pytest
+from cache.compile_cache import CompilationEntry
+from cache.disk_cache import ASTDiskCache
+from interpreter.interpreter import Interpreter
+from benchmarks.programs import nested_loops_program, matrix_program, vector_program, factorial_program, chain_program
+from parser.ast import ASTNode, ConstantNode
+from parser.serialization import NODE_FIELDS, MAGIC, FORMAT_VERSION, SerializationError, encode_ast, decode_ast, ast_to_json, json_text
+
+# Un programa con todas las construcciones: funciones, bucles, vectores,
+# matrices, números con decimales y cadenas no ASCII.
+PROGRAM = '''GreatOnes doble(n: Maria): Maria {
+    Echoes n * 2;
+}
+Hunter v: Maria[3] => [1, 2, 3];
+Hunter m: Maria[2].[2];
+Hunter g: Gehrman => 2.75;
+Hunter s: Eileen => "añejo";
+Hunter b: Blood => true;
+Hunter total: Maria => 0;
+Nightmare (Hunter i: Maria => 0; i < 3; i => i + 1;) {
+    total => total + v[i] + m[1].[0];
+}
+Dream (total > 100) {
+    total => total - 1;
+}
+Insight (Vileblood b) {
+    total => 0;
+} Madness {
+    Pray(s);
+    Pray(doble(total));
+    Pray(g > 1.5);
+}
+m[0].[1] => doble(2 + 3);
+'''
+
+
+def node_classes(value):
+    if isinstance(value, ASTNode):
+        yield type(value)
+        for field in value.field_values():
+            yield from node_classes(field)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from node_classes(item)
+
+
+def check_round_trip(ast):
+    # El árbol decodificado debe ser igual al original y volver a codificarse
+    # a los mismos bytes.
+    data = encode_ast(ast)
+    decoded = decode_ast(data)
+    assert repr(decoded) == repr(ast)
+    assert ast_to_json(decoded) == ast_to_json(ast)
+    assert encode_ast(decoded) == data
+    return decoded
+
+
+def test_round_trip_covers_every_node_class():
+    compilation = CompilationEntry(PROGRAM)
+    parsed = compilation.ast()
+    # El optimizador es el que produce los ConstantNode.
+    optimized = compilation.program()
+    # Rest sólo pasa por el parser: el SemanticAnalyzer no lo acepta.
+    rest = CompilationEntry('Rest;').ast()
+    classes = set()
+    for ast in (parsed, optimized, rest):
+        check_round_trip(ast)
+        classes.update(node_classes(ast))
+    assert classes == {node_class for node_class, _ in NODE_FIELDS}
+
+
+@pytest.mark.parametrize('code', [
+    nested_loops_program(10),
+    matrix_program(10),
+    vector_program(10, 2, True),
+    vector_program(10, 2, False),
+    factorial_program(5, 2),
+])
+def test_round_trip_benchmark_programs(code):
+    compilation = CompilationEntry(code)
+    check_round_trip(compilation.ast())
+    check_round_trip(compilation.program())
+
+
+@pytest.mark.parametrize('value', [0.0, -0.0, 1.0, 2.75, -3.5, 1e300, 2.0 ** 60, float('inf'), 7, -7, 2 ** 70, True, False, None, '', 'ñ'])
+def test_round_trip_constant_values(value):
+    decoded = check_round_trip(ConstantNode(value, 3))
+    assert type(decoded.value) is type(value)
+    assert repr(decoded.value) == repr(value)
+
+
+def run(compilation):
+    interpreter = Interpreter(compilation.analysis())
+    interpreter.execute(compilation.program())
+    return interpreter.output
+
+
+def test_decoded_tree_runs_like_the_original():
+    decoded = check_round_trip(CompilationEntry(PROGRAM).ast())
+    compilation = CompilationEntry(PROGRAM)
+    compilation._ast = decoded
+    assert run(compilation) == run(CompilationEntry(PROGRAM)) == ['"añejo"', '12', 'True']
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'not an ast',
+    MAGIC,
+    MAGIC + bytes([FORMAT_VERSION + 1]),
+])
+def test_invalid_header(data):
+    with pytest.raises(SerializationError):
+        decode_ast(data)
+
+
+def test_truncated_and_trailing_data():
+    data = encode_ast(CompilationEntry(PROGRAM).ast())
+    for end in (len(MAGIC) + 1, len(MAGIC) + 3, len(data) // 2, len(data) - 1):
+        with pytest.raises(SerializationError):
+            decode_ast(data[:end])
+    with pytest.raises(SerializationError):
+        decode_ast(data + b'\x00')
+
+
+def test_unknown_node_tag():
+    data = bytearray(encode_ast(ConstantNode(1, 1)))
+    # Sin cadenas, el valor raíz empieza después del varint con la cantidad.
+    data[len(MAGIC) + 2] = 16 + len(NODE_FIELDS)
+    with pytest.raises(SerializationError):
+        decode_ast(bytes(data))
+
+
+def test_disk_cache_treats_bad_files_as_misses(tmp_path):
+    cache = ASTDiskCache(str(tmp_path), 16)
+    ast = CompilationEntry(PROGRAM).ast()
+    cache.store('v1', 'bueno', ast)
+    assert repr(cache.load('v1', 'bueno')) == repr(ast)
+
+    cache.store('v1', 'dañado', ast)
+    with open(cache.path('v1', 'dañado'), 'r+b') as file:
+        file.truncate(len(MAGIC) + 4)
+    cache.store('v1', 'viejo', ast)
+    with open(cache.path('v1', 'viejo'), 'r+b') as file:
+        file.seek(len(MAGIC))
+        file.write(bytes([FORMAT_VERSION + 1]))
+
+    assert cache.load('v1', 'dañado') is None
+    assert cache.load('v1', 'viejo') is None
+    assert cache.load('v1', 'ausente') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['errors']) == (1, 1, 2)
+
+
+def test_deep_tree_through_the_disk_cache(tmp_path):
+    # Una suma de 5000 términos es un árbol de esa profundidad: ni el
+    # codificador, ni el decodificador ni la forma JSON usan la pila de Python.
+    code = chain_program(5000)
+    ast = CompilationEntry(code).ast()
+    cache = ASTDiskCache(str(tmp_path), 16)
+    cache.store('v1', 'profundo', ast)
+    loaded = cache.load('v1', 'profundo')
+    assert cache.stats()['errors'] == 0
+    assert encode_ast(loaded) == encode_ast(ast)
+    assert json_text(ast_to_json(loaded)) == json_text(ast_to_json(ast))
+
+    compilation = CompilationEntry(code)
+    compilation._ast = loaded
+    assert run(compilation) == ['5000']
+
+
+def test_json_text_matches_json_dumps():
+    value = ast_to_json(CompilationEntry(PROGRAM).program())
+    assert json_text(value) == json.dumps(value, separators=(',', ':'))
+    assert json_text(value, sort_keys=True) == json.dumps(value, separators=(',', ':'), sort_keys=True)
+
+
+def test_ast_json_endpoint_with_deep_tree():
+    pytest.importorskip('flask')
+    from app import app
+
+    response = app.test_client().post('/compile', json={'code': chain_program(5000), 'action': 'ast_json'})
+    assert response.status_code == 200
@@ -0,0 +1,44 @@
+import pytest
+from cache.compile_cache import CompilationEntry
+from interpreter.budget import ExecutionBudget, BudgetExceeded
+from interpreter.engines import ENGINES
+from interpreter.streaming import OutputStream
+
+LOOP = '''Hunter i: Maria => 0;
+Nightmare (Hunter j: Maria => 0; j < 100; j => j + 1;) {
+    Pray(j);
+}
+'''
+
+FUNCTION = '''Hunter i: Maria => 0;
+GreatOnes hablar(n: Maria): Maria {
+    Pray(n);
+    Echoes n;
+}
+Nightmare (Hunter j: Maria => 0; j < 100; j => j + 1;) {
+    i => hablar(j);
+}
+'''
+
+
+def run_streamed(engine, code, max_bytes):
+    compilation = CompilationEntry(code)
+    ast = compilation.program()
+    interpreter = ENGINES[engine](compilation.analysis())
+    interpreter.budget = ExecutionBudget(max_steps=100000)
+    interpreter.output = OutputStream(lambda lines: None, max_bytes)
+    interpreter.execute(ast)
+
+
+def output_error_line(engine, code):
+    with pytest.raises(BudgetExceeded) as error:
+        run_streamed(engine, code, 20)
+    assert error.value.kind == 'output'
+    return error.value.line_number
+
+
+@pytest.mark.parametrize('code', [LOOP, FUNCTION], ids=['loop', 'function'])
+@pytest.mark.parametrize('engine', list(ENGINES))
+def test_output_limit_reports_pray_line(engine, code):
+    # También dentro de una función: el error es del Pray, no de la llamada.
+    assert output_error_line(engine, code) == 3
@@ -0,0 +1,4 @@
+# Versión del compilador. Debe incrementarse cuando cambie la salida del
+# lexer, del parser o del análisis semántico: forma parte de la clave de las
+# cachés de compilación.
+COMPILER_VERSION = '1.3.0'
@@ -0,0 +1,3 @@
+from .code import CodeObject
+from .compiler import BytecodeCompiler
+from .machine import VirtualMachine, VMInterpreter
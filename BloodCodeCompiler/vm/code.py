@@ -0,0 +1,42 @@
+from array import array
+
+from .opcodes import OPCODE_NAMES, INSTRUCTION_SIZE
+
+
+class CodeObject:
+    # Bytecode de una función (o del programa principal). Los registros son
+    # las variables locales, los parámetros (primeros registros), las
+    # constantes y los temporales; 'template' guarda el valor inicial de cada
+    # uno para crear o reiniciar un frame con una sola copia.
+    def __init__(self, name, parameter_count=0, return_type=None):
+        self.name = name
+        self.parameter_count = parameter_count
+        self.return_type = return_type
+        self.pure = False
+        self.code = array('i')
+        self.lines = []
+        self.descriptors = []
+        self.functions = []
+        self.register_names = []
+        self.template = []
+        self._instructions = None
+
+    @property
+    def register_count(self):
+        return len(self.template)
+
+    def instructions(self):
+        # La máquina recorre las instrucciones ya decodificadas en tuplas.
+        if self._instructions is None:
+            code = self.code
+            self._instructions = [tuple(code[i:i + INSTRUCTION_SIZE]) for i in range(0, len(code), INSTRUCTION_SIZE)]
+        return self._instructions
+
+    def disassemble(self):
+        lines = [f"{self.name} ({self.parameter_count} parámetros, {self.register_count} registros)"]
+        for index, (op, a, b, c) in enumerate(self.instructions()):
+            lines.append(f"{index:4d}  {OPCODE_NAMES[op]:<8} {a:4d} {b:4d} {c:4d}    ; línea {self.lines[index]}")
+        for function in self.functions:
+            lines.append('')
+            lines.append(function.disassemble())
+        return '\n'.join(lines)
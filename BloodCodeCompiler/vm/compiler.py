@@ -0,0 +1,439 @@
+from parser.ast import NumberNode, IdentifierNode, BinaryOpNode, StringNode, DeclarationNode, BlockNode, IfStatementNode, LoopNode, FunctionCallNode, RestNode, BooleanNode, UnaryOpNode, FunctionDeclarationNode, ReturnNode, ArrayNode, ConstantNode
+from interpreter.runtime import BloodCodeError, UNSET, decode_number, reachable_statements, scalar_default, statement_line
+from interpreter.arrays import BUILTINS
+from .code import CodeObject
+from .opcodes import (MOVE, NOT, JUMP, JUMPF, JUMPT, GETVEC, SETVEC, GETMAT, SETMAT, CALL, RET, NORET,
+                      PRAY, EYES, CHECK, NEWLIST, NEWVEC, NEWMAT, DEFINE, GETUP, SETUP, BUILTIN, GETITEM, SETITEM,
+                      GETCELL, SETCELL, HALT, BINARY_OPCODES)
+
+# Variantes del error de CHECK, con los mismos mensajes que el Interpreter.
+CHECK_VARIABLE = 0
+CHECK_ARRAY = 1
+
+
+class BytecodeCompiler:
+    # Compila una función (o el programa principal) a un CodeObject. Los
+    # nombres se resuelven a registros al compilar y sólo se comprueba en
+    # ejecución que una variable tenga valor cuando no está asignada con
+    # seguridad en todos los caminos que llegan a la lectura. Las variables de
+    # niveles exteriores (según la profundidad del Resolver) se copian a un
+    # registro propio con GETUP y se escriben con SETUP.
+    def __init__(self, code_object, parameters=(), parent=None, depth=0):
+        self.code_object = code_object
+        self.parent = parent
+        self.depth = depth
+        self.slots = {}
+        self.outer_slots = {}
+        self.constants = {}
+        self.temps = []
+        self.temp_index = 0
+        self.line_number = None
+        for name in parameters:
+            self.slot(name)
+        self.assigned = set(parameters)
+
+    @classmethod
+    def compile_program(cls, node):
+        compiler = cls(CodeObject('<programa>'))
+        compiler.line_number = node.line_number
+        compiler.statements(node)
+        compiler.emit(HALT)
+        return compiler.code_object
+
+    # Registros
+
+    def new_register(self, initial_value, name=None):
+        self.code_object.template.append(initial_value)
+        self.code_object.register_names.append(name)
+        return len(self.code_object.template) - 1
+
+    def slot(self, name):
+        register = self.slots.get(name)
+        if register is None:
+            register = self.new_register(UNSET, name)
+            self.slots[name] = register
+        return register
+
+    def outer_slot(self, node):
+        # Registro local que recibe la copia de una variable exterior; lleva
+        # su nombre para los mensajes de error.
+        key = (node.depth, node.name)
+        register = self.outer_slots.get(key)
+        if register is None:
+            register = self.new_register(UNSET, node.name)
+            self.outer_slots[key] = register
+        return register
+
+    def enclosing_register(self, node):
+        compiler = self
+        while compiler.depth > node.depth:
+            compiler = compiler.parent
+        return compiler.slot(node.name)
+
+    def constant(self, value):
+        # 1, 1.0 y True son iguales como claves de dict; el tipo los separa.
+        key = (type(value), value)
+        register = self.constants.get(key)
+        if register is None:
+            register = self.new_register(value)
+            self.constants[key] = register
+        return register
+
+    def temp(self):
+        if self.temp_index == len(self.temps):
+            self.temps.append(self.new_register(None))
+        register = self.temps[self.temp_index]
+        self.temp_index += 1
+        return register
+
+    def descriptor(self, value):
+        self.code_object.descriptors.append(value)
+        return len(self.code_object.descriptors) - 1
+
+    # Emisión
+
+    def emit(self, op, a=0, b=0, c=0):
+        self.code_object.code.extend((op, a, b, c))
+        self.code_object.lines.append(self.line_number)
+        return len(self.code_object.lines) - 1
+
+    def position(self):
+        return len(self.code_object.lines)
+
+    def patch_jump(self, index, target):
+        # El destino está en 'a' para JUMP y en 'b' para los saltos condicionales.
+        offset = index * 4 + (1 if self.code_object.code[index * 4] == JUMP else 2)
+        self.code_object.code[offset] = target
+
+    # Sentencias
+
+    def statements(self, node):
+        for statement in reachable_statements(node):
+            self.statement(statement)
+
+    def statement(self, node):
+        self.line_number = statement_line(node)
+        self.temp_index = 0
+        self.compile_statement(node)
+
+    def compile_statement(self, node):
+        if isinstance(node, BlockNode):
+            self.statements(node)
+        elif isinstance(node, ReturnNode):
+            self.compile_statement(node.expression)
+        elif isinstance(node, DeclarationNode):
+            self.declaration(node)
+        elif isinstance(node, IfStatementNode):
+            self.if_statement(node)
+        elif isinstance(node, LoopNode):
+            self.loop(node)
+        elif isinstance(node, FunctionDeclarationNode):
+            self.function_declaration(node)
+        elif isinstance(node, FunctionCallNode) and self.call_name(node) == 'PRAY':
+            self.emit(PRAY, self.expression(node.arguments[0]))
+        elif isinstance(node, FunctionCallNode) and self.call_name(node) == 'EYES':
+            self.eyes(node)
+        elif isinstance(node, RestNode):
+            pass
+        elif self.is_assignment(node):
+            self.assignment(node)
+        else:
+            self.expression(node)
+
+    def declaration(self, node):
+        var_type = node.var_type
+        for identifier in node.identifier_list:
+            name = identifier.name
+            target = self.slot(name)
+            if isinstance(var_type, tuple):
+                element_type = var_type[0]
+                init = self.expression(node.expression) if isinstance(node.expression, ArrayNode) else -1
+                size1 = self.expression(var_type[1]) if var_type[1] else self.constant(0)
+                if len(var_type) == 3:
+                    size2 = self.expression(var_type[2]) if var_type[2] else self.constant(0)
+                    self.emit(NEWMAT, target, self.descriptor((element_type, name, size1, size2, init)))
+                else:
+                    self.emit(NEWVEC, target, self.descriptor((element_type, name, size1, init)))
+            elif node.expression:
+                self.expression(node.expression, target)
+            else:
+                self.emit(MOVE, target, self.constant(scalar_default(var_type)))
+            self.assigned.add(name)
+
+    def assignment(self, node):
+        # Devuelve el registro con el valor asignado.
+        target = node.left
+        if isinstance(target, IdentifierNode):
+            if target.depth != self.depth:
+                register = self.expression(node.right)
+                self.emit(SETUP, target.depth, self.enclosing_register(target), register)
+                return register
+            register = self.expression(node.right, self.slot(target.name))
+            self.assigned.add(target.name)
+            return register
+        if not (isinstance(target, BinaryOpNode) and target.operator == 'INDEX'):
+            raise BloodCodeError("Asignación inválida", node.line_number)
+
+        value = self.expression(node.right)
+        array = self.array_register(target)
+        if self.is_matrix_access(target):
+            row = self.expression(target.left.right)
+            col = self.expression(target.right)
+            self.emit(SETMAT if target.bounds_check else SETCELL, array, self.descriptor((row, col)), value)
+        else:
+            self.emit(SETVEC if target.bounds_check else SETITEM, array, self.expression(target.right), value)
+        return value
+
+    def if_statement(self, node):
+        # 'reached' son las variables asignadas al evaluar cada condición; al
+        # salir quedan las que están asignadas en todos los caminos.
+        line_number = self.line_number
+        end_jumps = []
+        branches = []
+        reached = self.assigned
+        current_node = node
+        while True:
+            self.line_number = line_number
+            self.temp_index = 0
+            self.assigned = reached
+            skip = self.emit(JUMPF, self.expression(current_node.condition))
+            self.assigned = set(reached)
+            self.statements(current_node.true_block)
+            branches.append(self.assigned)
+            self.line_number = line_number
+            end_jumps.append(self.emit(JUMP))
+            self.patch_jump(skip, self.position())
+            if not isinstance(current_node.false_block, IfStatementNode):
+                break
+            current_node = current_node.false_block
+
+        self.assigned = set(reached)
+        if current_node.false_block:
+            self.statements(current_node.false_block)
+        branches.append(self.assigned)
+        self.assigned = set.intersection(*branches)
+        for jump in end_jumps:
+            self.patch_jump(jump, self.position())
+
+    def loop(self, node):
+        # La condición va al final del cuerpo: un solo salto por vuelta.
+        if node.condition is None:
+            raise BloodCodeError("La condición del bucle no está definida.", node.line_number)
+        line_number = self.line_number
+        if node.init:
+            self.compile_statement(node.init)
+        entry = self.emit(JUMP)
+        body = self.position()
+        before = set(self.assigned)
+        self.statements(node.block)
+        if node.increment:
+            self.line_number = line_number
+            self.temp_index = 0
+            self.compile_statement(node.increment)
+        self.assigned = before
+        self.line_number = line_number
+        self.temp_index = 0
+        self.patch_jump(entry, self.position())
+        self.emit(JUMPT, self.expression(node.condition), body)
+
+    def eyes(self, node):
+        var = node.arguments[0]
+        if var.depth == self.depth:
+            self.emit(EYES, self.slot(var.name), self.descriptor(var.name))
+            return
+        # Sin entrada, la variable exterior se vuelve a escribir sin cambios.
+        register = self.outer_slot(var)
+        outer_register = self.enclosing_register(var)
+        self.emit(GETUP, register, var.depth, outer_register)
+        self.emit(EYES, register, self.descriptor(var.name))
+        self.emit(SETUP, var.depth, outer_register, register)
+
+    def function_declaration(self, node):
+        parameters = [param[0].name for param in node.parameters]
+        function = CodeObject(node.name.name, len(parameters), node.return_type)
+        function.pure = node.pure
+        compiler = BytecodeCompiler(function, parameters, self, node.depth)
+        compiler.line_number = node.line_number
+        zero = compiler.constant(0)
+        if node.return_type == 'Rom':
+            compiler.value_block(node.block, lambda: compiler.emit(RET, zero))
+        else:
+            compiler.value_block(node.block, lambda: compiler.emit(NORET))
+        self.code_object.functions.append(function)
+        self.emit(DEFINE, len(self.code_object.functions) - 1)
+
+    # Sentencias cuyo valor es el resultado de la función
+
+    def value_block(self, node, on_none):
+        statements = reachable_statements(node)
+        for statement in statements[:-1]:
+            self.statement(statement)
+        if statements:
+            self.value_statement(statements[-1], on_none)
+        else:
+            on_none()
+
+    def value_statement(self, node, on_none):
+        if isinstance(node, BlockNode):
+            self.value_block(node, on_none)
+            return
+        if isinstance(node, ReturnNode):
+            self.value_statement(node.expression, on_none)
+            return
+
+        self.line_number = statement_line(node)
+        self.temp_index = 0
+        if isinstance(node, IfStatementNode):
+            self.value_if(node, on_none)
+        elif isinstance(node, (DeclarationNode, LoopNode, FunctionDeclarationNode, RestNode)) or (
+                isinstance(node, FunctionCallNode) and self.call_name(node) in ('PRAY', 'EYES')):
+            self.compile_statement(node)
+            on_none()
+        elif self.is_assignment(node):
+            self.emit(RET, self.assignment(node))
+        else:
+            self.emit(RET, self.expression(node))
+
+    def value_if(self, node, on_none):
+        # La rama verdadera devuelve su resultado tal cual; el Madness final
+        # convierte None en 0 y si no entra en ninguna rama el valor es 0.
+        line_number = self.line_number
+        zero = self.constant(0)
+        reached = self.assigned
+        current_node = node
+        while True:
+            self.line_number = line_number
+            self.temp_index = 0
+            self.assigned = reached
+            skip = self.emit(JUMPF, self.expression(current_node.condition))
+            self.assigned = set(reached)
+            self.value_block(current_node.true_block, on_none)
+            self.patch_jump(skip, self.position())
+            if not isinstance(current_node.false_block, IfStatementNode):
+                break
+            current_node = current_node.false_block
+
+        self.assigned = set(reached)
+        if current_node.false_block:
+            self.value_block(current_node.false_block, lambda: self.emit(RET, zero))
+        else:
+            self.line_number = line_number
+            self.emit(RET, zero)
+        self.assigned = reached
+
+    # Expresiones
+
+    def call_name(self, node):
+        return node.identifier.name if isinstance(node.identifier, IdentifierNode) else node.identifier
+
+    def is_assignment(self, node):
+        return isinstance(node, BinaryOpNode) and node.operator in ('ASSIGN', 'ARROW_ASSIGN')
+
+    def is_matrix_access(self, node):
+        return isinstance(node.left, BinaryOpNode) and node.left.operator == 'INDEX'
+
+    def move_to(self, register, dest):
+        if dest is None or dest == register:
+            return register
+        self.emit(MOVE, dest, register)
+        return dest
+
+    def variable(self, node, check=CHECK_VARIABLE):
+        if node.depth != self.depth:
+            # Una variable exterior puede cambiar en cualquier llamada: se
+            # copia y se comprueba siempre.
+            register = self.outer_slot(node)
+            self.emit(GETUP, register, node.depth, self.enclosing_register(node))
+            self.emit(CHECK, register, check)
+            return register
+        register = self.slot(node.name)
+        if node.name not in self.assigned:
+            self.emit(CHECK, register, check)
+            self.assigned.add(node.name)
+        return register
+
+    def expression(self, node, dest=None):
+        # Devuelve el registro con el resultado; si se indica 'dest', el
+        # resultado queda en ese registro.
+        if isinstance(node, NumberNode):
+            return self.move_to(self.constant(decode_number(node.value)), dest)
+        if isinstance(node, (StringNode, ConstantNode)):
+            return self.move_to(self.constant(node.value), dest)
+        if isinstance(node, BooleanNode):
+            return self.move_to(self.constant(str(node.value).lower() == 'true'), dest)
+        if isinstance(node, RestNode):
+            return self.move_to(self.constant(None), dest)
+        if isinstance(node, IdentifierNode):
+            return self.move_to(self.variable(node), dest)
+
+        if isinstance(node, ArrayNode):
+            elements = tuple(self.expression(element) for element in node.elements)
+            target = self.temp() if dest is None else dest
+            self.emit(NEWLIST, target, self.descriptor(elements))
+            return target
+
+        if isinstance(node, UnaryOpNode):
+            if node.operator != 'VILEBLOOD':
+                raise BloodCodeError(f"Operador unario no soportado: {node.operator}", node.line_number)
+            operand = self.expression(node.operand)
+            target = self.temp() if dest is None else dest
+            self.emit(NOT, target, operand)
+            return target
+
+        if isinstance(node, BinaryOpNode):
+            return self.binary_expression(node, dest)
+
+        if isinstance(node, FunctionCallNode):
+            function_name = self.call_name(node)
+            if function_name in ('PRAY', 'EYES'):
+                raise BloodCodeError(f"{function_name} no puede usarse dentro de una expresión.", node.line_number)
+            arguments = tuple(self.expression(argument) for argument in node.arguments or [])
+            target = self.temp() if dest is None else dest
+            if function_name in BUILTINS:
+                self.emit(BUILTIN, target, self.descriptor((BUILTINS[function_name], arguments)))
+            else:
+                self.emit(CALL, target, self.descriptor((function_name, arguments)))
+            return target
+
+        raise BloodCodeError(f"Nodo no soportado: {type(node)}", getattr(node, 'line_number', None))
+
+    def binary_expression(self, node, dest):
+        if self.is_assignment(node):
+            raise BloodCodeError("Asignación inválida", node.line_number)
+        if node.operator == 'INDEX':
+            return self.index_expression(node, dest)
+
+        left = self.expression(node.left)
+        right = self.expression(node.right)
+        target = self.temp() if dest is None else dest
+        if node.operator == 'VILEBLOOD':
+            # Se evalúan ambos lados pero sólo cuenta la negación del derecho.
+            self.emit(NOT, target, right)
+            return target
+
+        op = BINARY_OPCODES.get(node.operator)
+        if op is None:
+            raise BloodCodeError(f"Operador no soportado: {node.operator}", node.line_number)
+        self.emit(op, target, left, right)
+        return target
+
+    def array_register(self, node):
+        current_node = node
+        while isinstance(current_node, BinaryOpNode) and current_node.operator == 'INDEX':
+            current_node = current_node.left
+        if not isinstance(current_node, IdentifierNode):
+            raise BloodCodeError("Acceso de matriz inválido: falta el identificador base.", node.line_number)
+        return self.variable(current_node, CHECK_ARRAY)
+
+    def index_expression(self, node, dest):
+        array = self.array_register(node)
+        if self.is_matrix_access(node):
+            row = self.expression(node.left.right)
+            col = self.expression(node.right)
+            target = self.temp() if dest is None else dest
+            self.emit(GETMAT if node.bounds_check else GETCELL, target, array, self.descriptor((row, col)))
+            return target
+        index = self.expression(node.right)
+        target = self.temp() if dest is None else dest
+        self.emit(GETVEC if node.bounds_check else GETITEM, target, array, index)
+        return target
@@ -0,0 +1,236 @@
+from interpreter.interpreter import Interpreter
+from interpreter.runtime import BloodCodeError, UNSET
+from interpreter.budget import BudgetExceeded, UNLIMITED
+from interpreter.memo import MISSING, memo_key
+from semantic_analyzer.Resolver import ensure_resolved
+from .compiler import BytecodeCompiler, CHECK_VARIABLE
+from .opcodes import (MOVE, ADD, SUB, MUL, DIV, LT, GT, LE, GE, EQ, NE, AND, OR, NOT, JUMP, JUMPF, JUMPT,
+                      GETVEC, SETVEC, GETMAT, SETMAT, CALL, RET, NORET, PRAY, EYES, CHECK, NEWLIST,
+                      NEWVEC, NEWMAT, DEFINE, GETUP, SETUP, BUILTIN, GETITEM, SETITEM, GETCELL, SETCELL, HALT)
+
+
+class VirtualMachine:
+    def __init__(self, interpreter):
+        self.output = interpreter.output
+        self.read_input = interpreter.read_eyes_input
+        self.budget = interpreter.budget
+        # nombre -> (CodeObject, frames libres para reutilizar, frames de los
+        # niveles exteriores visibles donde se declaró)
+        self.functions = {}
+
+    def run(self, program):
+        code_object = program
+        instructions = program.instructions()
+        descriptors = program.descriptors
+        template = program.template
+        pool = None
+        registers = list(template)
+        display = ()
+        pc = 0
+        call_stack = []
+        functions = self.functions
+        output = self.output
+        # Los pasos del presupuesto se cuentan en una variable local y sólo se
+        # consulta al presupuesto al llegar al siguiente punto de control.
+        budget = self.budget
+        steps = budget.steps
+        checkpoint = budget.checkpoint
+        # Las llamadas no usan la pila de Python: la profundidad es la de
+        # call_stack.
+        max_depth = budget.max_depth if budget.max_depth is not None else UNLIMITED
+        # Llamadas a funciones puras que no estaban en la tabla: (altura de
+        # call_stack al llamar, clave); su resultado se guarda al volver.
+        memo = budget.memo
+        pending = []
+
+        try:
+            while True:
+                op, a, b, c = instructions[pc]
+                pc += 1
+
+                # Las instrucciones más frecuentes van primero.
+                if op == MOVE:
+                    registers[a] = registers[b]
+                elif op == ADD:
+                    registers[a] = registers[b] + registers[c]
+                elif op == LT:
+                    registers[a] = registers[b] < registers[c]
+                elif op == JUMPT:
+                    # Sólo el final de un bucle salta con JUMPT: cada salto
+                    # es una vuelta.
+                    if registers[a]:
+                        steps += 1
+                        if steps >= checkpoint:
+                            checkpoint = budget.check(steps, code_object.lines[pc - 1])
+                        pc = b
+                elif op == JUMPF:
+                    if not registers[a]:
+                        pc = b
+                elif op == JUMP:
+                    pc = a
+                elif op == SUB:
+                    registers[a] = registers[b] - registers[c]
+                elif op == MUL:
+                    registers[a] = registers[b] * registers[c]
+                elif op == GETITEM:
+                    registers[a] = registers[b].data[registers[c]]
+                elif op == SETITEM:
+                    registers[a].put(registers[b], registers[c])
+                elif op == GETCELL:
+                    array = registers[b]
+                    row_register, col_register = descriptors[c]
+                    registers[a] = array.data[registers[row_register] * array.cols + registers[col_register]]
+                elif op == SETCELL:
+                    array = registers[a]
+                    row_register, col_register = descriptors[b]
+                    array.put(registers[row_register] * array.cols + registers[col_register], registers[c])
+                elif op == GETVEC:
+                    array = registers[b]
+                    data = array.data
+                    index = int(registers[c])
+                    if not (0 <= index < len(data)):
+                        raise Exception(f"Índice fuera de rango en el vector '{code_object.register_names[b]}'")
+                    registers[a] = data[index]
+                elif op == SETVEC:
+                    array = registers[a]
+                    index = int(registers[b])
+                    if not (0 <= index < len(array.data)):
+                        raise Exception(f"Índice fuera de rango en el vector '{code_object.register_names[a]}'")
+                    array.put(index, registers[c])
+                elif op == GETMAT:
+                    array = registers[b]
+                    row_register, col_register = descriptors[c]
+                    row = int(registers[row_register])
+                    col = int(registers[col_register])
+                    cols = array.cols
+                    if not (0 <= row < array.rows) or not (0 <= col < cols):
+                        raise Exception(f"Índice fuera de rango en la matriz '{code_object.register_names[b]}'")
+                    registers[a] = array.data[row * cols + col]
+                elif op == SETMAT:
+                    array = registers[a]
+                    row_register, col_register = descriptors[b]
+                    row = int(registers[row_register])
+                    col = int(registers[col_register])
+                    cols = array.cols
+                    if not (0 <= row < array.rows) or not (0 <= col < cols):
+                        raise Exception(f"Índice fuera de rango en la matriz '{code_object.register_names[a]}'")
+                    array.put(row * cols + col, registers[c])
+                elif op == CALL:
+                    name, arguments = descriptors[b]
+                    function = functions.get(name)
+                    if function is None:
+                        raise Exception(f"Función no encontrada: {name}")
+                    if len(call_stack) >= max_depth:
+                        raise BudgetExceeded('depth', budget.max_depth, code_object.lines[pc - 1])
+                    steps += 1
+                    if steps >= checkpoint:
+                        checkpoint = budget.check(steps, code_object.lines[pc - 1])
+                    callee, callee_pool, callee_display = function
+                    if memo is not None and callee.pure:
+                        key = memo_key(name, [registers[register] for register in arguments])
+                        if key is not None:
+                            value = memo.lookup(key)
+                            if value is not MISSING:
+                                registers[a] = value
+                                continue
+                            pending.append((len(call_stack), key))
+                    frame = callee_pool.pop() if callee_pool else list(callee.template)
+                    for slot, register in enumerate(arguments):
+                        frame[slot] = registers[register]
+                    call_stack.append((code_object, instructions, descriptors, template, pool, registers, display, pc, a))
+                    code_object = callee
+                    instructions = callee.instructions()
+                    descriptors = callee.descriptors
+                    template = callee.template
+                    pool = callee_pool
+                    registers = frame
+                    display = callee_display
+                    pc = 0
+                elif op == RET or op == NORET:
+                    value = registers[a] if op == RET else None
+                    # El frame se limpia y queda libre para la próxima llamada.
+                    if pool is not None:
+                        registers[:] = template
+                        pool.append(registers)
+                    function_name = code_object.name
+                    code_object, instructions, descriptors, template, pool, registers, display, pc, target = call_stack.pop()
+                    if value is None:
+                        raise Exception(f"La función '{function_name}' no retornó un valor.")
+                    registers[target] = value
+                    if pending and pending[-1][0] == len(call_stack):
+                        memo.store(pending.pop()[1], value)
+                elif op == DIV:
+                    registers[a] = registers[b] / registers[c]
+                elif op == GT:
+                    registers[a] = registers[b] > registers[c]
+                elif op == LE:
+                    registers[a] = registers[b] <= registers[c]
+                elif op == GE:
+                    registers[a] = registers[b] >= registers[c]
+                elif op == EQ:
+                    registers[a] = registers[b] == registers[c]
+                elif op == NE:
+                    registers[a] = registers[b] != registers[c]
+                elif op == AND:
+                    registers[a] = bool(registers[b]) & bool(registers[c])
+                elif op == OR:
+                    registers[a] = bool(registers[b]) | bool(registers[c])
+                elif op == NOT:
+                    registers[a] = not registers[b]
+                elif op == PRAY:
+                    try:
+                        output.append(str(registers[a]))
+                    except BudgetExceeded as e:
+                        raise BudgetExceeded(e.kind, e.limit, code_object.lines[pc - 1]) from None
+                elif op == EYES:
+                    value = self.read_input(descriptors[b])
+                    if value is not None:
+                        registers[a] = value
+                elif op == CHECK:
+                    if registers[a] is UNSET:
+                        name = code_object.register_names[a]
+                        if b == CHECK_VARIABLE:
+                            raise Exception(f"La variable '{name}' no ha sido declarada en el contexto actual.")
+                        raise Exception(f"Variable no definida: {name}")
+                elif op == NEWLIST:
+                    registers[a] = [registers[register] for register in descriptors[b]]
+                elif op == NEWVEC:
+                    element_type, name, size, init = descriptors[b]
+                    registers[a] = budget.new_vector(element_type, registers[size], registers[init] if init >= 0 else None, name, code_object.lines[pc - 1])
+                elif op == NEWMAT:
+                    element_type, name, rows, cols, init = descriptors[b]
+                    registers[a] = budget.new_matrix(element_type, registers[rows], registers[cols], registers[init] if init >= 0 else None, name, code_object.lines[pc - 1])
+                elif op == DEFINE:
+                    function = code_object.functions[a]
+                    if function.name in functions:
+                        raise Exception(f"Función '{function.name}' ya ha sido declarada anteriormente.")
+                    # Si la función declara otras, sus frames pueden quedar
+                    # capturados y no se reutilizan.
+                    functions[function.name] = (function, None if function.functions else [], display + (registers,))
+                elif op == GETUP:
+                    registers[a] = display[b][c]
+                elif op == SETUP:
+                    display[a][b] = registers[c]
+                elif op == BUILTIN:
+                    builtin, arguments = descriptors[b]
+                    registers[a] = builtin(*[registers[register] for register in arguments])
+                elif op == HALT:
+                    return None
+                else:
+                    raise Exception(f"Instrucción desconocida: {op}")
+        except BloodCodeError:
+            raise
+        except Exception as e:
+            raise BloodCodeError(str(e), code_object.lines[pc - 1]) from None
+
+
+class VMInterpreter(Interpreter):
+    def execute(self, node):
+        node = ensure_resolved(node)
+        try:
+            program = BytecodeCompiler.compile_program(node)
+        except RecursionError:
+            # El compilador recorre las expresiones con la pila de Python; las
+            # demasiado largas las ejecuta el Interpreter, que no la usa.
+            return Interpreter.execute(self, node)
+        return VirtualMachine(self).run(program)
@@ -0,0 +1,66 @@
+# Cada instrucción ocupa 4 enteros: [opcode, a, b, c]. Los operandos son
+# registros, destinos de salto o índices en las tablas del CodeObject según
+# la instrucción (ver la tabla de abajo).
+INSTRUCTION_SIZE = 4
+
+OPCODE_NAMES = (
+    'MOVE',      # R[a] = R[b]
+    'ADD',       # R[a] = R[b] + R[c]
+    'SUB',
+    'MUL',
+    'DIV',
+    'LT',
+    'GT',
+    'LE',
+    'GE',
+    'EQ',
+    'NE',
+    'AND',       # R[a] = bool(R[b]) & bool(R[c])
+    'OR',
+    'NOT',       # R[a] = not R[b]
+    'JUMP',      # pc = a
+    'JUMPF',     # si no R[a]: pc = b
+    'JUMPT',     # si R[a]: pc = b
+    'GETVEC',    # R[a] = R[b][R[c]]
+    'SETVEC',    # R[a][R[b]] = R[c]
+    'GETMAT',    # R[a] = R[b] en (fila, col), con (fila, col) = descriptors[c]
+    'SETMAT',    # R[a] en (fila, col) = R[c], con (fila, col) = descriptors[b]
+    'CALL',      # R[a] = función(args), con (nombre, args) = descriptors[b]
+    'RET',       # devuelve R[a]
+    'NORET',     # la función terminó sin valor
+    'PRAY',      # agrega str(R[a]) a la salida
+    'EYES',      # R[a] = entrada para la variable descriptors[b], si la hay
+    'CHECK',     # error si la variable R[a] todavía no tiene valor
+    'NEWLIST',   # R[a] = [R[r] for r in descriptors[b]]
+    'NEWVEC',    # R[a] = vector según descriptors[b]
+    'NEWMAT',    # R[a] = matriz según descriptors[b]
+    'DEFINE',    # registra la función functions[a]
+    'GETUP',     # R[a] = variable c del frame exterior de profundidad b
+    'SETUP',     # variable b del frame exterior de profundidad a = R[c]
+    'BUILTIN',   # R[a] = función(args), con (función predefinida, args) = descriptors[b]
+    'GETITEM',   # como GETVEC, sin comprobar el índice (el optimizador lo probó)
+    'SETITEM',   # como SETVEC, sin comprobar el índice
+    'GETCELL',   # como GETMAT, sin comprobar (fila, col)
+    'SETCELL',   # como SETMAT, sin comprobar (fila, col)
+    'HALT',
+)
+
+(MOVE, ADD, SUB, MUL, DIV, LT, GT, LE, GE, EQ, NE, AND, OR, NOT,
+ JUMP, JUMPF, JUMPT, GETVEC, SETVEC, GETMAT, SETMAT, CALL, RET, NORET,
+ PRAY, EYES, CHECK, NEWLIST, NEWVEC, NEWMAT, DEFINE, GETUP, SETUP, BUILTIN, GETITEM, SETITEM,
+ GETCELL, SETCELL, HALT) = range(len(OPCODE_NAMES))
+
+BINARY_OPCODES = {
+    'PLUS': ADD,
+    'MINUS': SUB,
+    'MULTIPLY': MUL,
+    'DIVIDE': DIV,
+    'LESS': LT,
+    'GREATER': GT,
+    'LESSEQUAL': LE,
+    'GREATEREQUAL': GE,
+    'EQUAL': EQ,
+    'NOT': NE,
+    'BLOODBOND': AND,
+    'OLDBLOOD': OR,
+}
@@ -12,6 +12,7 @@ export default function BloodCodeCompiler() {
   const [isError, setIsError] = useState(false);
   const [isPromptActive, setIsPromptActive] = useState(false);  
   const [userInput, setUserInput] = useState("");  
+  const [sessionId, setSessionId] = useState<string | null>(null);
 
   const clearOutput = () => {
     setOutput([]);
@@ -63,29 +64,43 @@ export default function BloodCodeCompiler() {
   const execute = async (userInput = "") => {
     setIsError(false);
 
+    // Con una sesión abierta solo se envía la entrada: el servidor reanuda
+    // el programa desde el Eyes que la pidió.
+    const resuming = sessionId !== null && userInput !== "";
+    const body = resuming
+      ? { sessionId, userInput }
+      : { code, session: true };
+
     try {
       const response = await fetch("http://localhost:5000/execute", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ code, userInput }), 
+        body: JSON.stringify(body), 
       });
 
       const data = await response.json();
 
       if (response.ok) {
+        const newOutput: string[] = data.output || [];
         if (data.prompt) {
           setIsPromptActive(true);
-          setOutput((prevOutput) => [...prevOutput, data.prompt]); 
+          setSessionId(data.sessionId);
+          setOutput((prevOutput) => {
+            const cleanedOutput = prevOutput.filter(line => !line.includes('Ingrese valor para'));  
+            return [...cleanedOutput, ...newOutput, data.prompt];
+          });
         } else {
           setIsPromptActive(false);
+          setSessionId(null);
           setOutput((prevOutput) => {
             const cleanedOutput = prevOutput.filter(line => !line.includes('Ingrese valor para'));  
-            return [...cleanedOutput, ...data.output];
+            return [...cleanedOutput, ...newOutput];
           });
         }
       } else {
+        setSessionId(null);
         setOutput([`Error en la ejecución: ${data.error || "Error desconocido"}`]);
         setIsError(true);
       }